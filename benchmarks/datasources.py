@@ -0,0 +1,64 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Benchmark L{enkel.model.dsources.IndexedList} against
+L{enkel.model.dsources.List}.
+
+Measures validating a L{enkel.model.ds.Many} field with half of the
+options selected, and iterating over the unicode options like a form
+generator does, for datasources with 10, 100 and 1000 options.
+
+Usage
+=====
+	~$ python benchmarks/datasources.py [iterations]
+"""
+
+from sys import argv
+from time import time
+
+from enkel.model.ds import Many
+from enkel.model.dsources import List, IndexedList
+from enkel.model.field.base import Int
+
+
+def bench(f, count):
+	start = time()
+	for x in xrange(count):
+		f()
+	return (time() - start) / count * 1000000
+
+
+def cli():
+	try:
+		count = int(argv[1])
+	except IndexError:
+		count = 20000
+	for size in 10, 100, 1000:
+		n = max(count * 10 // size, 10)
+		values = range(0, size, 2)
+		print "%d options:" % size
+		for cls in List, IndexedList:
+			field = Many(cls(range(size), Int()))
+			validate = bench(lambda: field.validate("f", values), n)
+			options = bench(lambda: list(field.datasource.ds_iter_unicode()), n)
+			print "  %-12s validate %9.1f usec, ds_iter_unicode %8.1f usec" % (
+					cls.__name__, validate, options)
+
+
+if __name__ == "__main__":
+	cli()
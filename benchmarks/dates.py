@@ -0,0 +1,67 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Benchmark parsing and formatting of the date and time fields in
+L{enkel.model.field.base}, compared to time.strptime and strftime.
+
+Usage
+=====
+	~$ python benchmarks/dates.py [iterations]
+"""
+
+from sys import argv
+from time import time, strptime
+import datetime
+
+from enkel.model.field.base import Date, Time, DateTime
+
+
+CASES = [
+	(Date(), u"2007-06-24", lambda d: datetime.date(*d[:3])),
+	(Time(), u"06:33:57", lambda d: datetime.time(*d[3:6])),
+	(DateTime(), u"2007-06-24 06:33:57", lambda d: datetime.datetime(*d[:6]))
+]
+
+
+def bench(f, arg, count):
+	start = time()
+	for x in xrange(count):
+		f(arg)
+	return (time() - start) / count * 1000000
+
+
+def cli():
+	try:
+		count = int(argv[1])
+	except IndexError:
+		count = 50000
+	for field, value, create in CASES:
+		fmt = field.FORMAT
+		parsed = field.from_unicode(value)
+		fast = bench(field.from_unicode, value, count)
+		slow = bench(lambda v: create(strptime(v, fmt)), value, count)
+		print "%-9s from_unicode %6.2f usec, strptime %6.2f usec (%.0fx)" % (
+				field.__class__.__name__, fast, slow, slow / fast)
+		fast = bench(field.to_unicode, parsed, count)
+		slow = bench(lambda v: unicode(v.strftime(fmt)), parsed, count)
+		print "%-9s to_unicode   %6.2f usec, strftime %6.2f usec (%.1fx)" % (
+				"", fast, slow, slow / fast)
+
+
+if __name__ == "__main__":
+	cli()
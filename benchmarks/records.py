@@ -0,0 +1,97 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Benchmark records from L{enkel.model.record.record_class} against
+L{enkel.model.data.Manip}.
+
+Measures the memory used by each object (not counting the values),
+and the time used to create records, read and write fields and
+validate.
+
+Usage
+=====
+	~$ python benchmarks/records.py [records]
+"""
+
+from sys import argv, getsizeof
+from time import time
+from datetime import date
+
+from enkel.model.data import Manip
+from enkel.model.record import record_class
+from enkel.model.field.base import Int, String, Text, Float, Date
+
+
+MODEL = dict(
+	id = Int(),
+	name = String(30),
+	email = String(50),
+	about = Text(required=False),
+	weight = Float(),
+	born = Date(),
+	score = Int(),
+	city = String(30),
+	zip = String(10),
+	country = String(30)
+)
+VALUES = dict(id=1, name=u"John", email=u"john@example.com",
+		weight=80.5, born=date(1980, 1, 1), score=10, city=u"Oslo",
+		zip=u"0150", country=u"Norway")
+
+
+def manip_size(m):
+	return getsizeof(m) + getsizeof(m.__dict__) + getsizeof(m._values)
+
+
+def timed(label, f, count):
+	start = time()
+	f()
+	used = time() - start
+	print "  %-10s %8.2f usec" % (label, used / count * 1000000)
+
+
+def bench(label, create, size, count):
+	objects = [create() for x in xrange(count)]
+	print "%s: %d bytes" % (label, size(objects[0]))
+	timed("create", lambda: [create() for x in xrange(count)], count)
+	def read():
+		for o in objects:
+			o.name; o.email; o.score
+	timed("read x3", read, count)
+	def write():
+		for o in objects:
+			o.name = u"Jack"; o.email = u"jack@example.com"; o.score = 2
+	timed("write x3", write, count)
+	def validate():
+		for o in objects:
+			o.validate()
+	timed("validate", validate, count)
+
+
+def cli():
+	try:
+		count = int(argv[1])
+	except IndexError:
+		count = 100000
+	Person = record_class(MODEL, "Person")
+	bench("Manip", lambda: Manip(MODEL, **VALUES), manip_size, count)
+	bench("Record", lambda: Person(**VALUES), getsizeof, count)
+
+
+if __name__ == "__main__":
+	cli()
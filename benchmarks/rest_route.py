@@ -0,0 +1,89 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Benchmark L{enkel.batteri.rest_route.RESTroute} matching.
+
+Compares trying every route in order (how RESTroute matched before
+routes were compiled into a L{enkel.batteri.rest_route.RouteTrie})
+with the compiled trie, for the first, middle and last route added
+and for a path which does not match any route.
+
+Usage
+=====
+	~$ python benchmarks/rest_route.py [requests]
+"""
+
+from sys import argv
+from time import time
+
+from enkel.batteri.rest_route import RESTroute
+
+
+def app(env, start_response):
+	pass
+
+
+def linear_match(routes, path):
+	for patt, app, r, env in routes:
+		m = r.match(path)
+		if m:
+			return app, m.groupdict(), env
+	return None
+
+
+def create_route(size):
+	route = RESTroute()
+	for i in xrange(size):
+		route.add("/section%d/{d:year}/{w:name}" % i, GET=app)
+	return route
+
+
+def bench(label, f, path, count):
+	start = time()
+	for i in xrange(count):
+		f(path)
+	used = time() - start
+	print "  %-10s %-32s %9.2f usec/match" % (label, path,
+			used / count * 1000000)
+
+
+def cli():
+	try:
+		count = int(argv[1])
+	except IndexError:
+		count = 2000
+
+	for size in 10, 1000, 10000:
+		route = create_route(size)
+		start = time()
+		route.compile("GET")
+		print "%d routes (trie created in %.3f sec)" % (size, time() - start)
+
+		paths = ["/section0/2007/hello",
+				"/section%d/2007/hello" % (size / 2),
+				"/section%d/2007/hello" % (size - 1),
+				"/nosuchsection/2007/hello"]
+		for path in paths:
+			route.match("GET", path) # compile the trie node
+			bench("linear", lambda p: linear_match(route.GET, p), path,
+					max(1, count * 10 / size))
+			bench("trie", lambda p: route.match("GET", p), path, count)
+
+
+if __name__ == "__main__":
+	cli()
@@ -0,0 +1,76 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Benchmark the session serializers.
+
+Measures the size and the dumps and loads time of every serializer
+in L{enkel.session.serializer.SERIALIZERS} for a small flat session,
+a nested session and a session with a large list.
+
+Usage
+=====
+	~$ python benchmarks/serializers.py [iterations]
+"""
+
+from sys import argv
+from time import time
+
+from enkel.session.serializer import SERIALIZERS, get_serializer, \
+		SerializerError
+
+
+SESSIONS = [
+	("flat", {"uid": 1042, "name": "john", "lang": "en", "admin": False}),
+	("nested", {"uid": 1042, "prefs": {"lang": "en", "tz": "CET",
+			"menu": ["home", "news", {"id": 3, "open": True}]},
+			"history": [{"path": "/page/%d" % i, "t": 1.5 * i}
+			for i in xrange(10)]}),
+	("list", {"uid": 1042, "items": range(1000)})
+]
+
+
+def bench(f, arg, count):
+	start = time()
+	for x in xrange(count):
+		f(arg)
+	return (time() - start) / count * 1000000
+
+
+def cli():
+	try:
+		count = int(argv[1])
+	except IndexError:
+		count = 10000
+	names = sorted(SERIALIZERS)
+	for label, session in SESSIONS:
+		print "%s session" % label
+		n = label == "list" and count // 100 or count
+		for name in names:
+			try:
+				s = get_serializer(name)
+				data = s.dumps(session)
+			except SerializerError, e:
+				print "  %-8s %s" % (name, e)
+				continue
+			print "  %-8s %6d bytes %8.1f usec dumps %8.1f usec loads" % (
+					name, len(data), bench(s.dumps, session, n),
+					bench(s.loads, data, n))
+
+
+if __name__ == "__main__":
+	cli()
@@ -0,0 +1,105 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Benchmark the session backends.
+
+Measures save, load and expire throughput of
+L{enkel.session.memory.MemorySession} and
+L{enkel.session.sqlite.SqliteSession}, with and without write-behind.
+Expiring is measured by saving sessions with a short timeout and
+timing how long it takes to remove all of them.
+
+Usage
+=====
+	~$ python benchmarks/sessions.py [sessions]
+"""
+
+from sys import argv
+from time import time, sleep
+from tempfile import mkdtemp
+from shutil import rmtree
+from os.path import join
+from datetime import timedelta
+
+from enkel.session.memory import MemorySession
+from enkel.session.backend import NoSuchSessionError
+from enkel.session.sqlite import SqliteSession
+
+
+SESSION = {"user": "john", "lang": "en", "cart": range(10)}
+
+
+def bench(label, f, sids):
+	start = time()
+	for sid in sids:
+		f(sid)
+	used = time() - start
+	print "  %-8s %10.0f ops/sec" % (label, len(sids) / used)
+
+
+def bench_backend(create, sids):
+	b = create(timedelta(seconds=3600))
+	bench("save", lambda sid: b.save(sid, SESSION), sids)
+	if hasattr(b, "flush"):
+		b.flush()
+	bench("load", b.load, sids)
+	bench("resave", lambda sid: b.save(sid, SESSION), sids * 4)
+	if hasattr(b, "close"):
+		b.close()
+
+	b = create(timedelta(milliseconds=1))
+	for sid in sids:
+		b.save(sid, SESSION)
+	if hasattr(b, "flush"):
+		b.flush()
+	sleep(0.01)
+	start = time()
+	if hasattr(b, "purge"):
+		b.purge()
+	else:
+		# expired sessions are swept by load and save
+		while len(b):
+			for sid in sids:
+				try:
+					b.load(sid)
+				except NoSuchSessionError:
+					pass
+	used = time() - start
+	print "  %-8s %10.0f ops/sec" % ("expire", len(sids) / used)
+
+
+def cli():
+	try:
+		count = int(argv[1])
+	except IndexError:
+		count = 10000
+	sids = ["%040d" % i for i in xrange(count)]
+	folder = mkdtemp()
+	try:
+		print "MemorySession"
+		bench_backend(lambda t: MemorySession(t, timedelta(0)), sids)
+		for wb in 0, 0.5:
+			print "SqliteSession (write_behind=%s)" % wb
+			path = join(folder, "sessions%s.db" % wb)
+			bench_backend(lambda t: SqliteSession(path, t, wb), sids)
+	finally:
+		rmtree(folder)
+
+
+if __name__ == "__main__":
+	cli()
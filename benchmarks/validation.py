@@ -0,0 +1,132 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Benchmark model validation.
+
+Compares L{enkel.model.data.Manip.validate}, which uses a validator
+compiled by L{enkel.model.validator}, with calling the validate
+method of every field, on models with 5, 50 and 500 fields, and
+validating 100000 records with a Manip for each record with
+L{enkel.model.batch}.
+
+Usage
+=====
+	~$ python benchmarks/validation.py [iterations]
+"""
+
+from sys import argv
+from time import time
+from datetime import date
+
+from enkel.model.data import Manip
+from enkel.model.batch import validate_records, validate_columns, numpy
+from enkel.model.field.interface import FieldValidationError
+from enkel.model.field.base import Int, String, Text, Float, Date, Bool
+
+
+FIELDS = [
+	(lambda: Int(), 10),
+	(lambda: String(20), u"John"),
+	(lambda: Text(required=False), None),
+	(lambda: Float(), 1.5),
+	(lambda: Date(), date(2007, 1, 1))
+]
+
+
+def create(size):
+	model = {}
+	values = {}
+	for i in xrange(size):
+		create_field, value = FIELDS[i % len(FIELDS)]
+		model["f%d" % i] = create_field()
+		if i % len(FIELDS) != 2:
+			values["f%d" % i] = value
+	m = Manip(model)
+	for key, value in values.iteritems():
+		m[key] = value
+	return m
+
+
+def field_validate(m):
+	errors = []
+	for key in m.model:
+		try:
+			m.model[key].validate(key, m[key])
+		except FieldValidationError, e:
+			errors.append(e)
+	return errors
+
+
+def bench(f, m, count):
+	f(m) # compiles the validator
+	start = time()
+	for x in xrange(count):
+		f(m)
+	return (time() - start) / count * 1000000
+
+
+def cli():
+	try:
+		count = int(argv[1])
+	except IndexError:
+		count = 10000
+	for size in 5, 50, 500:
+		m = create(size)
+		n = max(count * 5 // size, 10)
+		fields = bench(field_validate, m, n)
+		compiled = bench(Manip.info_validate, m, n)
+		print "%3d fields: %8.1f usec field.validate, %8.1f usec compiled " \
+				"(%.1fx)" % (size, fields, compiled, fields / compiled)
+	bench_batch(count * 10)
+
+
+def timed(label, f, *args):
+	start = time()
+	errors = f(*args)
+	print "  %-22s %8.3f sec, %d errors" % (label, time() - start,
+			len(errors))
+
+
+def bench_batch(rows):
+	m = create(5)
+	records = []
+	for i in xrange(rows):
+		values = dict(m._values)
+		if i % 100 == 0:
+			values["f0"] = "x"
+		records.append(values)
+	print "%d records:" % rows
+	def manips():
+		errors = []
+		for row, values in enumerate(records):
+			for e in Manip(m.model, **values).info_validate():
+				errors.append((row, e.fieldname, e.long_message))
+		return errors
+	timed("Manip.info_validate", manips)
+	timed("validate_records", validate_records, m.model, records)
+	columns = dict((key, [r.get(key) for r in records]) for key in m.model)
+	timed("validate_columns", validate_columns, m.model, columns)
+	if numpy is not None:
+		columns["f0"] = numpy.arange(rows)
+		columns["f1"] = numpy.array(columns["f1"])
+		columns["f3"] = numpy.array(columns["f3"])
+		timed("validate_columns numpy", validate_columns, m.model, columns)
+
+
+if __name__ == "__main__":
+	cli()
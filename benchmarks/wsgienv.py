@@ -0,0 +1,165 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Benchmark WSGI environ creation in L{enkel.wansgli.http}.
+
+Compares the old way of creating the environ (copy ENV, add the common
+wsgi.* entries and create a "HTTP_" key for every header on every
+request) with the template based eager environ and the
+L{enkel.wansgli.server_base.LazyHeaderEnviron}.
+
+For each variant we print the time used per request, and the number of
+environ keys which are new string objects on every request (the
+allocations saved by caching header keys).
+
+Usage
+=====
+	~$ python benchmarks/wsgienv.py [requests]
+"""
+
+from sys import argv
+from time import time
+from mimetools import Message
+from cStringIO import StringIO
+
+from enkel.wansgli.http import Server, WsgiRequestHandler
+
+
+RAW_HEADERS = "\r\n".join([
+	"Host: www.example.com",
+	"User-Agent: Mozilla/5.0 (X11; U; Linux i686; en-US; rv:1.8.1.3)",
+	"Accept: text/xml,application/xml,application/xhtml+xml,text/html",
+	"Accept-Language: nb,no;q=0.8,en-us;q=0.5,en;q=0.3",
+	"Accept-Encoding: gzip,deflate",
+	"Accept-Charset: ISO-8859-1,utf-8;q=0.7,*;q=0.7",
+	"Keep-Alive: 300",
+	"Connection: keep-alive",
+	"Cookie: sid=ax33d; name=John",
+	"Referer: http://www.example.com/",
+	"", ""])
+
+
+class BenchServer(Server):
+	""" A server which is never bound to a socket. """
+	def __init__(self, app, server_address):
+		self.app = app
+		self.server_address = server_address
+		self.RequestHandlerClass = self.REQUEST_HANDLER
+
+
+class BenchRequestHandler(WsgiRequestHandler):
+	""" A request handler which does not handle a socket. """
+	def __init__(self, server):
+		self.server = server
+
+
+def create_handler(server):
+	h = BenchRequestHandler(server)
+	h.headers = Message(StringIO(RAW_HEADERS))
+	h.client_address = ("127.0.0.1", 40000)
+	h.rfile = StringIO()
+	return h
+
+
+def old_create_env(self, method):
+	""" The create_env implementation used before the env template. """
+	env = self.ENV.copy()
+	if not (len(self.server.server_address) == 2 and \
+			isinstance(self.server.server_address[1], int)):
+		raise ValueError("can only listen to internet protocol "\
+			"server_address'es, like ('localhost', 8000).")
+	env.update({
+		"REQUEST_METHOD": method,
+		"SERVER_PROTOCOL": self.protocol_version,
+		"SERVER_NAME": self.server.server_address[0],
+		"SERVER_PORT": str(self.server.server_address[1]),
+		"CONTENT_TYPE": self.headers.get("content-type", ""),
+		"CONTENT_LENGTH": self.headers.get("content-length", ""),
+		"REMOTE_ADDR": self.client_address[0],
+		"wsgi.input": self.rfile
+	})
+	env.update({
+		"wsgi.url_scheme": self.server.url_scheme,
+		"wsgi.errors": self.server.applog,
+		"wsgi.version": (1, 0),
+		"wsgi.multithread": self.server.MULTITHREAD,
+		"wsgi.multiprocess": self.server.MULTIPROCESS,
+		"wsgi.run_once": self.server.RUN_ONCE
+	})
+	for name in self.headers:
+		value = self.headers.get(name)
+		env["HTTP_" + name.upper()] = value
+	return env
+
+
+def new_key_objects(env1, env2):
+	""" Count the keys in env2 which are not the same object as
+	the equal key in env1. """
+	keys1 = dict((k, k) for k in env1.keys())
+	return len([k for k in env2.keys() if keys1.get(k) is not k])
+
+
+def bench(label, create, count, touch):
+	start = time()
+	for i in xrange(count):
+		env = create()
+		touch(env)
+	used = time() - start
+
+	env1 = create()
+	touch(env1)
+	env2 = create()
+	touch(env2)
+	print "%-34s %7.2f usec/request   new key objects/request: %d" % (
+			label, used / count * 1000000, new_key_objects(env1, env2))
+
+
+def touch_few(env):
+	""" What a typical app does: look at one or two headers. """
+	env.get("HTTP_COOKIE")
+	env["PATH_INFO"] = "/"
+
+def touch_none(env):
+	env["PATH_INFO"] = "/"
+
+
+def cli():
+	try:
+		count = int(argv[1])
+	except IndexError:
+		count = 50000
+
+	server = BenchServer(None, ("localhost", 8000))
+	handler = create_handler(server)
+	lazy_server = BenchServer(None, ("localhost", 8000))
+	lazy_server.lazy_environ = True
+	lazy_handler = create_handler(lazy_server)
+
+	old = lambda: old_create_env(handler, "GET")
+	new = lambda: handler.create_env("GET")
+	lazy = lambda: lazy_handler.create_env("GET")
+
+	print "%d requests, %d headers" % (count, len(handler.headers.items()))
+	bench("old create_env", old, count, touch_none)
+	bench("template create_env", new, count, touch_none)
+	bench("lazy, no headers used", lazy, count, touch_none)
+	bench("lazy, HTTP_COOKIE used", lazy, count, touch_few)
+
+
+if __name__ == "__main__":
+	cli()
@@ -17,4 +17,4 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 __all__ = ["batteri", "daemonize", "exml", "model", "scripts", "settings",
 	"wansgli", "xmlutils", "cookie", "error", "i18n", "rngdata",
-	"session", "translations", "xhtml"]
+	"session", "translations", "xhtml", "cache"]
@@ -19,5 +19,5 @@
 """ Re-usable WSGI applications and middleware. """
 
 __all__ = ["admin", "auth", "staticcms",
-	"browser_route", "error_handler", "rest_route", "session",
+	"browser_route", "error_handler", "host_route", "rest_route", "session",
 	"staticfiles"]
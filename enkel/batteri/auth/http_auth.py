@@ -18,6 +18,8 @@
 
 from base64 import b64decode
 
+from enkel.wansgli.env import get_authorization
+
 from userdb_interface import AuthorizationError, DomainError
 
 USER_ENV = "enkel.batteri.auth"
@@ -57,9 +59,9 @@ class BasicHttpAuth(object):
 		If the authentcation is successful, (user, domain)
 		is placed in env[L{USER_ENV}].
 		"""
-		auth = env.get("HTTP_AUTHORIZATION")
-		if auth and auth.startswith("Basic "):
-			uname, pwd = b64decode(auth[6:]).split(":")
+		auth = get_authorization(env)
+		if auth and auth[0] == "basic":
+			uname, pwd = b64decode(auth[1]).split(":", 1)
 			try:
 				self.userdb.authenticate(env, uname, pwd, self.domain)
 			except AuthorizationError:
@@ -17,8 +17,60 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 from re import compile
 
+from enkel.cache import LruCache
+
+
+_MISSING = object()
+
+
 class BrowserRoute(object):
-	""" Route to different applications depending on browser. """
+	""" Route to different applications depending on browser.
+
+	Usage
+	=====
+		>>> def app(name):
+		... 	def app(env, start_response):
+		... 		return [name]
+		... 	return app
+		>>> route = BrowserRoute(app("default"), msie=app("msie"),
+		... 	gecko=app("gecko"), msie6=app("msie6"))
+
+		>>> env = {"HTTP_USER_AGENT":
+		... 	"Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1)"}
+		>>> route(env, None)
+		['msie6']
+		>>> env = {"HTTP_USER_AGENT": "Opera/9.23 (X11; Linux x86_64; U; en)"}
+		>>> route(env, None)
+		['default']
+		>>> route({}, None)
+		['default']
+
+	How it works
+	============
+		The patterns of the browsers in the table are combined into
+		a single alternation, ordered by L{priority}, which is
+		searched for in one pass over the user agent. When more than
+		one browser matches, the one first in priority wins. The
+		result is remembered in a L{enkel.cache.LruCache}, so
+		classifying a user agent seen recently is only a dict lookup.
+
+		>>> route.classify("Mozilla/4.0 (compatible; MSIE 7.0; Windows NT 5.1)")
+		'msie'
+		>>> route.classify("Mozilla/4.0 (compatible; MSIE 7.0; Windows NT 5.1)")
+		'msie'
+		>>> route.cache.hits, route.cache.misses # two misses in the calls above
+		(1, 3)
+
+	@cvar PATTS: Browser name to compiled regular expression. The
+			expressions are matched from the start of the user
+			agent.
+	@cvar PRIORITY: The default L{priority}. More specific browsers
+			come before less specific ones.
+	@ivar priority: The order browsers are tried in, as a tuple.
+			Setting it recompiles the pattern and clears the cache.
+	@ivar cache: The L{enkel.cache.LruCache} mapping user agents to
+			browser names.
+	"""
 	PATTS = {
 		"gecko": compile(r".*?(?<!like )(gecko|Gecko)"),
 		"khtml": compile(r".*?KHTML/"),
@@ -27,21 +79,92 @@ class BrowserRoute(object):
 		"msie7": compile(r".*?MSIE 7.0"),
 		"safari": compile(r".*?Safari"),
 	}
+	PRIORITY = ("msie6", "msie7", "msie", "safari", "khtml", "gecko")
 
-	def __init__(self, default_app, **bt):
+	def __init__(self, default_app, priority=None, cache_size=1000, **bt):
 		"""
 		@param default_app: The WSGI application used when
 			none of the "bt" entries match.
+		@param priority: The order browsers are tried in. Defaults to
+			L{PRIORITY}. Browsers in "bt" which are not in priority
+			are tried last, in alphabetical order.
+		@param cache_size: The maximum number of user agents to
+			remember.
 		@param bt: Browser->application table. Point one of
 			the keys in L{PATTS} to an WSGI application.
+		@raise ValueError: If "bt" contains a browser not in L{PATTS}.
 		"""
+		for key in bt:
+			if not key in self.PATTS:
+				raise ValueError("unsupported browser: %s" % key)
+		if priority is None:
+			priority = self.PRIORITY
 		self.default_app = default_app
 		self.bt = bt
+		self.cache = LruCache(cache_size)
+		self.set_priority(priority)
+
+	def get_priority(self):
+		return self._priority
+
+	def set_priority(self, priority):
+		""" Set L{priority}. Browsers in the table which are not in
+		priority are tried last, in alphabetical order. """
+		bt = self.bt
+		priority = tuple([key for key in priority if key in bt] +
+				sorted(key for key in bt if not key in priority))
+		alternatives = []
+		for key in priority:
+			patt = self.PATTS[key].pattern
+			if patt.startswith(".*?"):
+				patt = patt[3:] # searched for, so it can start anywhere
+			else:
+				patt = r"\A" + patt
+			alternatives.append("(?=(?P<%s>%s))" % (key, patt))
+		self._patt = compile("|".join(alternatives) or "(?!)")
+		self._rank = dict((key, i) for i, key in enumerate(priority))
+		self._priority = priority
+		self.cache.clear()
+
+	priority = property(get_priority, set_priority,
+			doc="The order browsers are tried in.")
+
+	def classify(self, user_agent):
+		""" Find the browser of a user agent.
+		@return: The name of the first browser in L{priority} which
+				matches user_agent, or None if no browser in the table
+				matches.
+		"""
+		key = self.cache.get(user_agent, _MISSING)
+		if key is _MISSING:
+			key = None
+			rank = self._rank
+			best = len(rank)
+			# every match is zero-width, and at each position the
+			# alternation picks the browser first in priority
+			for m in self._patt.finditer(user_agent):
+				r = rank[m.lastgroup]
+				if r < best:
+					key = m.lastgroup
+					best = r
+					if r == 0:
+						break
+			self.cache.set(user_agent, key)
+		return key
 
 	def __call__(self, env, start_response):
-		user_agent = env.get("HTTP_USER-AGENT")
+		user_agent = env.get("HTTP_USER_AGENT")
 		if user_agent:
-			for key, app in self.default_app.iteritems():
-				if self.PATTS[key].match(user_agent):
-					return app(env, start_response)
+			key = self.classify(user_agent)
+			if key is not None:
+				return self.bt[key](env, start_response)
 		return self.default_app(env, start_response)
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
@@ -0,0 +1,185 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Route requests to different applications depending on host name. """
+
+from enkel.cache import LruCache
+
+
+class HostRoute(object):
+	""" A virtual-host routing middleware.
+
+	Forwards requests to apps based on the host name the client
+	requested. The host is taken from HTTP_HOST, or SERVER_NAME if
+	the client did not send a Host header. Host names are case
+	insensitive, and the port is ignored.
+
+	Usage
+	=====
+		>>> def app(name):
+		... 	def app(env, start_response):
+		... 		start_response("200 OK", [("content-type", "text/plain")])
+		... 		return [name]
+		... 	return app
+
+		>>> route = HostRoute()
+		>>> route.add("example.com", app("main"))
+		>>> route.add("www.example.com", app("main"))
+		>>> route.add("*.example.com", app("users"))
+		>>> route.add("*.admin.example.com", app("admin"))
+
+		>>> from enkel.wansgli.apptester import AppTester
+		>>> AppTester(route, [], "http://WWW.example.com:8000/").run_get().body
+		'main'
+		>>> AppTester(route, [], "http://jack.example.com/").run_get().body
+		'users'
+		>>> AppTester(route, [], "http://a.b.admin.example.com/").run_get().body
+		'admin'
+		>>> AppTester(route, [], "http://example.org/").run_get().body
+		'example.org does not exist'
+
+
+	How it works
+	============
+		Hosts added without wildcards are stored in a dict, so
+		finding them is a single dict lookup. Wildcard hosts like
+		"*.example.com" are stored in another dict keyed on the
+		suffix (".example.com"). When the exact lookup fails, we
+		look up the suffixes of the host, longest first, so the
+		cost depends on the number of labels in the host name and
+		not on the number of hosts.
+
+
+	Per-host caches
+	===============
+		If a host app is a L{enkel.batteri.rest_route.RESTroute}, it
+		can be given its own route cache when added::
+
+			route.add("example.com", myroute, cache=1000)
+
+	@ivar hosts: Normalized host name to app.
+	@ivar wildcards: Suffix (with leading ".") to app.
+	@ivar default_app: The app used when no host matches, or None.
+	"""
+	def __init__(self, default_app=None):
+		"""
+		@param default_app: A WSGI app used when no host matches. If
+				None, L{handle_notfound} is used.
+		"""
+		self.hosts = {}
+		self.wildcards = {}
+		self.default_app = default_app
+
+	@staticmethod
+	def normalize(host):
+		""" Normalize a host name.
+
+			>>> HostRoute.normalize("WWW.Example.com.:8080")
+			'www.example.com'
+
+		@return: The host in lower case without port and without
+				a trailing ".".
+		"""
+		host = host.lower()
+		i = host.rfind(":")
+		if i != -1 and not host.endswith("]"): # do not split ipv6
+			host = host[:i]
+		return host.rstrip(".")
+
+	def add(self, host, app, cache=None):
+		""" Route requests for host to app.
+
+		@param host: A host name. It can start with "*." to match all
+				sub-domains (at any depth) of the rest of the host name.
+				A more specific wildcard wins over a less specific one,
+				and host names without wildcard always win over
+				wildcards.
+		@param app: A WSGI app.
+		@param cache: Give app (which must be a
+				L{enkel.batteri.rest_route.RESTroute}) this
+				L{enkel.cache.LruCache} as route cache. Can also be the
+				maximum size of a new LruCache. If 0, the route cache
+				of app is disabled. If None (the default), the cache of
+				app is not changed.
+		"""
+		if cache is not None:
+			if isinstance(cache, (int, long)):
+				if cache:
+					cache = LruCache(cache)
+				else:
+					cache = None
+			app.cache = cache
+		if host.startswith("*."):
+			self.wildcards[self.normalize(host[1:])] = app
+		else:
+			self.hosts[self.normalize(host)] = app
+
+	def find(self, host):
+		""" Find the app for a host.
+
+			>>> route = HostRoute()
+			>>> route.add("*.example.com", "wildcard")
+			>>> route.add("example.com", "exact")
+			>>> route.find("example.com"), route.find("a.example.com")
+			('exact', 'wildcard')
+			>>> route.find("example.org") is None
+			True
+
+		@param host: A normalized host name.
+		@return: The app for host, or None if no app matches.
+		"""
+		app = self.hosts.get(host)
+		if app is None and self.wildcards:
+			wildcards = self.wildcards
+			i = host.find(".")
+			while i != -1:
+				app = wildcards.get(host[i:])
+				if app is not None:
+					break
+				i = host.find(".", i + 1)
+		return app
+
+	def handle_notfound(self, env, start_response, host):
+		""" Invoked by __call__ when no app matches the host and there
+		is no L{default_app}.
+		@param env: The WSGI environ dict sent to __call__.
+		@param start_response: The start_response callable sent to __call__.
+		@param host: The normalized host name.
+		"""
+		start_response("404 not found", [("content-type", "text/plain")])
+		return ["%s does not exist" % host]
+
+	def __call__(self, env, start_response):
+		host = env.get("HTTP_HOST") or env.get("SERVER_NAME", "")
+		host = self.normalize(host)
+		app = self.find(host)
+		if app is None:
+			if self.default_app is None:
+				return self.handle_notfound(env, start_response, host)
+			app = self.default_app
+		return app(env, start_response)
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
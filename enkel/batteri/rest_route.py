@@ -18,6 +18,194 @@
 
 import re
 
+from enkel.cache import LruCache
+
+
+class Mount(object):
+	""" Marks a app added with L{RESTroute.mount}. RESTroute stores
+	these instead of the app in its route lists.
+
+	@ivar app: The mounted WSGI app.
+	"""
+	__slots__ = ("app",)
+	def __init__(self, app):
+		self.app = app
+
+	def __call__(self, env, start_response):
+		return self.app(env, start_response)
+
+
+class _TrieNode(object):
+	""" A node in a L{RouteTrie}. """
+	__slots__ = ("parent", "children", "routes", "matchers")
+	def __init__(self, parent):
+		self.parent = parent
+		self.children = {}
+		self.routes = []
+		self.matchers = None
+
+
+class RouteTrie(object):
+	""" A list of routes compiled for fast matching. Used by
+	L{RESTroute}.
+
+	Routes are placed in a trie using the "/"-separated parts of
+	the static (non-pattern) prefix of their pattern. A path can
+	only be matched by the routes on the trie-nodes found by
+	walking the trie with the parts of the path, so the rest of
+	the routes are never tried. The regular expressions of the
+	candidate routes are joined into a single alternation (split
+	into more than one if they have too many groups), and since
+	the alternatives are tried in the order the routes were added,
+	the first route added which matches the path still wins.
+
+		>>> def app(env, start_response):
+		... 	pass
+		>>> r = RESTroute()
+		>>> r.add("/{w:lang}/{d:id}", GET=app, env=dict(first=True))
+		>>> r.add("/archives/{d:year}", GET=app)
+		>>> r.add("/archives/{d:year}/{w:name}", GET=app)
+		>>> r.add("/archives/2007", GET=app)
+		>>> trie = RouteTrie(r.GET)
+
+		The first route added wins, even if a later route is more
+		specific.
+
+		>>> trie.match("/archives/2007")[0][0]
+		'/{w:lang}/{d:id}'
+		>>> trie.match("/archives/2007/hello")[1].groupdict()
+		{'name': 'hello', 'year': '2007'}
+		>>> trie.match("/en/10")[0][3]
+		{'first': True}
+		>>> trie.match("/archives/hello") is None
+		True
+
+	@cvar MAX_GROUPS: The maximum number of groups in a single
+			compiled alternation. Python 2 does not support more
+			than 100 groups in a regular expression.
+	"""
+	MAX_GROUPS = 99
+	SPECIAL_CHARS = frozenset("{[*.^$+?\\|()]}")
+	named_group_expr = re.compile(r"\(\?P<\w+>")
+
+	def __init__(self, routes):
+		"""
+		@param routes: A list of (pattern, app, compiled-regex, env)
+				tuples like the ones stored in RESTroute.GET.
+		"""
+		self.routes = list(routes)
+		self.root = _TrieNode(None)
+		for index, route in enumerate(self.routes):
+			node = self.root
+			patt = route[0]
+			if isinstance(route[1], Mount) and patt.endswith("/"):
+				patt += ">" # "/sub/" matches "/sub/x"
+			for part in self.static_parts(patt):
+				child = node.children.get(part)
+				if child is None:
+					child = node.children[part] = _TrieNode(node)
+				node = child
+			node.routes.append(index)
+
+	def __len__(self):
+		return len(self.routes)
+
+	@classmethod
+	def static_parts(cls, patt):
+		""" Get the complete "/"-separated parts of the static
+		prefix of a pattern.
+
+			>>> RouteTrie.static_parts("/archives/{d:year}")
+			['', 'archives']
+			>>> RouteTrie.static_parts("/archives/2007")
+			['', 'archives', '2007']
+			>>> RouteTrie.static_parts("/archives/2007>")
+			['', 'archives']
+			>>> RouteTrie.static_parts("*/{d:id}")
+			[]
+		"""
+		if patt.startswith("*"):
+			return []
+		prefix = patt.endswith(">")
+		if prefix:
+			patt = patt[:-1]
+		complete = not prefix
+		for i, c in enumerate(patt):
+			if c in cls.SPECIAL_CHARS:
+				patt = patt[:i]
+				complete = False
+				break
+		parts = patt.split("/")
+		if not complete:
+			del parts[-1]
+		return parts
+
+	def _compile_node(self, node):
+		indexes = []
+		n = node
+		while n is not None:
+			indexes.extend(n.routes)
+			n = n.parent
+		indexes.sort()
+
+		matchers = []
+		chunk = []
+		groups = 0
+		for index in indexes + [None]:
+			if index is None:
+				regex = None
+			else:
+				regex = self.routes[index][2]
+				if not chunk or groups + regex.groups + 1 <= self.MAX_GROUPS:
+					chunk.append(index)
+					groups += regex.groups + 1
+					continue
+			if len(chunk) == 1:
+				matchers.append((self.routes[chunk[0]][2], None,
+					self.routes[chunk[0]]))
+			elif chunk:
+				lookup = {}
+				parts = []
+				g = 1
+				for i in chunk:
+					route = self.routes[i]
+					lookup[g] = route
+					g += route[2].groups + 1
+					parts.append("(%s)" % self.named_group_expr.sub("(",
+							route[2].pattern))
+				matchers.append((re.compile("|".join(parts)), lookup, None))
+			if regex is not None:
+				chunk = [index]
+				groups = regex.groups + 1
+		return matchers
+
+	def match(self, path):
+		""" Find the first route matching path.
+		@return: (route, match-object) where route is the matching
+				(pattern, app, compiled-regex, env) tuple and match-object
+				is the result of matching the route regex against path.
+				None if no route matches.
+		"""
+		node = self.root
+		children = node.children
+		for part in path.split("/"):
+			child = children.get(part)
+			if child is None:
+				break
+			node = child
+			children = node.children
+		matchers = node.matchers
+		if matchers is None:
+			matchers = node.matchers = self._compile_node(node)
+		for regex, lookup, route in matchers:
+			m = regex.match(path)
+			if m:
+				if lookup is None:
+					return route, m
+				route = lookup[m.lastindex]
+				return route, route[2].match(path)
+		return None
+
 
 class RESTroute(object):
 	""" A RESTful routing middleware.
@@ -133,6 +321,76 @@ class RESTroute(object):
 			"([], {'year': None})"
 
 
+	Compiled routes
+	===============
+		The routes for each method are compiled into a L{RouteTrie}
+		on the first request after routes are added, so a request
+		only tries the routes which can possibly match its path.
+		The first route added which matches still wins, just as if
+		every route was tried in order.
+
+
+	Mounting apps
+	=============
+		The "/sub>" pattern above leaves SCRIPT_NAME and PATH_INFO
+		untouched, so the nested route must match the entire path
+		again. L{mount} is a better way to nest routes. It moves the
+		part of the path matched by the mount pattern from PATH_INFO
+		to SCRIPT_NAME, so apps in a mounted route only see the rest
+		of the path. The pattern only matches whole path segments,
+		so "/blog" matches "/blog" and "/blog/2007", but not "/blogs".
+
+		A mounted RESTroute should be created with
+		match_script_name=False, which makes it match patterns
+		against PATH_INFO only. Its patterns can then be anchored
+		instead of starting with "*". The routing args captured by
+		the mount pattern are kept, and the keyword args captured
+		by the mounted route are added to them. This is not special
+		to mounts. Every RESTroute keeps the "wsgiorg.routing_args"
+		it is called with, and adds its own keyword args, which
+		win over keyword args with the same name.
+
+		>>> def pathapp(env, start_response):
+		... 	start_response("200 OK", [("content-type", "text/plain")])
+		... 	return ["%(SCRIPT_NAME)s|%(PATH_INFO)s" % env]
+		>>> route = RESTroute()
+		>>> blog = RESTroute(match_script_name=False)
+		>>> blog.add("/{d:year}", GET=pathapp)
+		>>> route.mount("/{w:user}/blog", blog)
+
+		>>> t = AppTester(route, [], "http://example.com/jack/blog/2007")
+		>>> t.run_get().body
+		'/jack/blog|/2007'
+
+		>>> blog.add("/{d:year}/{w:title}", GET=app)
+		>>> t = AppTester(route, [], "http://example.com/jack/blog/2007/hi")
+		>>> t.run_get().body
+		"([], {'title': 'hi', 'user': 'jack', 'year': '2007'})"
+
+
+	Caching matches
+	===============
+		When a few paths make up most of the requests, you can make
+		RESTroute remember the result of matching them in a
+		L{enkel.cache.LruCache}::
+
+			route = RESTroute(cache=1000)
+
+		The cache is keyed on the route and (method, path). Only
+		paths which match a route are cached, so requests for
+		paths which do not exist can not push the popular paths out
+		of the cache. A cached match is used without looking at the
+		routes unless the number of routes for the method has
+		changed since it was cached. The cache is cleared when the
+		routes are compiled again after routes are added, and the
+		hits and misses
+		attributes of the cache tells you if it pays off. Nested
+		routes do not use a cache unless they are given one. They can
+		share the cache of the parent to use a single size limit::
+
+			subroute = RESTroute(cache=route.cache)
+
+
 	Adding your own types
 	=====================
 		An example of adding a type which matches our own narrow
@@ -148,6 +406,11 @@ class RESTroute(object):
 
 	@ivar echo: If True, print some info about the patterns added
 			with L{add}.
+	@ivar cache: The L{enkel.cache.LruCache} used to remember
+			matches, or None.
+	@ivar match_script_name: If True, patterns are matched against
+			SCRIPT_NAME + PATH_INFO. If False, they are matched against
+			PATH_INFO only. See L{mount}.
 	@ivar types: A mapping of keywords to regular-expressions. Every
 			node is a pair of (type-identifyer, regular-expression).
 			Type-identifyers:
@@ -161,11 +424,25 @@ class RESTroute(object):
 	"""
 	type_expr = re.compile("\{([a-z]+):(\w+)\}")
 	opt_expr = re.compile("\[([^\]]+)\]")
-	def __init__(self):
+	def __init__(self, cache=None, match_script_name=True):
+		"""
+		@param cache: Cache matches in this L{enkel.cache.LruCache}.
+				Can also be the maximum size of a new LruCache. No
+				caching is done if this is None (the default) or 0.
+		@param match_script_name: See L{match_script_name}.
+		"""
+		if isinstance(cache, (int, long)):
+			if cache:
+				cache = LruCache(cache)
+			else:
+				cache = None
+		self.cache = cache
+		self.match_script_name = match_script_name
 		self.GET = []
 		self.POST = []
 		self.DELETE = []
 		self.PUT = []
+		self._tries = {}
 		self.echo = False
 		self.types = dict(
 			d = r"\d+",
@@ -227,9 +504,121 @@ class RESTroute(object):
 			app = l[method]
 			if app:
 				getattr(self, method).append((patt, app, re.compile(r), env))
+				if method in self._tries:
+					self._tries[method] = None # compile again
 				if self.echo:
 					print "%s  %s  %s" % (method, patt, r)
 
+	def mount(self, patt, app, env={},
+			methods=("GET", "POST", "PUT", "DELETE")):
+		""" Mount a app at the path matched by patt.
+
+		When a path starts with the path-segments matched by patt,
+		the matched part of the path is moved from PATH_INFO to
+		SCRIPT_NAME before app is called. Mounts are tried in the
+		same order as the routes added with L{add}. See the
+		"Mounting apps" section in the class documentation.
+
+		@param patt: The pattern, without ">" at the end.
+		@param app: A WSGI app, usually a RESTroute created with
+				match_script_name=False.
+		@param env: Extra environ values, just like in L{add}.
+		@param methods: The request methods to mount app for.
+		"""
+		r = self._patt_to_re(patt + ">")
+		if not patt.endswith("/"):
+			r += "(?=/|$)"
+		mounted = Mount(app)
+		for method in methods:
+			getattr(self, method).append((patt, mounted, re.compile(r), env))
+			if method in self._tries:
+				self._tries[method] = None # compile again
+			if self.echo:
+				print "%s  %s  %s" % (method, patt, r)
+
+	def compile(self, method):
+		""" Get the L{RouteTrie} for the routes of the given method.
+
+		The trie is created when needed and reused until routes are
+		added to the method, either with L{add} and L{mount} or by
+		appending to the route list. The match cache is cleared
+		when the trie is created again. You do not have to call
+		this, as it is done by L{match}, but you can use it to
+		avoid compiling the routes during the first request.
+		"""
+		routes = getattr(self, method)
+		tries = self._tries
+		trie = tries.get(method)
+		if trie is None or len(trie) != len(routes):
+			if method in tries and self.cache is not None:
+				self.cache.clear()
+			trie = tries[method] = RouteTrie(routes)
+		return trie
+
+	def match(self, method, path):
+		""" Find the app which should handle a request.
+
+			>>> def app(env, start_response):
+			... 	pass
+			>>> r = RESTroute()
+			>>> r.add("/{d:year}/{w:title}", GET=app, env={"x": 1})
+			>>> r.match("GET", "/2007/hello") == (app,
+			... 	{'year': '2007', 'title': 'hello'}, {"x": 1})
+			True
+			>>> r.match("GET", "/hello") is None
+			True
+			>>> r.match("POST", "/2007/hello") is None
+			True
+
+			With a cache.
+
+			>>> r = RESTroute(cache=100)
+			>>> r.add("/{d:year}/{w:title}", GET=app)
+			>>> r.match("GET", "/2007/hello")[1]
+			{'year': '2007', 'title': 'hello'}
+			>>> r.match("GET", "/2007/hello")[1]
+			{'year': '2007', 'title': 'hello'}
+			>>> r.cache.hits, r.cache.misses
+			(1, 1)
+
+		@param method: The request method.
+		@param path: The path to match (SCRIPT_NAME + PATH_INFO).
+		@return: (app, routing-kwargs, extra-env). None if no
+				route matches.
+		"""
+		result = self._match(method, path)
+		if result:
+			return result[:3]
+		return None
+
+	def _match(self, method, path):
+		""" Like L{match}, but returns a (app, routing-kwargs, extra-env,
+		mount-end) tuple, where mount-end is the number of characters of
+		path matched by a mount pattern, or None if the route was not
+		added with L{mount}. """
+		cache = self.cache
+		if cache is not None:
+			key = (self, method, path)
+			result = cache.get(key)
+			if result is not None and \
+					result[4] == len(getattr(self, method)):
+				return result[0], result[1].copy(), result[2], result[3]
+
+		trie = self.compile(method)
+		result = trie.match(path)
+		if result is None:
+			return None # misses are not cached
+		route, m = result
+		app = route[1]
+		if isinstance(app, Mount):
+			result = app.app, m.groupdict(), route[3], m.end()
+		else:
+			result = app, m.groupdict(), route[3], None
+		if cache is not None:
+			cache.set(key, (result[0], result[1].copy(), result[2],
+					result[3], len(trie)))
+		return result
+
 	def handle_notfound(self, env, start_response, path):
 		""" Invoked by __call__ when a path with no application
 		are requested.
@@ -241,15 +630,26 @@ class RESTroute(object):
 		return ["%s does not exist" % path]
 
 	def __call__(self, env, start_response):
-		path = env["SCRIPT_NAME"] + env["PATH_INFO"]
-		match = None
-		for p, app, r, extra_env in getattr(self, env["REQUEST_METHOD"]):
-			match = r.match(path)
-			if match:
-				kw = match.groupdict()
-				env["wsgiorg.routing_args"] = ([], kw)
-				env.update(extra_env)
-				return app(env, start_response)
+		if self.match_script_name:
+			prefix = ""
+			path = env["SCRIPT_NAME"] + env["PATH_INFO"]
+		else:
+			prefix = env["SCRIPT_NAME"]
+			path = env["PATH_INFO"]
+		match = self._match(env["REQUEST_METHOD"], path)
+		if match:
+			app, kw, extra_env, end = match
+			if end is not None:
+				env["SCRIPT_NAME"] = prefix + path[:end]
+				env["PATH_INFO"] = path[end:]
+			args, parent_kw = env.get("wsgiorg.routing_args", ([], {}))
+			if parent_kw:
+				parent_kw = parent_kw.copy()
+				parent_kw.update(kw)
+				kw = parent_kw
+			env["wsgiorg.routing_args"] = (list(args), kw)
+			env.update(extra_env)
+			return app(env, start_response)
 		return self.handle_notfound(env, start_response, path)
 
 
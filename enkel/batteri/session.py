@@ -16,22 +16,198 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+from time import time
+
 from enkel.cookie import Cookie, get_cookies
 from enkel.session.backend import NoSuchSessionError
+from enkel.session.memory import seconds
+
+
+class LazySession(object):
+	""" A dict-like session which is not loaded from the backend
+	until it is used, and which remembers if it has been changed.
+
+	Usage
+	=====
+		>>> from enkel.session.memory import MemorySession
+		>>> b = MemorySession()
+		>>> b.save("xxAb", {"name": "John"})
+
+		>>> s = LazySession(b, "xxAb")
+		>>> s.loaded, s.dirty
+		(False, False)
+		>>> s["name"]
+		'John'
+		>>> s.loaded, s.dirty
+		(True, False)
+		>>> s["age"] = 20
+		>>> s.dirty
+		True
+
+		Changes to values stored in the session, like appending to
+		a list, are not detected. Call L{mark_dirty} after such
+		changes.
+
+		>>> s = LazySession(b, "xxAb")
+		>>> s.setdefault("items", []).append(1) # setdefault marks dirty
+		>>> s.dirty
+		True
+
+		A new session is created if the session does not exist.
+
+		>>> s = LazySession(b, "nothere")
+		>>> len(s), s.new, s.sid != "nothere"
+		(0, True, True)
+
+	@ivar backend: The session backend.
+	@ivar sid: The session id. Changes if the session does not exist
+			when it is loaded.
+	@ivar new: True if this is a new session.
+	@ivar dirty: True if the session has been changed.
+	"""
+	__slots__ = ("backend", "sid", "new", "dirty", "_data")
+
+	def __init__(self, backend, sid=None):
+		"""
+		@param backend: The session backend.
+		@param sid: The session id, or None to create a new session.
+		"""
+		self.backend = backend
+		self.dirty = False
+		if sid is None:
+			self._new_session()
+		else:
+			self.sid = sid
+			self.new = False
+			self._data = None
+
+	def _new_session(self):
+		self.sid = self.backend.generate_sid()
+		self.new = True
+		self._data = {}
+
+	def _load(self):
+		try:
+			self._data = self.backend.load(self.sid)
+		except NoSuchSessionError:
+			self._new_session()
+		return self._data
+
+	def get_data(self):
+		""" Get the dict containing the session, loading it if needed. """
+		data = self._data
+		if data is None:
+			data = self._load()
+		return data
+
+	def is_loaded(self):
+		return self._data is not None
+	loaded = property(is_loaded, doc="True if the session is loaded.")
+
+	def mark_dirty(self):
+		""" Mark the session as changed, so that it is saved. """
+		self.get_data()
+		self.dirty = True
+
+	def __getitem__(self, key):
+		return self.get_data()[key]
+
+	def get(self, key, default=None):
+		return self.get_data().get(key, default)
+
+	def __contains__(self, key):
+		return key in self.get_data()
+
+	def has_key(self, key):
+		return key in self.get_data()
+
+	def __iter__(self):
+		return iter(self.get_data())
 
+	def __len__(self):
+		return len(self.get_data())
 
-class StartResponseWrapper(object):
-	""" Used by SessionMiddleware. """
-	def __init__(self, start_response, cookie):
-		self.start_response = start_response
-		self.cookie = cookie
+	def keys(self):
+		return self.get_data().keys()
 
-	def __call__(self, status, headers, exc_info=None):
-		headers.append(self.cookie.get_httpheader())
-		return self.start_response(status, headers, exc_info)
+	def values(self):
+		return self.get_data().values()
 
+	def items(self):
+		return self.get_data().items()
 
-class SessionMiddleware(object):
+	def iterkeys(self):
+		return self.get_data().iterkeys()
+
+	def itervalues(self):
+		return self.get_data().itervalues()
+
+	def iteritems(self):
+		return self.get_data().iteritems()
+
+	def copy(self):
+		return self.get_data().copy()
+
+	def __repr__(self):
+		return repr(self.get_data())
+
+	def __setitem__(self, key, value):
+		self.get_data()[key] = value
+		self.dirty = True
+
+	def __delitem__(self, key):
+		del self.get_data()[key]
+		self.dirty = True
+
+	def clear(self):
+		self.get_data().clear()
+		self.dirty = True
+
+	def update(self, *args, **kw):
+		self.get_data().update(*args, **kw)
+		self.dirty = True
+
+	def setdefault(self, key, default=None):
+		self.dirty = True
+		return self.get_data().setdefault(key, default)
+
+	def pop(self, key, *default):
+		self.dirty = True
+		return self.get_data().pop(key, *default)
+
+	def popitem(self):
+		self.dirty = True
+		return self.get_data().popitem()
+
+
+class _CookieMiddleware(object):
+	""" The cookie handling shared by L{SessionMiddleware} and
+	L{CookieSessionMiddleware}. """
+	ENV_KEY = "enkel.session"
+	def __init__(self, app, timeout, cookiename, cookiedomain,
+				cookiepath, refresh_interval):
+		self.app = app
+		self.cookiename = cookiename
+		self.cookiedomain = cookiedomain
+		self.cookiepath = cookiepath
+		if refresh_interval is None:
+			refresh_interval = timeout // 10
+		self.refresh_interval = seconds(refresh_interval)
+
+	def make_cookie(self, value, timeout):
+		""" Create a session cookie.
+		@param value: The value of the cookie.
+		@param timeout: The lifetime of the cookie.
+		@type timeout: datetime.timedelta
+		"""
+		cookie = Cookie(self.cookiename, value)
+		cookie.path = self.cookiepath
+		cookie.domain = self.cookiedomain
+		cookie.set_timeout(timeout)
+		return cookie
+
+
+class SessionMiddleware(_CookieMiddleware):
 	""" A session middleware.
 
 	Test/Example
@@ -40,12 +216,12 @@ class SessionMiddleware(object):
 		>>> from enkel.session.memory import MemorySession
 
 		>>> def myapp(env, start_response):
-		... 	start_response("200 OK", [("Content-type", "text/plain")])
 		... 	session = env["enkel.session"]
 		... 	if "num" in session:
 		... 		session["num"] += 1
 		... 	else:
 		... 		session["num"] = 0
+		... 	start_response("200 OK", [("Content-type", "text/plain")])
 		... 	return ["This is call number %(num)d to this app" % session]
 
 		>>> class MyBackend(MemorySession):
@@ -63,11 +239,34 @@ class SessionMiddleware(object):
 		>>> t.run_get().body
 		'This is call number 1 to this app'
 
+	Lazy loading and saving
+	=======================
+		The session in the environ is a L{LazySession}. It is only
+		loaded from the backend if the application uses it, or if
+		the cookie is refreshed, and only saved if the application
+		changes it. Changing a value stored in the session, like
+		appending to a list, is not detected, so call
+		L{LazySession.mark_dirty} after such changes.
+
+		The session is saved after the response has been sent, but
+		the cookie is sent with the headers. A cookie for a new
+		session (when the request has no cookie, or the session in
+		the cookie does not exist) is only sent if the session is
+		changed before start_response is called. Otherwise the new
+		session is not saved, since the client would never send its
+		sid back.
+
+		The cookie contains the time it was created, and it is only
+		sent again when it is older than refresh_interval. When it
+		is sent, the timeout of unchanged sessions is restarted with
+		L{enkel.session.backend.SessionBackend.touch}, so sessions
+		in use never expire as long as refresh_interval is shorter
+		than the timeout of the backend.
+
 	@cvar ENV_KEY: The environ key used to contain the session.
 	"""
-	ENV_KEY = "enkel.session"
 	def __init__(self, app, backend, cookiename="sid",
-				cookiedomain=None, cookiepath="/"):
+				cookiedomain=None, cookiepath="/", refresh_interval=None):
 		"""
 		@param app: A WSGI application.
 		@param backend: A session backend following the
@@ -75,46 +274,176 @@ class SessionMiddleware(object):
 		@param cookiename: The name of the session cookie.
 		@param cookiedomain: See L{enkel.cookie.Cookie.domain}.
 		@param cookiepath: See L{enkel.cookie.Cookie.path}.
+		@param refresh_interval: The minimum time between updates of
+				the cookie and the timeout of a unchanged session.
+				Defaults to a tenth of the backend timeout.
+		@type refresh_interval: datetime.timedelta
 		"""
-		self.app = app
+		_CookieMiddleware.__init__(self, app, backend.timeout, cookiename,
+				cookiedomain, cookiepath, refresh_interval)
 		self.backend = backend
-		self.cookiename = cookiename
-		self.cookiedomain = cookiedomain
-		self.cookiepath = cookiepath
+
+	def create_cookie(self, sid, now):
+		""" Create the session cookie.
+		@param sid: The session id.
+		@param now: The current time (time.time()).
+		"""
+		return self.make_cookie("%s.%x" % (sid, int(now)),
+				self.backend.timeout)
 
 	def __call__(self, env, start_response):
+		now = time()
 
 		# import info from cookie
 		cookies = get_cookies(env)
-		session = None
+		sid = None
+		refresh = True
 		if cookies and self.cookiename in cookies:
+			sid, sep, created = cookies[self.cookiename].partition(".")
 			try:
-				sid = cookies[self.cookiename]
-			except KeyError:
+				refresh = now - int(created, 16) >= self.refresh_interval
+			except ValueError:
 				pass
-			else:
-				try:
-					session = self.backend.load(sid)
-				except NoSuchSessionError:
-					pass
-
-		if session == None:
-			session = dict()
-			sid = self.backend.generate_sid()
+		session = LazySession(self.backend, sid or None)
 		env[self.ENV_KEY] = session
+		client_sid = [sid or None] # the sid in the cookie of the client
 
-		# create new cookie
-		cookie = Cookie(self.cookiename, sid)
-		cookie.path = self.cookiepath
-		cookie.domain = self.cookiedomain
-		cookie.set_timeout(self.backend.timeout)
+		def sr(status, headers, exc_info=None):
+			if refresh and not session.loaded:
+				# the sid changes if the session does not exist
+				session.get_data()
+			if session.new:
+				send = session.dirty
+			else:
+				send = refresh
+			if send:
+				cookie = self.create_cookie(session.sid, now)
+				headers.append(cookie.get_httpheader())
+				client_sid[0] = session.sid
+			return start_response(status, headers, exc_info)
 
 		# run app
-		sr = StartResponseWrapper(start_response, cookie)
 		for buf in self.app(env, sr):
 			yield buf
-		self.backend.save(sid, session)
+		if session.sid != client_sid[0]:
+			return # the client has no cookie for this session
+		if session.dirty:
+			self.backend.save(session.sid, session.get_data())
+		elif refresh and not session.new:
+			if session.loaded:
+				self.backend.save(session.sid, session.get_data())
+			else:
+				self.backend.touch(session.sid)
+
+
+
+class CookieSession(LazySession):
+	""" A L{LazySession} stored in a cookie, used by
+	L{CookieSessionMiddleware}.
+
+	@ivar backend: The L{enkel.session.signedcookie.SignedCookieCodec}.
+	@ivar value: The value of the cookie, or None.
+	@ivar server_sid: The id of the session in the fallback backend
+			of the codec, or None.
+	@ivar created: The time (time.time()) the cookie was created,
+			or None.
+	"""
+	__slots__ = ("value", "server_sid", "created")
+
+	def __init__(self, codec, value=None):
+		self.value = value
+		self.server_sid = None
+		self.created = None
+		LazySession.__init__(self, codec, value)
+
+	def _new_session(self):
+		self.sid = None
+		self.new = True
+		self._data = {}
+
+	def _load(self):
+		try:
+			self._data, self.server_sid, self.created = \
+					self.backend.decode(self.value)
+		except NoSuchSessionError:
+			self._new_session()
+		return self._data
+
+
+class CookieSessionMiddleware(_CookieMiddleware):
+	""" A session middleware storing the session in a signed cookie
+	instead of on the server.
+
+	Example
+	=======
+		>>> from enkel.wansgli.apptester import AppTester
+		>>> from enkel.session.signedcookie import SignedCookieCodec
+
+		>>> def myapp(env, start_response):
+		... 	session = env["enkel.session"]
+		... 	session["num"] = session.get("num", -1) + 1
+		... 	start_response("200 OK", [("Content-type", "text/plain")])
+		... 	return ["This is call number %(num)d to this app" % session]
+
+		>>> codec = SignedCookieCodec(["my secret"])
+		>>> sessionapp = CookieSessionMiddleware(myapp, codec)
+
+		>>> r = AppTester(sessionapp).run_get()
+		>>> r.body
+		'This is call number 0 to this app'
+
+		>>> t = AppTester(sessionapp)
+		>>> t.set_env("HTTP_COOKIE", r.headers["set-cookie"].split(";")[0])
+		>>> t.run_get().body
+		'This is call number 1 to this app'
+
+	The session is a L{CookieSession}, which is only decoded if the
+	application uses it. The cookie is sent with the headers, so
+	changes to the session after start_response is called are lost.
+	A new cookie is sent if the session is changed, or if the
+	application uses the session and the cookie is older than
+	refresh_interval.
+	"""
+	def __init__(self, app, codec, cookiename="session",
+				cookiedomain=None, cookiepath="/", refresh_interval=None):
+		"""
+		@param codec: A
+				L{enkel.session.signedcookie.SignedCookieCodec}.
+		@param refresh_interval: The minimum time between updates of
+				a unchanged session cookie. Defaults to a tenth of the
+				codec timeout.
+
+		See L{SessionMiddleware.__init__} for the other parameters.
+		"""
+		_CookieMiddleware.__init__(self, app, codec.timeout, cookiename,
+				cookiedomain, cookiepath, refresh_interval)
+		self.codec = codec
+
+	def create_cookie(self, value, now):
+		""" Create the session cookie.
+		@param value: The encoded session.
+		@param now: The current time (time.time()).
+		"""
+		return self.make_cookie(value, self.codec.timeout)
+
+	def __call__(self, env, start_response):
+		cookies = get_cookies(env)
+		value = None
+		if cookies:
+			value = cookies.get(self.cookiename)
+		session = CookieSession(self.codec, value)
+		env[self.ENV_KEY] = session
+
+		def sr(status, headers, exc_info=None):
+			now = time()
+			if session.dirty or (session.loaded and not session.new and
+					now - session.created >= self.refresh_interval):
+				value = self.codec.encode(session.get_data(),
+						session.server_sid)
+				headers.append(self.create_cookie(value, now).get_httpheader())
+			return start_response(status, headers, exc_info)
 
+		return self.app(env, sr)
 
 
 def suite():
@@ -17,43 +17,391 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 from re import compile
-from os.path import join, isfile, isdir, islink
-from os import listdir
+from os.path import join
+from os import listdir, fstat, stat, lstat
+from stat import S_ISDIR, S_ISREG, S_ISLNK
+from time import time
 from mimetypes import guess_type
 from cStringIO import StringIO
-from xml.sax.saxutils import quoteattr
+from xml.sax.saxutils import escape
+from urlparse import parse_qs
+from mmap import mmap, ACCESS_READ
+from random import getrandbits
+from gzip import GzipFile
+from datetime import datetime
+
+from enkel.wansgli.utils import parse_http_date, rfc1123_date
+from enkel.wansgli.env import accepts_encoding
+from enkel.cache import LruCache
+
+
+def parse_range(value, size):
+	""" Parse a http Range header.
+
+	Example
+	=======
+		>>> parse_range("bytes=0-499", 10000)
+		[(0, 499)]
+		>>> parse_range("bytes=9500-", 10000)
+		[(9500, 9999)]
+		>>> parse_range("bytes=-500", 10000)
+		[(9500, 9999)]
+		>>> parse_range("bytes=0-0, -1, 9990-20000", 10000)
+		[(0, 0), (9999, 9999), (9990, 9999)]
+
+		Ranges starting after the end of the file are not satisfiable.
+
+		>>> parse_range("bytes=20000-", 10000)
+		[]
+
+		Invalid headers must be ignored.
+
+		>>> parse_range("bytes=500-100", 10000) is None
+		True
+		>>> parse_range("items=0-1", 10000) is None
+		True
+
+	@param value: The value of the Range header.
+	@param size: The size of the file.
+	@return: A list of (first-byte, last-byte) pairs, where both
+			positions are included in the range. The list is empty if
+			none of the ranges can be satisfied. None if the header is
+			not a valid byte range header.
+	"""
+	unit, sep, spec = value.partition("=")
+	if not sep or unit.strip().lower() != "bytes":
+		return None
+	ranges = []
+	for item in spec.split(","):
+		item = item.strip()
+		if not item:
+			continue
+		first, sep, last = item.partition("-")
+		first = first.strip()
+		last = last.strip()
+		if not sep or (first and not first.isdigit()) or \
+				(last and not last.isdigit()) or not (first or last):
+			return None
+		if first:
+			first = int(first)
+			if last:
+				last = int(last)
+				if last < first:
+					return None
+			else:
+				last = size - 1
+		else:
+			length = int(last)
+			if length == 0:
+				continue
+			first = max(size - length, 0)
+			last = size - 1
+		if first < size:
+			ranges.append((first, min(last, size - 1)))
+	return ranges
+
+
+def make_etag(st):
+	""" Create a strong ETag from a os.stat() result.
+	@return: A quoted string created from the inode, size and
+			modification time of the file. The modification time is
+			in microseconds, so files rewritten within a second get
+			a new ETag.
+	"""
+	return '"%x-%x-%x"' % (st.st_ino, st.st_size,
+			int(st.st_mtime * 1000000))
+
+
+def etag_matches(value, etag):
+	""" Check if a If-None-Match header matches a ETag. Weak
+	comparison is used, as required for If-None-Match.
+
+	Example
+	=======
+		>>> etag_matches('"a", W/"b"', '"b"')
+		True
+		>>> etag_matches('*', '"b"')
+		True
+		>>> etag_matches('"a"', '"b"')
+		False
+
+	@param value: The value of the If-None-Match header.
+	@param etag: The quoted ETag of the current version of the file.
+	"""
+	for item in value.split(","):
+		item = item.strip()
+		if item.startswith("W/"):
+			item = item[2:]
+		if item == etag or item == "*":
+			return True
+	return False
 
 
 class _FileIter(object):
-	def __init__(self, path, buffersize):
-		self.path = path
+	def __init__(self, f, buffersize):
+		self.f = f
 		self.buffersize = buffersize
 
 	def __iter__(self):
-		self.f = open(self.path, "rb")
 		return self
 
 	def next(self):
-		while True:
-			block = self.f.read(self.buffersize)
-			if not block:
-				raise StopIteration
-			return block
+		block = self.f.read(self.buffersize)
+		if not block:
+			raise StopIteration
+		return block
+
+	def close(self):
+		self.f.close()
+
+
+class _RangeIter(object):
+	""" Iterates over strings and byte ranges of a memory mapped
+	file. The ranges are sliced from the map, so the bytes outside
+	the ranges are never read. """
+	def __init__(self, m, parts, buffersize, f=None):
+		"""
+		@param m: A mmap.mmap object.
+		@param parts: A list where every item is a string or a
+				(first-byte, last-byte) pair.
+		@param buffersize: The maximum size of the blocks sliced from
+				the map.
+		@param f: If not None, "m" and this file is closed when
+				the response is closed.
+		"""
+		self.map = m
+		self.parts = parts
+		self.buffersize = buffersize
+		self.f = f
+
+	def __iter__(self):
+		m = self.map
+		buffersize = self.buffersize
+		for part in self.parts:
+			if isinstance(part, str):
+				yield part
+				continue
+			pos, end = part[0], part[1] + 1
+			while pos < end:
+				yield m[pos:min(pos + buffersize, end)]
+				pos += buffersize
 
 	def close(self):
-		if hasattr(self, "f"):
+		if self.f is not None:
+			self.map.close()
 			self.f.close()
 
 
+class FileInfo(object):
+	""" Metadata about a file or folder served by L{StaticFiles}.
+
+	@ivar path: The path on the filesystem.
+	@ivar st: The os.stat() result.
+	@ivar isdir: True if this is a folder.
+	@ivar content_type: The content-type of the file, or None for folders.
+	@ivar size: The number of bytes to send.
+	@ivar etag: The ETag of the file (see L{make_etag}).
+	@ivar map: A read-only mmap.mmap of the entire file, or a string
+			with the data to send. None if the file must be opened.
+	@ivar checked: The time (time.time()) when st was last checked.
+	@ivar encoding: The content-encoding of the data, or None.
+	@ivar vary: True if the response depends on the Accept-Encoding
+			header.
+	@ivar variant: Used by StaticFiles to remember the precompressed
+			variant of the file.
+	@ivar cache_control: The value of the Cache-Control header, or None.
+	@ivar headers: Precomputed headers for a "200 OK" response, or None.
+	"""
+	__slots__ = ("path", "st", "isdir", "content_type", "size", "etag",
+			"map", "checked", "encoding", "vary", "variant",
+			"cache_control", "headers", "_last_modified")
+
+	def __init__(self, path, st, content_type, encoding=None, vary=False):
+		self.path = path
+		self.st = st
+		self.isdir = S_ISDIR(st.st_mode)
+		self.content_type = content_type
+		self.size = st.st_size
+		self.etag = make_etag(st)
+		self.map = None
+		self.checked = time()
+		self.encoding = encoding
+		self.vary = vary
+		self.variant = None
+		self.cache_control = None
+		self.headers = None
+		self._last_modified = None
+
+	def with_stat(self, st):
+		""" Create a copy of this info for another version of the file.
+		@param st: The os.stat() result of the new version.
+		"""
+		info = FileInfo(self.path, st, self.content_type, self.encoding,
+				self.vary)
+		info.cache_control = self.cache_control
+		return info
+
+	def get_last_modified(self):
+		""" Get the modification time of the file formatted for the
+		Last-Modified header. """
+		if self._last_modified is None:
+			self._last_modified = rfc1123_date(
+					datetime.utcfromtimestamp(int(self.st.st_mtime)))
+		return self._last_modified
+
+	def same_file(self, st):
+		""" Check if st is a os.stat() result for the same version of
+		the file as this info. """
+		old = self.st
+		return old.st_mtime == st.st_mtime and old.st_size == st.st_size \
+				and old.st_ino == st.st_ino and old.st_mode == st.st_mode
+
+
+class _ListingIter(object):
+	""" Iterates over the HTML of a directory listing, yielding a
+	block of lines at a time. """
+	def __init__(self, title, entries, page, pages, blocksize=200):
+		self.title = title
+		self.entries = entries
+		self.page = page
+		self.pages = pages
+		self.blocksize = blocksize
+
+	def __iter__(self):
+		title = escape(self.title)
+		yield "<html><body>\n<h1>%s</h1>\n<ul>\n" % title
+		block = []
+		for fn, isdir in self.entries:
+			fn = escape(fn, {"'": "&#39;"})
+			if isdir:
+				block.append("\t<li style='font-weight: bold;'>"
+						"<a href='%s/'>%s/</a></li>\n" % (fn, fn))
+			else:
+				block.append("\t<li><a href='%s'>%s</a></li>\n" % (fn, fn))
+			if len(block) == self.blocksize:
+				yield "".join(block)
+				block = []
+		block.append("</ul>\n")
+		if self.pages > 1:
+			block.append("<p>")
+			if self.page > 1:
+				block.append("<a href='?page=%d'>previous</a> " %
+						(self.page - 1))
+			block.append("page %d of %d" % (self.page, self.pages))
+			if self.page < self.pages:
+				block.append(" <a href='?page=%d'>next</a>" %
+						(self.page + 1))
+			block.append("</p>\n")
+		block.append("</body></html>\n")
+		yield "".join(block)
+
+
 class StaticFiles(object):
 	""" A WSGI static file/folder serving application.
 
+	Byte ranges
+	===========
+		Single and multiple byte ranges (the Range header) are
+		supported, and so is If-Range. Ranges are sliced from a
+		memory map of the file, so skipping to the middle of a large
+		file does not read the bytes before it.
+
+	Metadata cache
+	==============
+		Looking up a file costs a single stat, and serving it an
+		open and a fstat. With cache_size set, the metadata
+		(L{FileInfo}) of recently requested files is remembered in a
+		L{enkel.cache.LruCache}, so the stat, content-type and ETag
+		are reused. A cached entry is checked with stat again when it
+		is more than cache_ttl seconds old, and every time the file
+		is opened its fstat is compared to the cached info.
+
+		With cache_fds, the cache also keeps a memory map of every
+		cached file, so serving it requires no system calls at all.
+		Only use this when files are replaced by renaming a new file
+		in place. Truncating a mapped file makes the process crash
+		when the removed pages are read.
+
+	Memory cache
+	============
+		With memory_cache set, the contents of files no larger than
+		L{MEMORY_MAX_SIZE} are kept in memory, together with the
+		headers of their "200 OK" response, within a budget of
+		memory_cache bytes. The least recently used files are
+		evicted first. A cached file is used as long as it has the
+		same modification time, size and inode as the file found
+		when looking up the requested path, so combine this with
+		cache_size to avoid the stat on every request.
+
+	Directory listings
+	==================
+		Folders are listed with sub-folders first, and each group
+		sorted by name. Listings are split into pages of
+		listing_page_size entries, selected with the "page" query
+		string parameter, and the HTML is sent while it is generated.
+		With listing_cache set, the sorted entries of that many
+		folders are cached, and reused until the modification time
+		of the folder changes.
+
+	Conditional requests
+	====================
+		Files are sent with ETag and Last-Modified headers, and
+		GET and HEAD requests with a matching If-None-Match or
+		If-Modified-Since header get a "304 Not Modified" response
+		without a body. If-None-Match takes precedence over
+		If-Modified-Since, as required by rfc 2616.
+
+		The Cache-Control header is set using the cache_control
+		parameter, a list of (pattern, value) pairs. The value of
+		the first pair with a regular expression matching the
+		path of the file (relative to root_folder) is used:
+
+			>>> app = StaticFiles("/my/shared/folder", cache_control=[
+			... 	(r"static/.*\.(css|js|png)$", "public, max-age=86400"),
+			... 	(r".*", "no-cache")])
+
+	Compression
+	===========
+		Clients which accept gzip can get compressed versions of
+		files with a content-type matching L{COMPRESSIBLE_TYPES}.
+		With precompressed=True, "foo.css.gz" is sent instead of
+		"foo.css" when it exists and is not older than "foo.css".
+		With compress_cache set, compressible files without such a
+		sibling are compressed once and kept in memory, within a
+		budget of compress_cache bytes.
+
+		Responses for compressible files have a "vary: accept-encoding"
+		header. Byte ranges of compressed responses are ranges of the
+		compressed data, and requests for more than one range of
+		compressed data get the entire response.
+
 	@cvar DEFAULT_CONTENT_TYPE: The default content-type used when
 			content-type cannot be guessed.
+	@cvar MAX_RANGES: Requests for more ranges than this get the
+			entire file.
+	@cvar COMPRESSIBLE_TYPES: Compiled regular expression matching
+			the content-types which are worth compressing.
+	@cvar COMPRESS_LEVEL: The gzip compression level used to
+			compress files for the compress_cache.
+	@cvar COMPRESS_MAX_SIZE: Files larger than this are not
+			compressed for the compress_cache.
+	@cvar MEMORY_MAX_SIZE: Files larger than this are not kept in
+			the memory_cache.
+	@ivar cache: The L{enkel.cache.LruCache} used to cache
+			L{FileInfo} objects, or None.
 	"""
 	DEFAULT_CONTENT_TYPE = "application/octet-stream"
+	MAX_RANGES = 50
+	COMPRESSIBLE_TYPES = compile(r"text/|application/(x-)?javascript$|"
+			r"application/(.+\+)?(xml|json)$|image/svg\+xml$")
+	COMPRESS_LEVEL = 6
+	COMPRESS_MAX_SIZE = 1024 * 1024
+	MEMORY_MAX_SIZE = 64 * 1024
 	def __init__(self, root_folder, prefix="",
-				pattern=".*", buffersize=2048, follow_symlinks=False):
+				pattern=".*", buffersize=2048, follow_symlinks=False,
+				cache_size=0, cache_ttl=1.0, cache_fds=False,
+				precompressed=False, compress_cache=0, cache_control=(),
+				memory_cache=0, listing_page_size=1000, listing_cache=0):
 		"""
 		Usage
 		=====
@@ -67,12 +415,52 @@ class StaticFiles(object):
 				will be shown.
 		@param buffersize: The buffersize used when reading files.
 		@param follow_symlinks: Follow symlinks?
+		@param cache_size: The maximum number of files and folders to
+				keep metadata for. 0 disables the cache.
+		@param cache_ttl: The number of seconds cached metadata is
+				used before the file is checked again.
+		@param cache_fds: Keep the cached files open and memory mapped.
+				See the class documentation.
+		@param precompressed: Send "foo.gz" to clients accepting gzip
+				when "foo" is requested.
+		@param compress_cache: The number of bytes used to cache files
+				compressed on the fly. 0 disables compression on the fly.
+		@param cache_control: A list of (pattern, value) pairs. See
+				the class documentation.
+		@param memory_cache: The number of bytes used to keep small
+				files in memory. 0 disables the memory cache.
+		@param listing_page_size: The number of entries on each page
+				of a directory listing.
+		@param listing_cache: The maximum number of folders to cache
+				directory listings for. 0 disables the listing cache.
 		"""
 		self.patt = compile(pattern)
 		self.root_folder = root_folder
 		self.buffersize = buffersize
 		self.prefixlen = len(prefix)
 		self.follow_symlinks = follow_symlinks
+		if cache_size:
+			self.cache = LruCache(cache_size)
+		else:
+			self.cache = None
+		self.cache_ttl = cache_ttl
+		self.cache_fds = cache_fds
+		self.precompressed = precompressed
+		if compress_cache:
+			self.compress_cache = LruCache(100000, compress_cache)
+		else:
+			self.compress_cache = None
+		self.cache_control = [(compile(patt), value)
+				for patt, value in cache_control]
+		if memory_cache:
+			self.memory_cache = LruCache(100000, memory_cache)
+		else:
+			self.memory_cache = None
+		self.listing_page_size = listing_page_size
+		if listing_cache:
+			self.listing_cache = LruCache(listing_cache)
+		else:
+			self.listing_cache = None
 
 
 	def handle_notfound(self, env, start_response, path):
@@ -84,61 +472,456 @@ class StaticFiles(object):
 		start_response("404 not found", [("content-type", "text/plain")])
 		return ["%s does not exist" % path]
 
+	def handle_removed(self, env, start_response, info):
+		""" Invoked by L{serve_file} when a file is removed after its
+		metadata was cached. Removes it from the cache and responds
+		with L{handle_notfound}.
+		@param info: The L{FileInfo} of the requested file.
+		"""
+		if self.cache is not None:
+			self.cache.pop(info.path)
+		path = info.path[len(self.root_folder):].lstrip("/")
+		return self.handle_notfound(env, start_response, path)
+
+	def open_file(self, info):
+		""" Open a file for reading.
+		@param info: The L{FileInfo} of the file.
+		@return: The file, or None if it can not be opened (because
+				it has been removed since info was created).
+		"""
+		try:
+			return open(info.path, "rb")
+		except EnvironmentError:
+			if self.cache is not None:
+				self.cache.pop(info.path)
+			return None
+
+	def read_directory(self, folder, path):
+		""" Read the entries of a folder. Python has no scandir, so
+		each entry costs a single lstat, followed by a stat for
+		symlinks when follow_symlinks is enabled.
+		@param folder: The folder on the filesystem.
+		@param path: The requested path of the folder, without prefix
+				and trailing slash.
+		@return: A list of (filename, isdir) pairs for the files and
+				folders matching the pattern, with folders first.
+		"""
+		follow_symlinks = self.follow_symlinks
+		match = self.patt.match
+		dirs = []
+		files = []
+		for fn in listdir(folder):
+			if not match("%s/%s" % (path, fn)):
+				continue
+			real_path = join(folder, fn)
+			try:
+				mode = lstat(real_path).st_mode
+				if S_ISLNK(mode):
+					if not follow_symlinks:
+						continue
+					mode = stat(real_path).st_mode
+			except OSError:
+				continue
+			if S_ISDIR(mode):
+				dirs.append((fn, True))
+			elif S_ISREG(mode):
+				files.append((fn, False))
+		dirs.sort()
+		files.sort()
+		return dirs + files
+
+	def get_directory(self, folder, path):
+		""" Get the entries of a folder, using the listing cache if
+		enabled.
+		@return: See L{read_directory}.
+		"""
+		cache = self.listing_cache
+		if cache is None:
+			return self.read_directory(folder, path)
+		mtime = stat(folder).st_mtime
+		cached = cache.get(folder)
+		if cached is not None and cached[0] == mtime:
+			return cached[1]
+		entries = self.read_directory(folder, path)
+		cache.set(folder, (mtime, entries))
+		return entries
+
 	def list_directory(self, env, start_response, path):
 		""" Invoked by __call__ when a directory is requested. """
 		if path.endswith("/"):
 			path = path[:-1]
 		folder = join(self.root_folder, path)
-		buf = StringIO()
-		print >> buf, "<html><body>"
-		print >> buf, "<h1>%s%s</h1>" % (env["SCRIPT_NAME"],
-				env["PATH_INFO"])
-		print >> buf, "<ul>"
-		for fn in listdir(folder):
-			style = ""
-			real_path = join(folder, fn)
-			url_path = "%s/%s" % (path, fn)
+		entries = self.get_directory(folder, path)
 
-			if islink(real_path) and not self.follow_symlinks:
-				continue
-			if not self.patt.match(url_path):
-				continue
+		size = self.listing_page_size
+		pages = max((len(entries) + size - 1) // size, 1)
+		page = 1
+		query = env.get("QUERY_STRING")
+		if query:
+			try:
+				page = int(parse_qs(query).get("page", ["1"])[0])
+			except ValueError:
+				pass
+			page = min(max(page, 1), pages)
+		start = (page - 1) * size
 
-			if isdir(real_path):
-				style = " style='font-weight: bold;'"
-				fn += "/"
-			elif not isfile(real_path):
-				continue
+		start_response("200 OK", [("content-type", "text/html")])
+		return _ListingIter(env["SCRIPT_NAME"] + env["PATH_INFO"],
+				entries[start:start + size], page, pages)
 
-			print >> buf, "\t<li%s><a href='%s'>%s</a></li>" % (
-					style, fn, fn)
 
-		print >> buf, "</ul>"
-		print >> buf, "</body></html>"
+	def stat_path(self, real_path):
+		""" Get metadata about a file or folder without using the cache.
+		@return: A L{FileInfo}, or None if real_path is not a file or
+				folder (or is a symlink and follow_symlinks is False).
+		"""
+		try:
+			if self.follow_symlinks:
+				st = stat(real_path)
+			else:
+				st = lstat(real_path)
+		except OSError:
+			return None
+		mode = st.st_mode
+		if S_ISDIR(mode):
+			content_type = None
+		elif S_ISREG(mode):
+			content_type = guess_type(real_path)[0] \
+					or self.DEFAULT_CONTENT_TYPE
+		else:
+			return None
+		vary = (self.precompressed or self.compress_cache is not None) \
+				and content_type is not None \
+				and self.COMPRESSIBLE_TYPES.match(content_type) is not None
+		info = FileInfo(real_path, st, content_type, vary=vary)
+		if self.cache_control and content_type is not None:
+			path = real_path[len(self.root_folder):].lstrip("/")
+			for patt, value in self.cache_control:
+				if patt.match(path):
+					info.cache_control = value
+					break
+		return info
 
-		start_response("200 OK", [("content-type", "text/html")])
-		return [buf.getvalue()]
+	def get_info(self, real_path):
+		""" Get metadata about a file or folder, using the cache if
+		enabled.
+		@return: See L{stat_path}.
+		"""
+		cache = self.cache
+		if cache is None:
+			return self.stat_path(real_path)
+
+		info = cache.get(real_path)
+		if info is not None:
+			now = time()
+			if now - info.checked < self.cache_ttl:
+				return info
+			new = self.stat_path(real_path)
+			if new is None:
+				cache.pop(real_path)
+				return None
+			if info.same_file(new.st):
+				info.checked = now
+				return info
+			info = new
+		else:
+			info = self.stat_path(real_path)
+			if info is None:
+				return None
+
+		if self.cache_fds and not info.isdir and info.st.st_size > 0:
+			try:
+				f = open(real_path, "rb")
+				try:
+					st = fstat(f.fileno())
+					if info.same_file(st):
+						info.map = mmap(f.fileno(), st.st_size,
+								access=ACCESS_READ)
+				finally:
+					f.close()
+			except (IOError, EnvironmentError):
+				pass
+		cache.set(real_path, info)
+		return info
+
+	def select_variant(self, env, info):
+		""" Select the version of a file to send to the client.
+		@param env: The WSGI environ dict sent to __call__.
+		@param info: The L{FileInfo} of the requested file.
+		@return: info, or a L{FileInfo} for a compressed version of it.
+		"""
+		if not info.vary or not accepts_encoding(env, "gzip"):
+			return info
+
+		if self.precompressed:
+			gz = self.get_info(info.path + ".gz")
+			if gz is not None and not gz.isdir and \
+					gz.st.st_mtime >= info.st.st_mtime:
+				variant = info.variant
+				if variant is None or variant[0] is not gz:
+					v = FileInfo(gz.path, gz.st, info.content_type,
+							"gzip", True)
+					v.map = gz.map
+					v.cache_control = info.cache_control
+					variant = info.variant = (gz, v)
+				return variant[1]
+
+		if self.compress_cache is not None and \
+				info.size <= self.COMPRESS_MAX_SIZE:
+			return self.get_compressed(info)
+		return info
+
+	def get_compressed(self, info):
+		""" Get a gzip compressed version of a file from the
+		compress_cache, compressing the file if it is not in the cache.
+		@return: A L{FileInfo} with the compressed data in "map", or
+				info if compressing does not make the file smaller.
+		"""
+		key = (info.path, info.etag)
+		variant = self.compress_cache.get(key)
+		if variant is None:
+			f = self.open_file(info)
+			if f is None:
+				return info # removed. serve_file will notice
+			try:
+				if not info.same_file(fstat(f.fileno())):
+					return info # changed. serve_file will notice
+				data = f.read()
+			finally:
+				f.close()
+			buf = StringIO()
+			g = GzipFile("", "wb", self.COMPRESS_LEVEL, buf,
+					int(info.st.st_mtime))
+			g.write(data)
+			g.close()
+			data = buf.getvalue()
+			if len(data) < info.size:
+				variant = FileInfo(info.path, info.st, info.content_type,
+						"gzip", True)
+				variant.map = data
+				variant.size = len(data)
+				variant.etag = info.etag[:-1] + '-gz"'
+				variant.cache_control = info.cache_control
+				self.compress_cache.set(key, variant, len(data))
+			else:
+				variant = info
+				self.compress_cache.set(key, variant)
+		return variant
 
+	def load_file(self, info):
+		""" Read a file into the memory_cache.
+		@param info: The L{FileInfo} of the file.
+		@return: A L{FileInfo} with the contents of the file in "map"
+				and the headers of the response in "headers", or None
+				if the file can not be opened.
+		"""
+		f = self.open_file(info)
+		if f is None:
+			return None
+		try:
+			st = fstat(f.fileno())
+			data = f.read()
+		finally:
+			f.close()
+		entry = info.with_stat(st)
+		entry.map = data
+		entry.size = len(data)
+		entry.headers = self.file_headers(entry)
+		entry.headers.append(("content-length", str(entry.size)))
+		if entry.size <= self.MEMORY_MAX_SIZE:
+			self.memory_cache.set((info.path, info.encoding), entry,
+					entry.size)
+		return entry
+
+	def validator_headers(self, info):
+		""" Get the headers describing the version of a file, used for
+		200, 206 and 304 responses.
+		@param info: The L{FileInfo} of the file.
+		@return: A list of (header-name, value) pairs.
+		"""
+		headers = [("etag", info.etag),
+				("last-modified", info.get_last_modified())]
+		if info.cache_control:
+			headers.append(("cache-control", info.cache_control))
+		if info.vary:
+			headers.append(("vary", "accept-encoding"))
+		return headers
+
+	def file_headers(self, info):
+		""" Get the headers describing a file, used for 200 and
+		206 responses.
+		@param info: The L{FileInfo} of the file.
+		@return: A list of (header-name, value) pairs.
+		"""
+		headers = self.validator_headers(info)
+		headers.append(("content-type", info.content_type))
+		headers.append(("accept-ranges", "bytes"))
+		if info.encoding:
+			headers.append(("content-encoding", info.encoding))
+		return headers
+
+	def is_not_modified(self, env, info):
+		""" Check the If-None-Match and If-Modified-Since headers.
+		@param env: The WSGI environ dict sent to __call__.
+		@param info: The L{FileInfo} of the file.
+		@return: True if a "304 Not Modified" response should be sent.
+		"""
+		if env.get("REQUEST_METHOD", "GET") not in ("GET", "HEAD"):
+			return False
+		value = env.get("HTTP_IF_NONE_MATCH")
+		if value is not None:
+			return etag_matches(value, info.etag)
+		value = env.get("HTTP_IF_MODIFIED_SINCE")
+		if value:
+			t = parse_http_date(value)
+			return t is not None and int(info.st.st_mtime) <= t
+		return False
+
+	def if_range_matches(self, value, info):
+		""" Check the value of a If-Range header against the current
+		version of a file.
+		@param value: The If-Range header.
+		@param info: The L{FileInfo} for the file.
+		"""
+		value = value.strip()
+		if value.startswith('"') or value.startswith("W/"):
+			return value == info.etag # weak etags never match
+		return parse_http_date(value) == int(info.st.st_mtime)
+
+	def serve_file(self, env, start_response, info):
+		""" Invoked by __call__ when a file is requested.
+		@param env: The WSGI environ dict sent to __call__.
+		@param start_response: The start_response callable sent to __call__.
+		@param info: The L{FileInfo} for the file.
+		"""
+		requested = info
+		info = self.select_variant(env, info)
+		if self.is_not_modified(env, info):
+			start_response("304 Not Modified", self.validator_headers(info))
+			return []
+		if info.map is None and self.memory_cache is not None and \
+				info.size <= self.MEMORY_MAX_SIZE:
+			entry = self.memory_cache.get((info.path, info.encoding))
+			if entry is None or not entry.same_file(info.st):
+				entry = self.load_file(info)
+				if entry is None:
+					return self.handle_removed(env, start_response,
+							requested)
+			info = entry
+		if info.map is None:
+			f = self.open_file(info)
+			if f is None:
+				return self.handle_removed(env, start_response, requested)
+		else:
+			f = None
+		try:
+			if f is not None:
+				st = fstat(f.fileno())
+				if not info.same_file(st):
+					info = info.with_stat(st)
+					if self.cache is not None and info.encoding is None:
+						self.cache.set(info.path, info)
+			size = info.size
+
+			ranges = None
+			range_header = env.get("HTTP_RANGE")
+			if range_header:
+				if_range = env.get("HTTP_IF_RANGE")
+				if not if_range or self.if_range_matches(if_range, info):
+					ranges = parse_range(range_header, size)
+				if ranges and (len(ranges) > self.MAX_RANGES or
+						(info.encoding and len(ranges) > 1)):
+					ranges = None
+
+			if ranges is None:
+				headers = info.headers
+				if headers is None:
+					headers = self.file_headers(info)
+					headers.append(("content-length", str(size)))
+				start_response("200 OK", headers)
+				if f is not None:
+					return _FileIter(f, self.buffersize)
+				if isinstance(info.map, str):
+					return [info.map]
+				return _RangeIter(info.map, [(0, size - 1)], self.buffersize)
+			return self.serve_ranges(start_response, info, f, ranges)
+		except:
+			if f is not None:
+				f.close()
+			raise
+
+	def serve_ranges(self, start_response, info, f, ranges):
+		""" Used by L{serve_file} to send byte ranges of a file.
+		@param info: The L{FileInfo} for the file.
+		@param f: The open file, or None if info.map is used. The file
+				is closed by this method, or when the response is closed.
+		@param ranges: Ranges as returned by L{parse_range}.
+		"""
+		size = info.size
+		content_type = info.content_type
+		if not ranges:
+			if f is not None:
+				f.close()
+			start_response("416 Requested Range Not Satisfiable", [
+				("content-type", "text/plain"),
+				("content-range", "bytes */%d" % size)])
+			return ["Requested range not satisfiable"]
+
+		if len(ranges) == 1:
+			first, last = ranges[0]
+			headers = self.file_headers(info)
+			headers.append(("content-length", str(last - first + 1)))
+			headers.append(("content-range",
+					"bytes %d-%d/%d" % (first, last, size)))
+			parts = ranges
+		else:
+			boundary = "%032x" % getrandbits(128)
+			parts = []
+			length = 0
+			for first, last in ranges:
+				head = "\r\n--%s\r\ncontent-type: %s\r\n" \
+						"content-range: bytes %d-%d/%d\r\n\r\n" % (
+						boundary, content_type, first, last, size)
+				parts.append(head)
+				parts.append((first, last))
+				length += len(head) + last - first + 1
+			tail = "\r\n--%s--\r\n" % boundary
+			parts.append(tail)
+			length += len(tail)
+			headers = self.validator_headers(info)
+			headers.append(("content-type",
+					"multipart/byteranges; boundary=" + boundary))
+			headers.append(("content-length", str(length)))
+			headers.append(("accept-ranges", "bytes"))
+
+		start_response("206 Partial Content", headers)
+		if f is None:
+			return _RangeIter(info.map, parts, self.buffersize)
+		return _RangeIter(mmap(f.fileno(), size, access=ACCESS_READ),
+				parts, self.buffersize, f)
 
 	def __call__(self, env, start_response):
 		path = env["SCRIPT_NAME"] + env["PATH_INFO"]
 		path = path[self.prefixlen:]
 		if path.startswith("/"):
 			path = path[1:]
-		real_path = join(self.root_folder, path)
-
-		if islink(real_path) and not self.follow_symlinks:
-			return self.handle_notfound(env, start_response, path)
 
 		if not self.patt.match(path):
 			return self.handle_notfound(env, start_response, path)
 
-		if isdir(real_path):
+		info = self.get_info(join(self.root_folder, path))
+		if info is None:
+			return self.handle_notfound(env, start_response, path)
+		if info.isdir:
 			return self.list_directory(env, start_response, path)
-		elif isfile(real_path):
-			content_type = guess_type(real_path)[0] \
-					or self.DEFAULT_CONTENT_TYPE
-			start_response("200 OK", [("content-type", content_type)])
-			return _FileIter(real_path, self.buffersize)
+		return self.serve_file(env, start_response, info)
 
-		return self.handle_notfound(env, start_response, path)
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
@@ -0,0 +1,218 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Caching helpers. """
+
+from threading import Lock
+
+
+_PREV, _NEXT, _KEY, _VALUE, _COST = 0, 1, 2, 3, 4
+
+
+class LruCache(object):
+	""" A threadsafe, bounded mapping which forgets the least
+	recently used entry when it is full.
+
+	Usage
+	=====
+		>>> c = LruCache(2)
+		>>> c.set("a", 1)
+		>>> c.set("b", 2)
+		>>> c.get("a")
+		1
+		>>> c.set("c", 3) # "b" is the least recently used
+		>>> c.get("b") is None
+		True
+		>>> sorted(c.keys())
+		['a', 'c']
+		>>> len(c), "a" in c
+		(2, True)
+
+		Hits and misses are counted by L{get}.
+
+		>>> c.hits, c.misses
+		(1, 1)
+		>>> c.peek("c") # does not affect the order or the counters
+		3
+		>>> c.pop("a")
+		1
+		>>> c.clear()
+		>>> len(c)
+		0
+
+		A cache can also be limited by the total "cost" of its entries,
+		for example the number of bytes used by the values.
+
+		>>> c = LruCache(maxsize=100, maxcost=10)
+		>>> c.set("a", "x" * 6, cost=6)
+		>>> c.set("b", "x" * 4, cost=4)
+		>>> c.set("c", "x" * 3, cost=3)
+		>>> sorted(c.keys()), c.cost
+		(['b', 'c'], 7)
+		>>> c.set("d", "x" * 11, cost=11) # too expensive to store
+		>>> "d" in c
+		False
+
+	@ivar maxsize: The maximum number of entries.
+	@ivar maxcost: The maximum total cost of all entries, or None.
+	@ivar cost: The total cost of all entries.
+	@ivar hits: The number of times L{get} has found the key.
+	@ivar misses: The number of times L{get} has not found the key.
+	"""
+	def __init__(self, maxsize=1000, maxcost=None):
+		"""
+		@param maxsize: The maximum number of entries.
+		@param maxcost: The maximum total cost of all entries. See
+				L{set}. None means no limit.
+		"""
+		if maxsize < 1:
+			raise ValueError("maxsize must be at least 1.")
+		self.maxsize = maxsize
+		self.maxcost = maxcost
+		self.cost = 0
+		self.hits = 0
+		self.misses = 0
+		self._lock = Lock()
+		self._map = {}
+		self._root = root = [] # root of a circular doubly linked list
+		root[:] = [root, root, None, None, 0]
+
+	def get(self, key, default=None):
+		""" Get the value stored for key, and mark it as the most
+		recently used entry.
+		@return: The value, or default if key is not in the cache.
+		"""
+		self._lock.acquire()
+		try:
+			link = self._map.get(key)
+			if link is None:
+				self.misses += 1
+				return default
+			self.hits += 1
+			prev, next = link[_PREV], link[_NEXT]
+			prev[_NEXT] = next
+			next[_PREV] = prev
+			root = self._root
+			last = root[_PREV]
+			last[_NEXT] = root[_PREV] = link
+			link[_PREV] = last
+			link[_NEXT] = root
+			return link[_VALUE]
+		finally:
+			self._lock.release()
+
+	def peek(self, key, default=None):
+		""" Get the value stored for key without marking it as used
+		or counting a hit or miss.
+		@return: The value, or default if key is not in the cache.
+		"""
+		link = self._map.get(key)
+		if link is None:
+			return default
+		return link[_VALUE]
+
+	def set(self, key, value, cost=0):
+		""" Store value for key, and mark it as the most recently
+		used entry. Least recently used entries are removed until the
+		cache is within its limits.
+		@param cost: The cost of the entry, counted against
+				L{maxcost}. Entries costing more than maxcost are not
+				stored.
+		"""
+		self._lock.acquire()
+		try:
+			root = self._root
+			link = self._map.pop(key, None)
+			if link is not None:
+				self._unlink(link)
+			maxcost = self.maxcost
+			if maxcost is not None and cost > maxcost:
+				return
+			while self._map and (len(self._map) >= self.maxsize or
+					(maxcost is not None and self.cost + cost > maxcost)):
+				oldest = root[_NEXT]
+				self._unlink(oldest)
+				del self._map[oldest[_KEY]]
+			last = root[_PREV]
+			link = [last, root, key, value, cost]
+			last[_NEXT] = root[_PREV] = link
+			self._map[key] = link
+			self.cost += cost
+		finally:
+			self._lock.release()
+
+	def _unlink(self, link):
+		link[_PREV][_NEXT] = link[_NEXT]
+		link[_NEXT][_PREV] = link[_PREV]
+		self.cost -= link[_COST]
+
+	def pop(self, key, default=None):
+		""" Remove key from the cache.
+		@return: The value stored for key, or default if key is not in
+				the cache.
+		"""
+		self._lock.acquire()
+		try:
+			link = self._map.pop(key, None)
+			if link is None:
+				return default
+			self._unlink(link)
+			return link[_VALUE]
+		finally:
+			self._lock.release()
+
+	def clear(self):
+		""" Remove all entries. The hit and miss counters are not reset. """
+		self._lock.acquire()
+		try:
+			self._map.clear()
+			root = self._root
+			root[:] = [root, root, None, None, 0]
+			self.cost = 0
+		finally:
+			self._lock.release()
+
+	def keys(self):
+		""" Get a list of all the keys, least recently used first. """
+		self._lock.acquire()
+		try:
+			keys = []
+			root = self._root
+			link = root[_NEXT]
+			while link is not root:
+				keys.append(link[_KEY])
+				link = link[_NEXT]
+			return keys
+		finally:
+			self._lock.release()
+
+	def __contains__(self, key):
+		return key in self._map
+
+	def __len__(self):
+		return len(self._map)
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
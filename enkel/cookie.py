@@ -28,27 +28,31 @@ WARNING
 from datetime import datetime
 
 from enkel.wansgli.utils import rfc1123_date
-from enkel.wansgli.env import parse_value
+from enkel.wansgli.env import parse_value, cached_header
 
 
 def get_cookies(env):
 	""" Lookup cookies in the WSGI environ dict.
 
+	The cookie header is only parsed once per request. The parsed
+	cookies are cached in env (see
+	L{enkel.wansgli.env.cached_header}), so middleware and
+	applications can call this as often as they like.
+
 	Example
 	=======
 		>>> env = dict(HTTP_COOKIE="sid=ax33d; name=John Peters")
 		>>> get_cookies(env)
 		{'name': 'John Peters', 'sid': 'ax33d'}
+		>>> get_cookies(env) is get_cookies(env)
+		True
 
 	@param env: WSGI environ dict.
 	@return: dict with cookie-name as key and cookie-value as value.
-			Returns None when no cookie is found.
+			Returns None when no cookie is found. The dict is shared
+			by all callers during the request, so do not modify it.
 	"""
-	c = env.get("HTTP_COOKIE")
-	if c:
-		return parse_value(c)
-	else:
-		return None
+	return cached_header(env, "HTTP_COOKIE", parse_value)
 
 
 class Cookie(object):
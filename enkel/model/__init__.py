@@ -129,4 +129,5 @@ Form generation and parsing
 
 
 __all__ = ["formgen", "data", "datasource", "util",
-		"dsources", "field"]
+		"dsources", "field", "validator", "batch",
+		"record"]
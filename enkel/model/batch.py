@@ -0,0 +1,225 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Validation of many records at once.
+
+Validating a large number of records, like the rows of a imported
+file, with a L{data.Manip} for each record is slow. The functions in
+this module validate one field at a time, over all the records, and
+report errors as (row, fieldname, message) tuples.
+
+	>>> from field.base import String, Int
+	>>> model = dict(name=String(5), age=Int(required=False))
+	>>> validate_records(model, [
+	... 	dict(name=u"John", age=20),
+	... 	dict(name=u"Johnny"),
+	... 	dict(name=u"Amy", age="x")])
+	[(1, 'name', 'to many characters'), (2, 'age', 'must be a whole number')]
+
+	The same data as columns:
+
+	>>> validate_columns(model, dict(
+	... 	name=[u"John", u"Johnny", u"Amy"],
+	... 	age=[20, None, "x"]))
+	[(1, 'name', 'to many characters'), (2, 'age', 'must be a whole number')]
+
+NumPy
+=====
+	If NumPy is installed, columns can be numpy arrays. Arrays with
+	a dtype matching the field are checked without looping in python:
+		- L{field.base.Bool}: bool arrays.
+		- L{field.base.Int}: signed integer arrays.
+		- L{field.base.Long}: integer arrays.
+		- L{field.base.Float}: floating point arrays.
+		- L{field.base.String}: unicode arrays. The lengths are
+		  checked with numpy.char.str_len.
+		- L{field.base.Text}: unicode arrays.
+	Other arrays are converted to lists of python values with tolist()
+	and checked like any other column.
+"""
+
+from field.interface import N_
+from field import base
+from validator import CHECKS, NAMESPACE, indent, default_is_none
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+def _fail(message):
+	return ["append((row, k, %s))" % message]
+
+def _compile(check):
+	lines = ["def check(f, k, column, append):",
+			"\tfor row, v in enumerate(column):"]
+	if check is None:
+		lines.extend(["\t\ttry:",
+				"\t\t\tf.validate(k, v)",
+				"\t\texcept E, e:",
+				"\t\t\tappend((row, k, e.long_message))"])
+	else:
+		lines.extend(indent(check("f", _fail), 2))
+	ns = dict(NAMESPACE)
+	exec compile("\n".join(lines) + "\n", "<batch>", "exec") in ns
+	return ns["check"]
+
+_checks = {}
+
+def get_column_check(fieldcls):
+	""" Get a function checking all the values in a column against a
+	field of the given class.
+
+	The function is generated from the checks in
+	L{validator.CHECKS}, or calls the validate method of the field
+	for each value if the class is not in CHECKS.
+
+	@return: check(field, fieldname, column, append), where append is
+			called with a (row, fieldname, message) tuple for each
+			invalid value.
+	"""
+	check = _checks.get(fieldcls)
+	if check is None:
+		check = _checks[fieldcls] = _compile(CHECKS.get(fieldcls))
+	return check
+
+
+def _numpy_kinds(kinds):
+	def check(field, key, column, append):
+		return column.dtype.kind in kinds
+	return check
+
+def _numpy_string(field, key, column, append):
+	if column.dtype.kind != "U":
+		return False
+	lengths = numpy.char.str_len(column)
+	if field.required:
+		few = lengths < field.minlength
+	else:
+		few = (lengths < field.minlength) & (lengths > 0)
+	for row in numpy.flatnonzero(few).tolist():
+		append((row, key, N_("to few characters")))
+	for row in numpy.flatnonzero(lengths > field.maxlength).tolist():
+		append((row, key, N_("to many characters")))
+	return True
+
+#: Functions checking a numpy array against a field, by field class.
+#: They take the same arguments as the functions returned by
+#: L{get_column_check}, and return False if the array can not be
+#: checked without converting it to a list.
+NUMPY_CHECKS = {
+	base.Bool: _numpy_kinds("b"),
+	base.Int: _numpy_kinds("i"),
+	base.Long: _numpy_kinds("iu"),
+	base.Float: _numpy_kinds("f"),
+	base.String: _numpy_string,
+	base.Text: _numpy_kinds("U")
+}
+
+
+def validate_column(field, key, column, append):
+	""" Validate all values in a column.
+
+	@param field: A L{field.interface.Field}.
+	@param key: The name of the field.
+	@param column: A sequence of values, or a numpy array.
+	@param append: Called with a (row, fieldname, message) tuple for
+			each invalid value.
+	"""
+	if numpy is not None and isinstance(column, numpy.ndarray):
+		check = NUMPY_CHECKS.get(type(field))
+		if check is not None and check(field, key, column, append):
+			return
+		column = column.tolist()
+	get_column_check(type(field))(field, key, column, append)
+
+
+def _defaults(field, size):
+	if default_is_none(field):
+		return [None] * size
+	get_default = field.get_default
+	return [get_default() for x in xrange(size)]
+
+
+def validate_columns(model, columns, size=None):
+	""" Validate records stored as columns.
+
+	@param model: A model (a dict of L{field.interface.Field} objects).
+	@param columns: A dict with a sequence of values for each field
+			in the model, all of the same length. Values for fields
+			missing from the dict are the default value of the field.
+	@param size: The number of records. Only required if there are
+			no columns.
+	@return: A list of (row, fieldname, message) tuples for all
+			invalid values, sorted by row. Errors for the same row are
+			in the order of the model.
+	@raise ValueError: If the columns are not of the same length.
+	"""
+	for key in model:
+		if key in columns:
+			length = len(columns[key])
+			if size is None:
+				size = length
+			elif length != size:
+				raise ValueError("column %r has %d values, not %d." % (
+						key, length, size))
+	if size is None:
+		raise ValueError("size is required when there are no columns.")
+	errors = []
+	append = errors.append
+	for key, field in model.iteritems():
+		column = columns.get(key)
+		if column is None:
+			column = _defaults(field, size)
+		validate_column(field, key, column, append)
+	errors.sort(key=lambda e: e[0])
+	return errors
+
+
+def validate_records(model, records):
+	""" Validate records stored as dicts, like the values of a
+	L{data.Manip}. The records are converted to columns, and validated
+	with L{validate_columns}.
+
+	@param model: A model (a dict of L{field.interface.Field} objects).
+	@param records: A sequence or iterable of dicts. Values for fields
+			missing from a dict are the default value of the field.
+	@return: See L{validate_columns}.
+	"""
+	if not isinstance(records, (list, tuple)):
+		records = list(records)
+	columns = {}
+	for key, field in model.iteritems():
+		if default_is_none(field):
+			columns[key] = [r.get(key) for r in records]
+		else:
+			get_default = field.get_default
+			columns[key] = [r[key] if key in r else get_default()
+					for r in records]
+	return validate_columns(model, columns, len(records))
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
@@ -18,14 +18,15 @@
 
 """ Data manipulation. """
 
-from field.interface import FieldValidationError
+from validator import get_validator
 
 
 class Manip(object):
 	""" Model data manipulator.
 
 	Models are just dict's of L{field.interface.Field} objects. Use
-	Manip's to manipulate a model.
+	Manip's to manipulate a model. Models are validated with a
+	function generated for the model by L{validator.get_validator}.
 
 	Example
 	=======
@@ -175,9 +176,7 @@ class Manip(object):
 		""" Validate all values in the manipulator.
 		@raise field.interface.FieldValidationError: If validation fails.
 		"""
-		for key in self.model:
-			value = self.__getattr__(key)
-			self.model[key].validate(key, value)
+		get_validator(self.model)(self._values, None)
 
 	def info_validate(self):
 		""" Validate all values in the manipulator.
@@ -185,12 +184,7 @@ class Manip(object):
 				objects. If all values validates, the list is empty.
 		"""
 		errors = []
-		for key in self.model:
-			value = self.__getattr__(key)
-			try:
-				self.model[key].validate(key, value)
-			except FieldValidationError, e:
-				errors.append(e)
+		get_validator(self.model)(self._values, errors)
 		return errors
 
 
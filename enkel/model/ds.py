@@ -39,6 +39,17 @@ class Datasource(object):
 		"""
 		raise NotImplementedError()
 
+	def ds_validate_many(self, fieldname, values):
+		""" Validate a sequence of values, as stored in a L{Many}
+		field. The default calls L{ds_validate} for each value, but
+		datasources can check all the values at once.
+		@param fieldname: The name of the field.
+		@param values: The values to validate.
+		@raise FieldValidationError: If the validation of a value fails.
+		"""
+		for value in values:
+			self.ds_validate(fieldname, value)
+
 	def ds_iter(self):
 		""" Iterate over all "nodes" in the datasource yielding
 		(value, label) pairs. """
@@ -111,8 +122,12 @@ class Many(DatasourceField):
 		if not hasattr(value, "__iter__"):
 			raise FieldValidationError(fieldname, value,
 					"must be a iterable.")
-		for v in value:
-			self.datasource.ds_validate(fieldname, v)
+		validate_many = getattr(self.datasource, "ds_validate_many", None)
+		if validate_many is None:
+			for v in value:
+				self.datasource.ds_validate(fieldname, v)
+		else:
+			validate_many(fieldname, value)
 
 	def from_unicode(self, value):
 		return [self.datasource.field.from_unicode(v)\
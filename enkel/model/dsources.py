@@ -70,3 +70,168 @@ class Dict(List):
 	"""
 	def ds_iter(self):
 		return self.data.iteritems()
+
+
+class _Indexed(List):
+	""" The index and unicode cache shared by L{IndexedList} and
+	L{IndexedDict}.
+
+	The index and cache are built when they are first needed, and
+	rebuilt after data or field is set, or after the data is changed
+	with the methods of the subclasses. If the data container is
+	changed directly, call L{invalidate}.
+	"""
+	def __init__(self, data, field=Text()):
+		self._index = None
+		self._unicode = None
+		super(_Indexed, self).__init__(data, field)
+
+	def _get_data(self):
+		return self._data
+	def _set_data(self, data):
+		self._data = data
+		self.invalidate()
+	data = property(_get_data, _set_data)
+
+	def _get_field(self):
+		return self._field
+	def _set_field(self, field):
+		self._field = field
+		self.invalidate()
+	field = property(_get_field, _set_field)
+
+	def invalidate(self):
+		""" Forget the index and the cached unicode values. """
+		self._index = None
+		self._unicode = None
+
+	def get_index(self):
+		""" Get the index of the values.
+		@return: (index, others) where index is a frozenset of the
+				hashable values, and others is a list of the values
+				which can not be hashed.
+		"""
+		if self._index is None:
+			hashable = []
+			others = []
+			for value, label in self.ds_iter():
+				try:
+					hash(value)
+				except TypeError:
+					others.append(value)
+				else:
+					hashable.append(value)
+			self._index = frozenset(hashable), others
+		return self._index
+
+	def contains(self, value):
+		""" Check if value is one of the values in the datasource. """
+		index, others = self.get_index()
+		try:
+			return value in index
+		except TypeError:
+			return value in others
+
+	def ds_validate(self, fieldname, value):
+		self.field.validate(fieldname, value)
+		if not self.contains(value):
+			raise FieldValidationError(fieldname, value,
+					N_("illegal value"))
+
+	def ds_validate_many(self, fieldname, values):
+		""" Validate all the values in one pass of the field checks
+		from L{batch.get_column_check}, and a single set difference
+		against the index. Raises the same error as calling
+		L{ds_validate} for each value. """
+		from batch import get_column_check # batch imports numpy
+		if not isinstance(values, (list, tuple)):
+			values = list(values)
+		errors = []
+		get_column_check(type(self.field))(self.field, fieldname, values,
+				errors.append)
+		if errors:
+			first = errors[0][0]
+		else:
+			first = len(values)
+		try:
+			missing = set(values).difference(self.get_index()[0])
+		except TypeError: # unhashable values
+			missing = True
+		if missing:
+			for row in xrange(first):
+				if not self.contains(values[row]):
+					raise FieldValidationError(fieldname, values[row],
+							N_("illegal value"))
+		if errors:
+			raise FieldValidationError(fieldname, values[first],
+					errors[0][2])
+
+	def ds_iter_unicode(self):
+		if self._unicode is None:
+			to_unicode = self.field.to_unicode
+			self._unicode = [(to_unicode(value), label)
+					for value, label in self.ds_iter()]
+		return iter(self._unicode)
+
+
+class IndexedList(_Indexed):
+	""" A L{List} with a hash index of the values, so L{ds_validate}
+	does not search through the data, and a cache of the unicode
+	values returned by L{ds_iter_unicode}.
+
+	The index and cache are built when they are first needed, and
+	rebuilt after data or field is set, or after the data is changed
+	with L{append} or L{remove}. If the data container is changed
+	directly, call L{invalidate}.
+
+		>>> people = IndexedList([u"john", u"amy"])
+		>>> people.ds_validate("friend", u"amy")
+		>>> people.append(u"jack")
+		>>> people.ds_validate_many("friends", [u"jack", u"jane"])
+		Traceback (most recent call last):
+		...
+		FieldValidationError: friends: illegal value
+		>>> list(people.ds_iter_unicode())
+		[(u'john', u'john'), (u'amy', u'amy'), (u'jack', u'jack')]
+	"""
+	def append(self, value):
+		""" Add a value to the data. """
+		self._data.append(value)
+		self.invalidate()
+
+	def remove(self, value):
+		""" Remove a value from the data. """
+		self._data.remove(value)
+		self.invalidate()
+
+
+class IndexedDict(_Indexed, Dict):
+	""" The same as L{IndexedList}, except "data" is a dict-like
+	object like for L{Dict}. The keys of the dict are used as the
+	index, so only the unicode values are cached.
+
+	Change the data with L{set} and L{remove}.
+	"""
+	def set(self, value, label):
+		""" Add a value with the given label, or change the label of
+		a value. """
+		self._data[value] = label
+		self.invalidate()
+
+	def remove(self, value):
+		""" Remove a value. """
+		del self._data[value]
+		self.invalidate()
+
+	def get_index(self):
+		return self._data, ()
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
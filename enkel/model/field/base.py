@@ -18,6 +18,7 @@
 
 """ Base L{interface.Field} implementations. """
 
+import re
 import datetime
 from time import strptime
 
@@ -186,13 +187,30 @@ class Text(Field):
 					N_("must be a unicode string"))
 
 
+# Only ascii digits, like time.strptime.
+DATE_PATT = re.compile(r"\d\d\d\d-\d\d-\d\d\Z")
+TIME_PATT = re.compile(r"\d\d:\d\d:\d\d\Z")
+DATETIME_PATT = re.compile(r"\d\d\d\d-\d\d-\d\d \d\d:\d\d:\d\d\Z")
+
+
 class Date(Field):
-	""" A date field using datetime.date. """
+	""" A date field using datetime.date.
+
+	Values in the default L{FORMAT} are parsed without time.strptime,
+	which is slow. Other formats, and values which are not zero
+	padded, are parsed with strptime.
+	"""
 	FORMAT = "%Y-%m-%d" # iso-8601 date format (yyyy-mm-dd)
 	WEIGHT = 700
 	def from_unicode(self, value):
 		""" Convert from unicode using time.strptime and L{FORMAT}. """
 		self.check_unicode(value)
+		if self.FORMAT == Date.FORMAT and DATE_PATT.match(value):
+			v = str(value) # faster int() conversion
+			try:
+				return datetime.date(int(v[0:4]), int(v[5:7]), int(v[8:10]))
+			except ValueError:
+				return self.get_default()
 		try:
 			d = strptime(value, self.FORMAT)
 		except ValueError:
@@ -218,12 +236,22 @@ class Date(Field):
 					N_("must be a datetime.date object"))
 
 class Time(Field):
-	""" A time field for representing the time of day using datetime.time. """
+	""" A time field for representing the time of day using datetime.time.
+
+	The default L{FORMAT} is parsed and formatted without
+	time.strptime and strftime. See L{Date}.
+	"""
 	FORMAT = "%H:%M:%S" # hh:mm:ss
 	WEIGHT = 800
 	def from_unicode(self, value):
 		""" Convert from unicode using time.strptime and L{FORMAT}. """
 		self.check_unicode(value)
+		if self.FORMAT == Time.FORMAT and TIME_PATT.match(value):
+			v = str(value)
+			try:
+				return datetime.time(int(v[0:2]), int(v[3:5]), int(v[6:8]))
+			except ValueError:
+				return self.get_default()
 		try:
 			d = strptime(value, self.FORMAT)
 		except ValueError:
@@ -234,6 +262,9 @@ class Time(Field):
 		""" Convert to unicode using value.strftime and L{FORMAT}. """
 		if value == None:
 			return u""
+		elif self.FORMAT == Time.FORMAT and isinstance(value, datetime.time):
+			# isoformat adds microseconds and the utc offset if set
+			return unicode(value.isoformat()[:8])
 		else:
 			return unicode(value.strftime(self.FORMAT))
 
@@ -250,12 +281,24 @@ class Time(Field):
 
 
 class DateTime(Field):
-	""" A timestamp field using datetime.datetime. """
+	""" A timestamp field using datetime.datetime.
+
+	The default L{FORMAT} is parsed and formatted without
+	time.strptime and strftime. See L{Date}.
+	"""
 	FORMAT = "%Y-%m-%d %H:%M:%S" # yyyy-mm-dd hh-mm-ss
 	WEIGHT = 900
 	def from_unicode(self, value):
 		""" Convert from uniocde using time.strptime and L{FORMAT}. """
 		self.check_unicode(value)
+		if self.FORMAT == DateTime.FORMAT and DATETIME_PATT.match(value):
+			v = str(value)
+			try:
+				return datetime.datetime(int(v[0:4]), int(v[5:7]),
+						int(v[8:10]), int(v[11:13]), int(v[14:16]),
+						int(v[17:19]))
+			except ValueError:
+				return self.get_default()
 		try:
 			d = strptime(value, self.FORMAT)
 		except ValueError:
@@ -266,6 +309,9 @@ class DateTime(Field):
 		""" Convert to unicode using value.strftime and L{FORMAT}. """
 		if value == None:
 			return u""
+		elif self.FORMAT == DateTime.FORMAT and \
+				isinstance(value, datetime.datetime):
+			return unicode(value.isoformat(" ")[:19])
 		else:
 			return unicode(value.strftime(self.FORMAT))
 
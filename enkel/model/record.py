@@ -0,0 +1,212 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Record classes generated from models.
+
+A L{data.Manip} stores its values in a dict, and every attribute
+access goes through __getattr__ or __setattr__. When many records
+are kept in memory, a class created by L{record_class} is much
+smaller and faster. It has a slot for each field in the model, and
+the same interface as Manip.
+
+	>>> from field.base import String, Int
+	>>> Person = record_class(dict(name=String(10), age=Int()), "Person")
+	>>> john = Person(name=u"John")
+	>>> john.age is None
+	True
+	>>> john.set_unicode("age", u"20")
+	>>> john.validate()
+	>>> john.age = "wrong"
+	>>> john.info_validate()
+	[<FieldValidationError: age>]
+	>>> john.to_manip().name
+	u'John'
+
+Unlike a Manip, a record can not hold values for names which are not
+in the model.
+
+	>>> john.email = u"john@example.com"
+	Traceback (most recent call last):
+	...
+	AttributeError: 'Person' object has no attribute 'email'
+"""
+
+import re
+import sys
+from keyword import iskeyword
+
+from data import Manip
+from validator import compile_validator, default_is_none
+
+
+NAME_PATT = re.compile("^[a-zA-Z_][a-zA-Z0-9_]*$")
+
+
+class Record(object):
+	""" Base class of the classes created by L{record_class}.
+
+	@cvar model: The model of the record class.
+	"""
+	__slots__ = ()
+	model = {}
+
+	def _validate(values, errors):
+		raise NotImplementedError()
+	_validate = staticmethod(_validate)
+
+	def validate(self):
+		""" See L{data.Manip.validate}. """
+		self._validate(self, None)
+
+	def info_validate(self):
+		""" See L{data.Manip.info_validate}. """
+		errors = []
+		self._validate(self, errors)
+		return errors
+
+	def merge(self, dct, prefix=""):
+		""" See L{data.Manip.merge}. """
+		for key in self.model:
+			value = dct.get(prefix + key)
+			if value:
+				setattr(self, key, value)
+
+	def unicode_merge(self, dct, prefix=""):
+		""" See L{data.Manip.unicode_merge}. """
+		for key in self.model:
+			value = dct.get(prefix + key)
+			if value:
+				self.set_unicode(key, value)
+
+	def set_unicode(self, name, value):
+		""" See L{data.Manip.set_unicode}. """
+		setattr(self, name, self.model[name].from_unicode(value))
+
+	def get_unicode(self, name):
+		""" See L{data.Manip.get_unicode}. """
+		return self.model[name].to_unicode(getattr(self, name))
+
+	def __setitem__(self, name, value):
+		setattr(self, name, value)
+
+	def __getitem__(self, name):
+		return getattr(self, name)
+
+	def __iter__(self):
+		""" Iterate over the fieldnames in the model. """
+		return iter(self.model)
+
+	def iteritems(self):
+		""" Iterate over (fieldname, value) pairs. """
+		for key in self.model:
+			yield key, getattr(self, key)
+
+	def get_dict(self):
+		""" Get the values as a dict where fieldname is key. """
+		return dict(self.iteritems())
+
+	def iterunicode(self):
+		""" Iterate over (fieldname, unicode-value) pairs. """
+		for key in self.model:
+			yield key, self.get_unicode(key)
+
+	def to_manip(self):
+		""" Create a L{data.Manip} with the values of this record. """
+		return Manip(self.model, **self.get_dict())
+
+	def from_manip(cls, manip):
+		""" Create a record from the values of a L{data.Manip}.
+		Fields without a value in manip get their default value, and
+		values in manip for names which are not in the model are
+		ignored.
+		"""
+		model = cls.model
+		return cls(**dict((key, value)
+				for key, value in manip._values.iteritems()
+				if key in model))
+	from_manip = classmethod(from_manip)
+
+	def __getstate__(self):
+		return self.get_dict()
+
+	def __setstate__(self, state):
+		for key, value in state.iteritems():
+			setattr(self, key, value)
+
+	def __eq__(self, other):
+		return type(self) is type(other) and \
+				self.get_dict() == other.get_dict()
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __repr__(self):
+		return "%s <%r>" % (self.__class__.__name__, self.get_dict())
+
+
+def record_class(model, name="Record"):
+	""" Create a L{Record} subclass for a model.
+
+	The class has a slot for every field in the model. The constructor
+	sets every field to its default value, and then sets the values
+	given as keyword arguments. Validation uses a validator from
+	L{validator.compile_validator}.
+
+	The fields of the class are the fields in the model when it is
+	created. Changing the fields of the model after that is not
+	supported. Records can be pickled if the class is stored in a
+	module variable with the same name as the class.
+
+	@param model: A model (a dict of L{field.interface.Field} objects).
+	@param name: The name of the class.
+	@raise ValueError: If a fieldname is not a valid python identifier,
+			or is the name of a L{Record} attribute.
+	"""
+	ns = {}
+	lines = ["def __init__(self, **values):"]
+	for i, (key, field) in enumerate(model.iteritems()):
+		if not NAME_PATT.match(key) or iskeyword(key) or \
+				hasattr(Record, key):
+			raise ValueError("%r can not be used as a fieldname in a "
+					"record." % key)
+		if default_is_none(field):
+			lines.append("\tself.%s = None" % key)
+		else:
+			ns["d%d" % i] = field.get_default
+			lines.append("\tself.%s = d%d()" % (key, i))
+	lines.extend(["\tif values:",
+			"\t\tfor key, value in values.iteritems():",
+			"\t\t\tsetattr(self, key, value)"])
+	exec compile("\n".join(lines) + "\n", "<record>", "exec") in ns
+	return type(name, (Record,), dict(
+		__slots__ = tuple(model),
+		__init__ = ns["__init__"],
+		__module__ = sys._getframe(1).f_globals.get("__name__"),
+		model = model,
+		_validate = staticmethod(compile_validator(model, True))
+	))
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
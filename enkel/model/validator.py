@@ -0,0 +1,202 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Compiled model validators.
+
+A model is compiled to a single python function validating a dict of
+values against every field in the model. The checks of the fields in
+L{field.base} are written directly into the function, so validating
+does not call a method for each field, and fields using the default
+L{field.interface.Field.get_default} get None without calling it.
+Other fields are validated by calling their validate method.
+
+L{data.Manip} validates using L{get_validator}, so models are
+compiled the first time they are validated.
+
+	>>> from field.base import String, Int
+	>>> model = dict(name=String(10), age=Int(required=False))
+	>>> validate = compile_validator(model)
+	>>> validate({"name": u"John"}, None)
+	>>> errors = []
+	>>> validate({"name": "John", "age": "x"}, errors)
+	>>> sorted(str(e) for e in errors)
+	['age: must be a whole number', 'name: must be a unicode string']
+"""
+
+import datetime
+
+from enkel.cache import LruCache
+from field.interface import Field, FieldValidationError, N_
+from field import base
+
+
+def _typecheck(types, message):
+	def check(f, fail):
+		return ["if not isinstance(v, %s) and "
+				"(v is not None or %s.required):" % (types, f)] + \
+				indent(fail(repr(message)))
+	return check
+
+def _string(f, fail):
+	return ["if v or %s.required:" % f,
+			"\tif not isinstance(v, unicode):"] + \
+			indent(fail(repr(N_("must be a unicode string"))), 2) + \
+			["\telif len(v) < %s.minlength:" % f] + \
+			indent(fail(repr(N_("to few characters"))), 2) + \
+			["\telif len(v) > %s.maxlength:" % f] + \
+			indent(fail(repr(N_("to many characters"))), 2)
+
+def _text(f, fail):
+	return ["if (v or %s.required) and not isinstance(v, unicode):" % f] + \
+			indent(fail(repr(N_("must be a unicode string"))))
+
+def indent(lines, level=1):
+	""" Indent lines of generated code with level tabs. """
+	return ["\t" * level + line for line in lines]
+
+def _fail(message):
+	return ["e = E(k, v, %s)" % message,
+			"if errors is None: raise e",
+			"errors.append(e)"]
+
+def _call(f):
+	return ["try:",
+			"\t%s.validate(k, v)" % f,
+			"except E, e:",
+			"\tif errors is None: raise",
+			"\terrors.append(e)"]
+
+
+#: Functions generating the inlined checks of fields, by field
+#: class. The checks must do exactly what the validate method of
+#: the class does. Subclasses are not included, as they may
+#: override validate. Each function takes the name of the field
+#: variable and a function generating the lines reporting an error
+#: from an expression giving the message, and returns a list of
+#: lines checking the value "v".
+CHECKS = {
+	base.Bool: _typecheck("bool", N_("must be boolean (True or False)")),
+	base.Int: _typecheck("int", N_("must be a whole number")),
+	base.Long: _typecheck("(int, long)", N_("must be a whole number")),
+	base.Float: _typecheck("float",
+			N_("must be a floating-point number")),
+	base.Date: _typecheck("date", N_("must be a datetime.date object")),
+	base.DateTime: _typecheck("datetime",
+			N_("must be a datetime.datetime object")),
+	base.String: _string,
+	base.Text: _text
+}
+
+#: The names available to the code generated from L{CHECKS}.
+NAMESPACE = dict(E=FieldValidationError, date=datetime.date,
+		datetime=datetime.datetime)
+
+
+def default_is_none(field):
+	""" Check if field uses the default
+	L{field.interface.Field.get_default}, which always returns None. """
+	return "get_default" not in field.__dict__ and \
+			type(field).get_default.im_func is Field.get_default.im_func
+
+
+def compile_validator(model, attributes=False):
+	""" Compile a validator for a model.
+
+	The generated function takes a dict of values and a list. Fields
+	missing from the values get their default value. If the list is
+	None, the first L{field.interface.FieldValidationError} is raised,
+	else all errors are appended to it. Fields are validated in the
+	order of the model.
+
+	The generated function reads the field attributes (required,
+	maxlength, ...) on every call, but the set of fields is fixed, so
+	it must be compiled again if fields are added, removed or
+	replaced in the model. L{get_validator} does that automatically.
+
+	@param model: A model (a dict of L{field.interface.Field} objects).
+	@param attributes: Read the values from attributes of the first
+			argument instead of from a dict. Used by
+			L{record.record_class}, where every field has a value.
+	@return: validate(values, errors).
+	"""
+	ns = dict(NAMESPACE, MISSING=[])
+	lines = ["def validate(values, errors):"]
+	if not attributes:
+		lines.append("\tget = values.get")
+	for i, (key, field) in enumerate(model.iteritems()):
+		f = "f%d" % i
+		ns[f] = field
+		lines.append("\tk = %r" % (key,))
+		if attributes:
+			lines.append("\tv = values.%s" % key)
+		elif default_is_none(field):
+			lines.append("\tv = get(k)")
+		else:
+			ns["d%d" % i] = field.get_default
+			lines.append("\tv = get(k, MISSING)")
+			lines.append("\tif v is MISSING: v = d%d()" % i)
+		check = CHECKS.get(type(field))
+		if check is None:
+			lines.extend(indent(_call(f)))
+		else:
+			lines.extend(indent(check(f, _fail)))
+	source = "\n".join(lines) + "\n"
+	exec compile(source, "<validator>", "exec") in ns
+	validate = ns["validate"]
+	validate.source = source
+	return validate
+
+
+_cache = LruCache(1000)
+
+def get_validator(model):
+	""" Get a validator for a model using L{compile_validator}.
+
+	Validators are cached, and compiled again if fields have been
+	added, removed or replaced in the model since they were compiled.
+
+		>>> from field.base import Int
+		>>> model = dict(a=Int())
+		>>> get_validator(model) is get_validator(model)
+		True
+		>>> validate = get_validator(model)
+		>>> model["b"] = Int()
+		>>> get_validator(model) is validate
+		False
+	"""
+	entry = _cache.get(id(model))
+	keys = model.keys()
+	ids = map(id, model.itervalues())
+	if entry is not None and entry[0] is model and entry[1] == keys \
+			and entry[2] == ids:
+		return entry[3]
+	validate = compile_validator(model)
+	# the entry holds on to the model and the fields, so their ids are
+	# not reused while it is cached
+	_cache.set(id(model), (model, keys, ids, validate, model.values()))
+	return validate
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
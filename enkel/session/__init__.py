@@ -18,4 +18,5 @@
 
 """ Session interface. """
 
-__all__ = ["backend", "memory"]
+__all__ = ["backend", "memory", "shm", "sqlite", "files",
+		"signedcookie", "serializer"]
@@ -63,6 +63,31 @@ class SessionBackend(object):
 		"""
 		raise NotImplementedError()
 
+	def delete(self, sid):
+		""" Delete session "sid". Does nothing if the session does
+		not exist.
+
+		Must be implemented in subclasses.
+
+		@param sid: The session id.
+		"""
+		raise NotImplementedError()
+
+	def touch(self, sid):
+		""" Restart the timeout of session "sid" without changing it.
+
+		Used by L{enkel.batteri.session.SessionMiddleware} for
+		sessions which are used but not changed. The default
+		implementation loads and saves the session. Does nothing if
+		the session does not exist.
+
+		@param sid: The session id.
+		"""
+		try:
+			self.save(sid, self.load(sid))
+		except NoSuchSessionError:
+			pass
+
 	def generate_sid(self):
 		""" Generates a random sid from the characters in L{SID_CHARS}.
 		@return: A random session id.
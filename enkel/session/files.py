@@ -0,0 +1,225 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Sessions stored as files. """
+
+import os
+from os.path import join
+from re import compile
+from hashlib import md5
+from struct import Struct
+from tempfile import mkstemp
+from random import randint
+from time import time
+from datetime import timedelta
+
+from backend import SessionBackend, NoSuchSessionError
+from memory import seconds
+from serializer import get_serializer, SerializerError
+
+
+EXPIRES = Struct("<d")
+
+
+class FileSession(SessionBackend):
+	""" Session management with one file per session, so sessions
+	can be shared by all processes with access to the folder.
+
+	Session files are spread over levels of sub-folders named by the
+	hash of the sid, 256 folders per level, so no folder gets too
+	large. A session is written to a temporary file which is renamed
+	to the session file, so readers never see a partial session and
+	no locks are needed. The expiry time is stored first in the file,
+	so loading a session is a single open and read.
+
+	Expired files are removed by a sweeper, run by L{save} every
+	sweep_interval. Each run removes files with a modification time
+	older than the timeout from the next L{SWEEP_FOLDERS} folders, so
+	all folders are swept in turn without a long pause. L{sweep_all}
+	sweeps every folder, and can be used from a cron job.
+
+	Usage
+	=====
+		>>> from tempfile import mkdtemp
+		>>> from shutil import rmtree
+		>>> folder = mkdtemp()
+		>>> s = FileSession(folder)
+		>>> s.save("xxAb", {"name": "John"})
+		>>> s.load("xxAb")
+		{'name': 'John'}
+		>>> s.get_path("xxAb")[len(folder):]
+		'/61/bf/xxAb'
+		>>> rmtree(folder)
+
+	@cvar SWEEP_FOLDERS: The number of folders swept by each run of
+			the sweeper.
+	@cvar SID_PATT: Compiled regular expression matching valid sids.
+			Sids are used as filenames, so this must never match
+			sids containing "/" or "..".
+	"""
+	SWEEP_FOLDERS = 64
+	SID_PATT = compile("^[a-zA-Z0-9]{1,128}$")
+
+	def __init__(self, folder, timeout=timedelta(seconds=3600),
+				levels=2, sweep_interval=timedelta(seconds=1),
+				serializer="pickle"):
+		"""
+		@param folder: The folder where session files are stored.
+		@param timeout: The lifetime of a inactive session.
+		@type timeout: datetime.timedelta
+		@param levels: The number of levels of sub-folders. Each
+				level multiplies the number of folders by 256.
+		@param sweep_interval: Interval at which the sweeper is run.
+		@type sweep_interval: datetime.timedelta
+		@param serializer: A L{enkel.session.serializer.Serializer}, or
+				the name of one. Defaults to pickle.
+		"""
+		self.folder = folder
+		self.timeout = timeout
+		self.levels = levels
+		self.serializer = get_serializer(serializer)
+		self._timeout = seconds(timeout)
+		self._sweep_interval = seconds(sweep_interval)
+		self._next_sweep = time() + self._sweep_interval
+		self._folders = 256 ** levels
+		# processes sharing the folder start sweeping at different places
+		self._sweep_pos = randint(0, self._folders - 1)
+
+	def get_folder(self, index):
+		""" Get the path to a folder from its number. """
+		parts = [self.folder]
+		for x in xrange(self.levels):
+			parts.append("%02x" % (index & 0xff))
+			index >>= 8
+		return join(*parts)
+
+	def get_path(self, sid):
+		""" Get the path to the file of a session.
+		@raise NoSuchSessionError: If sid is not a valid sid.
+		"""
+		if not self.SID_PATT.match(sid):
+			raise NoSuchSessionError("invalid sid: %r" % sid)
+		digest = md5(sid).hexdigest()
+		parts = [self.folder]
+		for x in xrange(self.levels):
+			parts.append(digest[2 * x:2 * x + 2])
+		parts.append(sid)
+		return join(*parts)
+
+	def load(self, sid):
+		try:
+			f = open(self.get_path(sid), "rb")
+			try:
+				data = f.read()
+			finally:
+				f.close()
+		except IOError:
+			raise NoSuchSessionError("session '%s' does not exist." % sid)
+		if len(data) < EXPIRES.size or \
+				EXPIRES.unpack_from(data)[0] <= time():
+			raise NoSuchSessionError("session '%s' does not exist." % sid)
+		try:
+			return self.serializer.loads(data[EXPIRES.size:])
+		except SerializerError:
+			raise NoSuchSessionError("session '%s' is corrupt." % sid)
+
+	def delete(self, sid):
+		try:
+			os.remove(self.get_path(sid))
+		except (OSError, NoSuchSessionError):
+			pass
+
+	def save(self, sid, session):
+		path = self.get_path(sid)
+		now = time()
+		data = EXPIRES.pack(now + self._timeout) + \
+				self.serializer.dumps(session)
+		folder = os.path.dirname(path)
+		try:
+			fd, tmp = mkstemp(".tmp", "", folder)
+		except OSError:
+			try:
+				os.makedirs(folder)
+			except OSError:
+				pass # created by another process
+			fd, tmp = mkstemp(".tmp", "", folder)
+		try:
+			try:
+				os.write(fd, data)
+			finally:
+				os.close(fd)
+			os.rename(tmp, path)
+		except:
+			os.remove(tmp)
+			raise
+		if now >= self._next_sweep:
+			self._next_sweep = now + self._sweep_interval
+			self.sweep()
+
+	def sweep_folder(self, folder, now=None):
+		""" Remove the expired session files in a folder.
+		@return: The number of removed files.
+		"""
+		min_mtime = (now or time()) - self._timeout
+		try:
+			filenames = os.listdir(folder)
+		except OSError:
+			return 0
+		removed = 0
+		for fn in filenames:
+			path = join(folder, fn)
+			try:
+				if os.stat(path).st_mtime <= min_mtime:
+					os.remove(path)
+					removed += 1
+			except OSError:
+				pass # removed by another process
+		return removed
+
+	def sweep(self):
+		""" Sweep the next L{SWEEP_FOLDERS} folders.
+		@return: The number of removed files.
+		"""
+		now = time()
+		pos = self._sweep_pos
+		self._sweep_pos = (pos + self.SWEEP_FOLDERS) % self._folders
+		removed = 0
+		for index in xrange(pos, pos + self.SWEEP_FOLDERS):
+			removed += self.sweep_folder(
+					self.get_folder(index % self._folders), now)
+		return removed
+
+	def sweep_all(self):
+		""" Sweep all the folders.
+		@return: The number of removed files.
+		"""
+		now = time()
+		removed = 0
+		for index in xrange(self._folders):
+			removed += self.sweep_folder(self.get_folder(index), now)
+		return removed
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
@@ -16,52 +16,183 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
-from datetime import datetime, timedelta
+from datetime import timedelta
+from time import time
+from heapq import heappush, heappop, heapify
+from threading import Lock
 
 from backend import SessionBackend, NoSuchSessionError
+from enkel.cache import LruCache
+
+
+def seconds(td):
+	""" Convert a datetime.timedelta to seconds.
+
+		>>> seconds(timedelta(minutes=1, microseconds=500000))
+		60.5
+	"""
+	return td.days * 86400 + td.seconds + td.microseconds / 1000000.0
+
+
+class _Stripe(object):
+	""" A part of the sessions in a L{MemorySession}, with its own
+	lock and expiry heap.
+
+	@ivar sessions: Maps sid to a [expires, session] list. A dict, or
+			a L{enkel.cache.LruCache} when the number of sessions
+			is limited.
+	@ivar heap: A heap of (expires, sid) pairs. Items are not removed
+			when a session is saved again, so items with a "expires"
+			that does not match the session are ignored.
+	@ivar next_sweep: The time (time.time()) of the next sweep.
+	@ivar store: store(sid, entry) stores a session entry.
+	@ivar peek: peek(sid) gets a session entry or None without
+			affecting the LRU order.
+	"""
+	__slots__ = ("lock", "sessions", "heap", "next_sweep", "store",
+			"peek")
+
+	def __init__(self, maxsize):
+		self.lock = Lock()
+		if maxsize:
+			self.sessions = LruCache(maxsize)
+			self.store = self.sessions.set
+			self.peek = self.sessions.peek
+		else:
+			self.sessions = dict()
+			self.store = self.sessions.__setitem__
+			self.peek = self.sessions.get
+		self.heap = []
+		self.next_sweep = 0
 
 
 class MemorySession(SessionBackend):
-	""" Session management entirely in memory. """
+	""" Session management entirely in memory.
+
+	The sessions are divided into stripes by the hash of their sid.
+	Each stripe has its own lock, so threads rarely wait for each
+	other, and a heap ordered by expiry time. Expired sessions are
+	removed from the top of the heap when a stripe is used, at most
+	L{SWEEP_LIMIT} at a time, so removing old sessions never stalls a
+	request for long. Expired sessions which have not been swept yet
+	are never loaded.
+
+	Usage
+	=====
+		>>> m = MemorySession(timeout=timedelta(minutes=30),
+		... 		max_sessions=10000)
+		>>> m.save("xxAb", {"name": "John"})
+		>>> m.load("xxAb")
+		{'name': 'John'}
+		>>> len(m)
+		1
+
+	@cvar SWEEP_LIMIT: The maximum number of heap items examined by
+			each sweep.
+	"""
+	SWEEP_LIMIT = 100
 	def __init__(self, timeout=timedelta(seconds=3600),
-				delete_interval=timedelta(seconds=60*5)):
+				delete_interval=timedelta(seconds=60*5), stripes=16,
+				max_sessions=None):
 		"""
 		@param timeout: The lifetime of a inactive session before it
 				is deleted.
 		@type timeout: datetime.timedelta
 		@param delete_interval: Interval at which to delete old
-				sessions.
+				sessions from each stripe.
 		@type delete_interval: datetime.timedelta
+		@param stripes: The number of stripes (independently locked
+				parts) the sessions are divided into.
+		@param max_sessions: If not None, the least recently used
+				sessions are removed when a stripe holds more than
+				max_sessions/stripes sessions.
 		"""
 		self.timeout = timeout
 		self.delete_interval = delete_interval
-		self.last_delete = datetime.now()
-		self.sessions = dict()
+		self._timeout = seconds(timeout)
+		self._interval = seconds(delete_interval)
+		if max_sessions:
+			maxsize = max(max_sessions // stripes, 1)
+		else:
+			maxsize = None
+		self.stripes = [_Stripe(maxsize) for x in xrange(stripes)]
+
+	def _stripe(self, sid):
+		return self.stripes[hash(sid) % len(self.stripes)]
 
 	def save(self, sid, session):
-		self._remove_old_on_interval()
-		self.sessions[sid] = datetime.now(), session
+		stripe = self._stripe(sid)
+		now = time()
+		expires = now + self._timeout
+		stripe.lock.acquire()
+		try:
+			if now >= stripe.next_sweep:
+				self._sweep(stripe, now)
+			stripe.store(sid, [expires, session])
+			heappush(stripe.heap, (expires, sid))
+			if len(stripe.heap) > 2 * len(stripe.sessions) + 64:
+				self._compact(stripe)
+		finally:
+			stripe.lock.release()
 
 	def load(self, sid):
-		self._remove_old_on_interval()
+		stripe = self._stripe(sid)
+		now = time()
+		stripe.lock.acquire()
 		try:
-			return self.sessions[sid][1]
-		except KeyError:
+			if now >= stripe.next_sweep:
+				self._sweep(stripe, now)
+			entry = stripe.sessions.get(sid)
+		finally:
+			stripe.lock.release()
+		if entry is None or entry[0] <= now:
 			raise NoSuchSessionError("session '%s' does not exist." % sid)
+		return entry[1]
+
+	def delete(self, sid):
+		stripe = self._stripe(sid)
+		stripe.lock.acquire()
+		try:
+			stripe.sessions.pop(sid, None) # the heap item is ignored
+		finally:
+			stripe.lock.release()
+
+	def __len__(self):
+		return sum(len(stripe.sessions) for stripe in self.stripes)
+
+	def _sweep(self, stripe, now):
+		""" Remove expired sessions from the top of the heap of a
+		stripe. Must be called with the stripe locked. """
+		heap = stripe.heap
+		peek = stripe.peek
+		for x in xrange(self.SWEEP_LIMIT):
+			if not heap or heap[0][0] > now:
+				stripe.next_sweep = now + self._interval
+				return
+			expires, sid = heappop(heap)
+			entry = peek(sid)
+			if entry is not None and entry[0] == expires:
+				stripe.sessions.pop(sid)
+		# more to do. continue on the next call
+
+	def _compact(self, stripe):
+		""" Rebuild the heap of a stripe without the items of
+		sessions which have been saved again or removed. Must be
+		called with the stripe locked. """
+		peek = stripe.peek
+		heap = []
+		for expires, sid in stripe.heap:
+			entry = peek(sid)
+			if entry is not None and entry[0] == expires:
+				heap.append((expires, sid))
+		heapify(heap)
+		stripe.heap = heap
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
 
-	def _remove_old_on_interval(self):
-		""" Remove old if last_delete is more than delete_interval ago. """
-		m = datetime.now() - self.delete_interval
-		if self.last_delete <= m:
-			self._remove_old()
-
-	def _remove_old(self):
-		old = []
-		min_time = datetime.now() - self.timeout
-		for sid, session in self.sessions.iteritems():
-			timestamp = session[0]
-			if timestamp <= min_time:
-				old.append(sid)
-		for sid in old:
-			del self.sessions[sid]
-		self.last_delete = datetime.now()
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
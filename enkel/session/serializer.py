@@ -0,0 +1,296 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Serialization of sessions.
+
+Session backends which store sessions outside the process convert
+them to strings with a serializer. Every backend taking a
+"serializer" parameter accepts a serializer object or one of the
+names in L{SERIALIZERS}.
+
+	>>> s = get_serializer("compact")
+	>>> data = s.dumps({"name": "John", "items": [1, 2.5, None]})
+	>>> s.loads(data) == {"name": "John", "items": [1, 2.5, None]}
+	True
+"""
+
+import marshal
+import cPickle
+from struct import Struct, error as StructError
+
+try:
+	import json
+except ImportError:
+	json = None
+
+
+class SerializerError(ValueError):
+	""" Raised when a session can not be serialized or
+	deserialized. """
+
+
+class Serializer(object):
+	""" Defines the serializer interface. """
+	def dumps(self, session):
+		""" Convert a session to a string.
+
+		Must be implemented in subclasses.
+
+		@param session: A dict.
+		@raise SerializerError: If the session contains values which
+				are not supported.
+		"""
+		raise NotImplementedError()
+
+	def loads(self, data):
+		""" Convert a string created by L{dumps} to a session.
+
+		Must be implemented in subclasses.
+
+		@raise SerializerError: If the data is invalid.
+		"""
+		raise NotImplementedError()
+
+
+class MarshalSerializer(Serializer):
+	""" Uses the marshal module. The fastest serializer, but only
+	supports builtin types, and the format may change between Python
+	versions. """
+	def dumps(self, session):
+		try:
+			return marshal.dumps(session)
+		except ValueError, e:
+			raise SerializerError(str(e))
+
+	def loads(self, data):
+		try:
+			return marshal.loads(data)
+		except (ValueError, EOFError, TypeError), e:
+			raise SerializerError(str(e))
+
+
+class PickleSerializer(Serializer):
+	""" Uses cPickle with the highest protocol. Supports almost any
+	object, but never load data from untrusted sources with it. """
+	def dumps(self, session):
+		try:
+			return cPickle.dumps(session, cPickle.HIGHEST_PROTOCOL)
+		except (cPickle.PicklingError, TypeError), e:
+			raise SerializerError(str(e))
+
+	def loads(self, data):
+		try:
+			return cPickle.loads(data)
+		except Exception, e:
+			raise SerializerError(str(e))
+
+
+class JsonSerializer(Serializer):
+	""" Uses the json module. Portable and safe, but strings are
+	loaded as unicode, tuples as lists, and dict keys must be
+	strings. """
+	def __init__(self):
+		if json is None:
+			raise SerializerError("the json module is not available.")
+
+	def dumps(self, session):
+		try:
+			return json.dumps(session, separators=(",", ":"))
+		except (TypeError, ValueError), e:
+			raise SerializerError(str(e))
+
+	def loads(self, data):
+		try:
+			return json.loads(data)
+		except ValueError, e:
+			raise SerializerError(str(e))
+
+
+_DOUBLE = Struct(">d")
+
+
+class CompactSerializer(Serializer):
+	""" A compact binary format for None, bool, int, long, float,
+	str, unicode, list, tuple and dict. Every value is a one byte
+	type tag, and integers and lengths are variable-length, so small
+	sessions are smaller than with marshal. Written in Python, so it
+	is slower than the other serializers.
+
+		>>> s = CompactSerializer()
+		>>> len(s.dumps({"uid": 10})), len(marshal.dumps({"uid": 10}))
+		(9, 15)
+		>>> s.loads(s.dumps([u"\\xe6", -300, 2 ** 80, (True,)]))
+		[u'\\xe6', -300, 1208925819614629174706176L, (True,)]
+	"""
+	def dumps(self, session):
+		out = []
+		self._dump(session, out.append)
+		return "".join(out)
+
+	def _varint(self, n, write):
+		while n > 0x7f:
+			write(chr(0x80 | (n & 0x7f)))
+			n >>= 7
+		write(chr(n))
+
+	def _dump(self, value, write):
+		t = type(value)
+		if t is str:
+			write("s")
+			self._varint(len(value), write)
+			write(value)
+		elif t is int:
+			if value >= 0:
+				write("i")
+				self._varint(value, write)
+			else:
+				write("n")
+				self._varint(-value, write)
+		elif t is dict:
+			write("d")
+			self._varint(len(value), write)
+			for k, v in value.iteritems():
+				self._dump(k, write)
+				self._dump(v, write)
+		elif t is list or t is tuple:
+			write(t is list and "l" or "t")
+			self._varint(len(value), write)
+			for v in value:
+				self._dump(v, write)
+		elif value is None:
+			write("N")
+		elif t is bool:
+			write(value and "T" or "F")
+		elif t is unicode:
+			value = value.encode("utf-8")
+			write("u")
+			self._varint(len(value), write)
+			write(value)
+		elif t is float:
+			write("f")
+			write(_DOUBLE.pack(value))
+		elif t is long:
+			value = str(value)
+			write("L")
+			self._varint(len(value), write)
+			write(value)
+		else:
+			raise SerializerError("can not serialize %r." % t)
+
+	def loads(self, data):
+		try:
+			value, pos = self._load(data, 0)
+		except (IndexError, ValueError, TypeError, StructError,
+				RuntimeError):
+			raise SerializerError("invalid data.")
+		if pos != len(data):
+			raise SerializerError("invalid data.")
+		return value
+
+	def _load(self, data, pos):
+		tag = data[pos]
+		pos += 1
+		if tag in "siLuldtn":
+			# tags followed by a varint
+			n = shift = 0
+			while True:
+				b = ord(data[pos])
+				pos += 1
+				n |= (b & 0x7f) << shift
+				if b < 0x80:
+					break
+				shift += 7
+			if tag == "i":
+				return n, pos
+			if tag == "n":
+				return -n, pos
+			if tag == "s":
+				end = pos + n
+				if end > len(data):
+					raise ValueError()
+				return data[pos:end], end
+			if tag == "d":
+				d = {}
+				load = self._load
+				for x in xrange(n):
+					k, pos = load(data, pos)
+					d[k], pos = load(data, pos)
+				return d, pos
+			if tag == "l" or tag == "t":
+				l = []
+				load = self._load
+				for x in xrange(n):
+					v, pos = load(data, pos)
+					l.append(v)
+				if tag == "t":
+					l = tuple(l)
+				return l, pos
+			end = pos + n
+			if end > len(data):
+				raise ValueError()
+			if tag == "u":
+				return data[pos:end].decode("utf-8"), end
+			return long(data[pos:end]), end
+		if tag == "N":
+			return None, pos
+		if tag == "T":
+			return True, pos
+		if tag == "F":
+			return False, pos
+		if tag == "f":
+			return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+		raise ValueError()
+
+
+SERIALIZERS = {
+	"marshal": MarshalSerializer,
+	"pickle": PickleSerializer,
+	"json": JsonSerializer,
+	"compact": CompactSerializer
+}
+
+
+def get_serializer(serializer):
+	""" Get a serializer from its name in L{SERIALIZERS}.
+
+		>>> get_serializer("marshal") # doctest: +ELLIPSIS
+		<...MarshalSerializer object at ...>
+		>>> s = PickleSerializer()
+		>>> get_serializer(s) is s
+		True
+
+	@param serializer: The name of the serializer, or a
+			L{Serializer} which is returned unchanged.
+	@raise ValueError: If there is no serializer with the given name.
+	"""
+	if not isinstance(serializer, basestring):
+		return serializer
+	try:
+		return SERIALIZERS[serializer]()
+	except KeyError:
+		raise ValueError("no such serializer: %r" % serializer)
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
@@ -0,0 +1,335 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Sessions shared between processes through a memory mapped file. """
+
+import os
+from struct import Struct
+from mmap import mmap, MAP_SHARED, PROT_READ, PROT_WRITE
+from fcntl import lockf, LOCK_EX, LOCK_SH, LOCK_UN
+from zlib import crc32
+from time import time
+from datetime import timedelta
+from threading import Lock
+
+from backend import SessionBackend, NoSuchSessionError
+from memory import seconds
+from serializer import get_serializer, SerializerError
+
+
+FILE_HEADER = Struct("<8sII")
+SLOT_HEADER = Struct("<dII")
+MAGIC = "ENKELSHM"
+
+
+class _SharedFile(object):
+	""" The file descriptor, memory map and thread locks shared by all
+	the L{SharedMemorySession} objects using the same file in a
+	process. fcntl locks belong to the process, so a second descriptor
+	would not keep the threads of the process apart, and closing it
+	would release the locks taken through the first one. A mmap keeps
+	a descriptor of its own, so the same goes for the map.
+	"""
+	__slots__ = ("key", "fd", "map", "slots", "slot_size", "locks",
+			"users")
+
+_files = {}
+_files_lock = Lock()
+
+
+class SharedMemorySession(SessionBackend):
+	""" Session management in a memory mapped file, so that the
+	sessions are shared between all processes using the file, like
+	the workers of a forking or pre-forked server.
+
+	The file is a hash table of fixed-size slots, grouped in buckets
+	of L{BUCKET_SLOTS} slots. A session is stored in the first free
+	slot of the bucket chosen by the hash of its sid (open addressing
+	within the bucket). A slot is free when it is empty or holds an
+	expired session. Each bucket is locked separately with a fcntl
+	lock on its part of the file, and a thread lock.
+
+	When a bucket is full, the session closest to expiring is
+	replaced, even if it has not expired. The file works like a
+	cache, and the user of the replaced session loses it without
+	any error being raised. Make slots a few times larger than the
+	number of sessions which are active within the timeout, so that
+	buckets rarely fill up.
+
+	fcntl locks belong to the process, not to the file descriptor, so
+	all the objects using the same file in a process share a single
+	descriptor, memory map and set of thread locks. The file is
+	closed when the last of them is closed.
+
+	Sessions are pickled unless another serializer is given, and
+	must fit in a slot (slot_size minus L{SLOT_OVERHEAD} bytes). Sids
+	can not be longer than L{MAX_SID}.
+
+	Usage
+	=====
+		>>> from tempfile import mktemp
+		>>> path = mktemp()
+		>>> s = SharedMemorySession(path, slots=64, slot_size=256)
+		>>> s.save("xxAb", {"name": "John"})
+		>>> SharedMemorySession(path).load("xxAb")
+		{'name': 'John'}
+		>>> s.close()
+		>>> os.remove(path)
+
+	@cvar BUCKET_SLOTS: The number of slots in each bucket.
+	@cvar MAX_SID: The maximum length of a sid.
+	@cvar SLOT_OVERHEAD: The number of bytes in a slot which are
+			not available for session data.
+	@cvar LOCK_STRIPES: The number of thread locks shared by the
+			buckets.
+	"""
+	BUCKET_SLOTS = 8
+	MAX_SID = 64
+	SLOT_OVERHEAD = SLOT_HEADER.size + MAX_SID
+	LOCK_STRIPES = 64
+	HEADER_SIZE = 64
+
+	def __init__(self, path, timeout=timedelta(seconds=3600),
+				slots=4096, slot_size=1024, serializer="pickle"):
+		"""
+		@param path: The file used to share the sessions. It is
+				created if it does not exist.
+		@param timeout: The lifetime of a inactive session.
+		@type timeout: datetime.timedelta
+		@param slots: The number of sessions the file can hold.
+				Rounded up to a multiple of L{BUCKET_SLOTS}. Ignored
+				if the file exists.
+		@param slot_size: The size of each slot in bytes. Ignored if
+				the file exists.
+		@param serializer: A L{enkel.session.serializer.Serializer}, or
+				the name of one. Defaults to pickle.
+		@raise ValueError: If the file exists and is not a complete
+				session file.
+		"""
+		self.path = path
+		self.timeout = timeout
+		self._timeout = seconds(timeout)
+		self.serializer = get_serializer(serializer)
+		self._file = f = self._open_file(path, slots, slot_size)
+		self.fd = f.fd
+		self.slots = slots = f.slots
+		self.slot_size = slot_size = f.slot_size
+		self.buckets = slots // self.BUCKET_SLOTS
+		self.bucket_size = self.BUCKET_SLOTS * slot_size
+		self._locks = f.locks
+		self.map = f.map
+
+	def _open_file(self, path, slots, slot_size):
+		""" Get the L{_SharedFile} of path, opening and initializing
+		the file if no other object in the process uses it. """
+		_files_lock.acquire()
+		try:
+			try:
+				st = os.stat(path)
+			except OSError:
+				pass
+			else:
+				f = _files.get((st.st_dev, st.st_ino))
+				if f is not None:
+					f.users += 1
+					return f
+			fd = os.open(path, os.O_RDWR | os.O_CREAT, 0600)
+			try:
+				slots, slot_size = self._init_file(fd, path, slots,
+						slot_size)
+				m = mmap(fd, self.HEADER_SIZE + slots * slot_size,
+						MAP_SHARED, PROT_READ | PROT_WRITE)
+			except:
+				os.close(fd)
+				raise
+			st = os.fstat(fd)
+			f = _SharedFile()
+			f.key = st.st_dev, st.st_ino
+			f.fd = fd
+			f.map = m
+			f.slots = slots
+			f.slot_size = slot_size
+			f.locks = [Lock() for x in xrange(self.LOCK_STRIPES)]
+			f.users = 1
+			_files[f.key] = f
+			return f
+		finally:
+			_files_lock.release()
+
+	def _init_file(self, fd, path, slots, slot_size):
+		""" Read the header of the file, or create the file if it is
+		empty.
+		@return: (slots, slot_size)
+		"""
+		lockf(fd, LOCK_EX)
+		try:
+			header = os.read(fd, FILE_HEADER.size)
+			if header:
+				if len(header) != FILE_HEADER.size:
+					raise ValueError("%s is not a session file." % path)
+				magic, slots, slot_size = FILE_HEADER.unpack(header)
+				if magic != MAGIC:
+					raise ValueError("%s is not a session file." % path)
+				if os.fstat(fd).st_size < self.HEADER_SIZE + \
+						slots * slot_size:
+					raise ValueError("%s is truncated." % path)
+			else:
+				if slot_size <= self.SLOT_OVERHEAD:
+					raise ValueError("slot_size must be larger than %d." %
+							self.SLOT_OVERHEAD)
+				slots = -(-slots // self.BUCKET_SLOTS) * self.BUCKET_SLOTS
+				os.write(fd, FILE_HEADER.pack(MAGIC, slots, slot_size))
+				os.ftruncate(fd, self.HEADER_SIZE + slots * slot_size)
+		finally:
+			lockf(fd, LOCK_UN)
+		return slots, slot_size
+
+	def _release_file(self, f):
+		_files_lock.acquire()
+		try:
+			f.users -= 1
+			if f.users == 0:
+				del _files[f.key]
+				f.map.close()
+				os.close(f.fd)
+		finally:
+			_files_lock.release()
+
+	def close(self):
+		""" Unmap and close the file, unless another object in the
+		process uses it. """
+		self._release_file(self._file)
+
+	def _bucket(self, sid):
+		return (crc32(sid) & 0xffffffff) % self.buckets
+
+	def _lock(self, bucket, mode):
+		lock = self._locks[bucket % self.LOCK_STRIPES]
+		lock.acquire()
+		try:
+			lockf(self.fd, mode, self.bucket_size,
+					self.HEADER_SIZE + bucket * self.bucket_size)
+		except:
+			lock.release()
+			raise
+
+	def _unlock(self, bucket):
+		try:
+			lockf(self.fd, LOCK_UN, self.bucket_size,
+					self.HEADER_SIZE + bucket * self.bucket_size)
+		finally:
+			self._locks[bucket % self.LOCK_STRIPES].release()
+
+	def _find(self, bucket, sid):
+		""" Find the slot of a sid in a bucket.
+		@return: (offset, expires, length) of the slot, or None.
+		"""
+		m = self.map
+		sidlen = len(sid)
+		offset = self.HEADER_SIZE + bucket * self.bucket_size
+		for x in xrange(self.BUCKET_SLOTS):
+			expires, l, length = SLOT_HEADER.unpack_from(m, offset)
+			if l == sidlen:
+				start = offset + SLOT_HEADER.size
+				if m[start:start + l] == sid:
+					return offset, expires, length
+			offset += self.slot_size
+		return None
+
+	def load(self, sid):
+		if len(sid) > self.MAX_SID: # can not have been saved
+			raise NoSuchSessionError("session '%s' does not exist." % sid)
+		bucket = self._bucket(sid)
+		self._lock(bucket, LOCK_SH)
+		try:
+			slot = self._find(bucket, sid)
+			if slot is not None:
+				offset, expires, length = slot
+				start = offset + self.SLOT_OVERHEAD
+				data = self.map[start:start + length]
+		finally:
+			self._unlock(bucket)
+		if slot is None or expires <= time():
+			raise NoSuchSessionError("session '%s' does not exist." % sid)
+		try:
+			return self.serializer.loads(data)
+		except SerializerError:
+			raise NoSuchSessionError("session '%s' is corrupt." % sid)
+
+	def delete(self, sid):
+		if len(sid) > self.MAX_SID:
+			return
+		bucket = self._bucket(sid)
+		self._lock(bucket, LOCK_EX)
+		try:
+			slot = self._find(bucket, sid)
+			if slot is not None:
+				SLOT_HEADER.pack_into(self.map, slot[0], 0, 0, 0)
+		finally:
+			self._unlock(bucket)
+
+	def save(self, sid, session):
+		"""
+		@raise ValueError: If sid is longer than L{MAX_SID}, or the
+				session does not fit in a slot.
+		"""
+		if len(sid) > self.MAX_SID:
+			raise ValueError("sid is longer than %d." % self.MAX_SID)
+		bucket = self._bucket(sid)
+		data = self.serializer.dumps(session)
+		if len(data) > self.slot_size - self.SLOT_OVERHEAD:
+			raise ValueError("session '%s' is too large (%d bytes)." % (
+					sid, len(data)))
+		m = self.map
+		now = time()
+		self._lock(bucket, LOCK_EX)
+		try:
+			slot = self._find(bucket, sid)
+			if slot is None:
+				# the first free slot, or the one closest to expiring
+				offset = self.HEADER_SIZE + bucket * self.bucket_size
+				best = None
+				for x in xrange(self.BUCKET_SLOTS):
+					expires, l, length = SLOT_HEADER.unpack_from(m, offset)
+					if l == 0 or expires <= now:
+						best = offset
+						break
+					if best is None or expires < best_expires:
+						best, best_expires = offset, expires
+					offset += self.slot_size
+				offset = best
+			else:
+				offset = slot[0]
+			start = offset + SLOT_HEADER.size
+			m[start:start + len(sid)] = sid
+			start = offset + self.SLOT_OVERHEAD
+			m[start:start + len(data)] = data
+			SLOT_HEADER.pack_into(m, offset, now + self._timeout,
+					len(sid), len(data))
+		finally:
+			self._unlock(bucket)
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
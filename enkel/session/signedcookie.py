@@ -0,0 +1,256 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Sessions stored in signed cookies. """
+
+import hmac
+from hashlib import sha1
+from os import urandom
+from struct import Struct, error as StructError
+from binascii import hexlify, unhexlify
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from zlib import compress, decompress, error as ZlibError
+from time import time
+from datetime import timedelta
+
+from backend import NoSuchSessionError
+from memory import seconds
+from serializer import get_serializer, SerializerError
+
+
+HEADER = Struct(">BI")
+COUNTER = Struct(">I")
+COMPRESSED = 1
+SERVER_SIDE = 2
+
+
+def xor(data, key):
+	""" Xor two strings of the same length.
+
+		>>> xor("abc", "   ")
+		'ABC'
+	"""
+	if not data:
+		return ""
+	x = long(hexlify(data), 16) ^ long(hexlify(key), 16)
+	return unhexlify("%0*x" % (2 * len(data), x))
+
+
+def safe_equal(a, b):
+	""" Compare two strings in a time independent of where they
+	differ, so that signatures can not be guessed a byte at a time.
+
+		>>> safe_equal("abc", "abc"), safe_equal("abc", "abd")
+		(True, False)
+	"""
+	if len(a) != len(b):
+		return False
+	result = 0
+	for x, y in zip(a, b):
+		result |= ord(x) ^ ord(y)
+	return result == 0
+
+
+class SignedCookieCodec(object):
+	""" Encodes the entire session in the session cookie, so no
+	server side storage is needed. Used with
+	L{enkel.batteri.session.CookieSessionMiddleware}.
+
+	This is not a L{enkel.session.backend.SessionBackend}, because a
+	session can not be saved under a session id, only encoded into a
+	new cookie value. It can not be used with
+	L{enkel.batteri.session.SessionMiddleware}.
+
+	The session is serialized with marshal by default, so it can
+	only contain builtin types, and compressed with zlib when that makes it
+	smaller. The cookie is signed with HMAC-SHA1, so clients can not
+	change it, and contains the time it was created, so it can not
+	be used after the timeout.
+
+	With encrypt=True, the contents are also encrypted, so clients
+	can not read them. The standard library has no block cipher, so
+	the encryption is a stream cipher using HMAC-SHA1 in counter mode
+	with a random nonce, and the ciphertext is signed.
+
+	Key rotation
+	============
+		The first of the secrets is used to sign new cookies, but
+		cookies signed with any of them are accepted. To replace a
+		secret, add the new secret first in the list and remove the
+		old one when all cookies signed with it have expired.
+
+	Large sessions
+	==============
+		Browsers only accept cookies of about 4KB. Sessions which are
+		larger than max_size when encoded are stored in the fallback
+		backend, and the cookie only contains the signed session id.
+		Without a fallback backend, ValueError is raised. When such a
+		session shrinks so that it fits in the cookie again, it is
+		deleted from the fallback backend.
+
+	Usage
+	=====
+		>>> b = SignedCookieCodec(["my secret"])
+		>>> value = b.encode({"name": "John"})
+		>>> b.load(value)
+		{'name': 'John'}
+		>>> b.load(value[:-2] + "xx")
+		Traceback (most recent call last):
+		...
+		NoSuchSessionError: invalid session cookie.
+
+	@cvar COMPRESS_MIN: Sessions are not compressed unless they
+			serialize to more than this number of bytes.
+	@cvar NONCE_SIZE: The number of random bytes in the nonce of
+			encrypted cookies.
+	"""
+	COMPRESS_MIN = 100
+	NONCE_SIZE = 12
+
+	def __init__(self, secrets, timeout=timedelta(seconds=3600),
+				compress=True, encrypt=False, max_size=4000, fallback=None,
+				serializer="marshal"):
+		"""
+		@param secrets: A list of secret keys. See the class
+				documentation.
+		@param timeout: The lifetime of a session cookie.
+		@type timeout: datetime.timedelta
+		@param compress: Compress sessions with zlib.
+		@param encrypt: Encrypt the sessions.
+		@param max_size: The maximum length of the cookie value.
+		@param fallback: A L{enkel.session.backend.SessionBackend} used
+				to store sessions which are too large for the cookie,
+				or None.
+		@param serializer: A L{enkel.session.serializer.Serializer}, or
+				the name of one. Defaults to marshal.
+				The cookie is signed, so loading it with marshal or
+				pickle is safe.
+		"""
+		if not secrets:
+			raise ValueError("at least one secret is required.")
+		self.timeout = timeout
+		self._timeout = seconds(timeout)
+		self.compress = compress
+		self.encrypt = encrypt
+		self.max_size = max_size
+		self.fallback = fallback
+		self.serializer = get_serializer(serializer)
+		self.keys = [(self._derive(secret, "mac"),
+				self._derive(secret, "enc")) for secret in secrets]
+
+	def _derive(self, secret, purpose):
+		return hmac.new(secret, "enkel.session." + purpose, sha1).digest()
+
+	def _keystream(self, key, nonce, length):
+		blocks = []
+		for i in xrange((length + 19) // 20):
+			blocks.append(hmac.new(key, nonce + COUNTER.pack(i),
+					sha1).digest())
+		return "".join(blocks)[:length]
+
+	def _sign(self, session, flags=0):
+		body = self.serializer.dumps(session)
+		if self.compress and len(body) > self.COMPRESS_MIN:
+			z = compress(body)
+			if len(z) < len(body):
+				body = z
+				flags |= COMPRESSED
+		blob = HEADER.pack(flags, int(time())) + body
+		mac_key, enc_key = self.keys[0]
+		if self.encrypt:
+			nonce = urandom(self.NONCE_SIZE)
+			blob = nonce + xor(blob,
+					self._keystream(enc_key, nonce, len(blob)))
+		blob += hmac.new(mac_key, blob, sha1).digest()
+		return urlsafe_b64encode(blob).rstrip("=")
+
+	def encode(self, session, server_sid=None):
+		""" Encode a session as a cookie value.
+		@param session: The session dict.
+		@param server_sid: The id the session had in the fallback
+				backend when it was loaded, or None. If the session
+				now fits in the cookie, it is deleted from the
+				fallback backend.
+		@raise ValueError: If the session is too large and there is
+				no fallback backend.
+		"""
+		value = self._sign(session)
+		if len(value) > self.max_size:
+			if self.fallback is None:
+				raise ValueError("the session is too large for a cookie "
+						"(%d bytes)." % len(value))
+			sid = server_sid or self.fallback.generate_sid()
+			self.fallback.save(sid, session)
+			value = self._sign(sid, SERVER_SIDE)
+		elif server_sid is not None and self.fallback is not None:
+			self.fallback.delete(server_sid)
+		return value
+
+	def decode(self, value):
+		""" Decode a cookie value created by L{encode}.
+		@return: (session, server_sid, created). server_sid is the id
+				of the session in the fallback backend, or None, and
+				created is the time (time.time()) the cookie was
+				created.
+		@raise NoSuchSessionError: If the cookie is invalid or expired.
+		"""
+		try:
+			blob = urlsafe_b64decode(value + "=" * (-len(value) % 4))
+		except (TypeError, ValueError):
+			raise NoSuchSessionError("invalid session cookie.")
+		blob, mac = blob[:-20], blob[-20:]
+		for mac_key, enc_key in self.keys:
+			if safe_equal(hmac.new(mac_key, blob, sha1).digest(), mac):
+				break
+		else:
+			raise NoSuchSessionError("invalid session cookie.")
+		if self.encrypt:
+			nonce, blob = blob[:self.NONCE_SIZE], blob[self.NONCE_SIZE:]
+			blob = xor(blob, self._keystream(enc_key, nonce, len(blob)))
+		try:
+			flags, created = HEADER.unpack_from(blob)
+			if created + self._timeout <= time():
+				raise NoSuchSessionError("the session cookie has expired.")
+			body = blob[HEADER.size:]
+			if flags & COMPRESSED:
+				body = decompress(body)
+			session = self.serializer.loads(body)
+		except (SerializerError, ValueError, EOFError, TypeError,
+				ZlibError, StructError):
+			raise NoSuchSessionError("invalid session cookie.")
+		if flags & SERVER_SIDE:
+			if self.fallback is None:
+				raise NoSuchSessionError("no fallback backend.")
+			return self.fallback.load(session), session, created
+		return session, None, created
+
+	def load(self, value):
+		""" Get the session from a cookie value created by L{encode}.
+		@raise NoSuchSessionError: If the cookie is invalid or expired.
+		"""
+		return self.decode(value)[0]
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
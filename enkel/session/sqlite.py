@@ -0,0 +1,267 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+""" Sessions stored in a SQLite database. """
+
+import sys
+from sqlite3 import connect, Binary, Error
+from threading import local, Lock
+from time import time
+from datetime import timedelta
+
+from backend import SessionBackend, NoSuchSessionError
+from memory import seconds
+from serializer import get_serializer, SerializerError
+
+
+class SqliteSession(SessionBackend):
+	""" Session management in a SQLite database, so sessions
+	survive restarts and can be shared by processes on the same host.
+
+	The database uses write-ahead logging (WAL), so loading sessions
+	does not wait for writers, and every thread has its own
+	connection. Sessions are pickled into a table with an index on
+	the expiry time, so L{purge} is a single indexed DELETE. It is run
+	by L{save} every purge_interval.
+
+	With write_behind set, saved sessions are kept in memory and
+	written in a single transaction when write_behind seconds have
+	passed since the last write, or when L{MAX_PENDING} sessions are
+	waiting. Saving a session again before it is written replaces
+	the pending copy, so hot sessions are written once per interval.
+	L{load} and L{purge} also write the pending sessions when the
+	interval has passed, so other processes see them even if this
+	process stops saving. Pending sessions are lost if the process
+	dies, so call L{flush} on shutdown.
+
+	Usage
+	=====
+		>>> s = SqliteSession(":memory:")
+		>>> s.save("xxAb", {"name": "John"})
+		>>> s.load("xxAb")
+		{'name': 'John'}
+
+	@cvar MAX_PENDING: The maximum number of sessions waiting to be
+			written when write_behind is used.
+	"""
+	MAX_PENDING = 1000
+	SCHEMA = """
+		CREATE TABLE IF NOT EXISTS sessions (
+			sid TEXT PRIMARY KEY,
+			expires REAL NOT NULL,
+			data BLOB NOT NULL);
+		CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires);
+	"""
+
+	def __init__(self, path, timeout=timedelta(seconds=3600),
+				write_behind=0, purge_interval=timedelta(seconds=60*5),
+				serializer="pickle"):
+		"""
+		@param path: The path to the database file. It is created if
+				it does not exist. ":memory:" gives a private
+				in-memory database, only usable from one thread.
+		@param timeout: The lifetime of a inactive session.
+		@type timeout: datetime.timedelta
+		@param write_behind: The maximum number of seconds a saved
+				session is kept in memory before it is written to the
+				database. 0 writes every session immediately.
+		@param purge_interval: Interval at which to delete expired
+				sessions.
+		@type purge_interval: datetime.timedelta
+		@param serializer: A L{enkel.session.serializer.Serializer}, or
+				the name of one. Defaults to pickle.
+		"""
+		self.path = path
+		self.timeout = timeout
+		self.write_behind = write_behind
+		self.serializer = get_serializer(serializer)
+		self._timeout = seconds(timeout)
+		self._purge_interval = seconds(purge_interval)
+		self._local = local()
+		self._pending = {}
+		self._flushing = {}
+		self._pending_lock = Lock()
+		self._flush_lock = Lock()
+		self._next_flush = 0
+		self._next_purge = time() + self._purge_interval
+		if path == ":memory:":
+			self._shared = self._connect()
+		else:
+			self._shared = None
+			self.get_connection()
+
+	def _connect(self):
+		db = connect(self.path, timeout=30, isolation_level=None,
+				check_same_thread=False)
+		db.text_factory = str
+		if self.path != ":memory:":
+			db.execute("PRAGMA journal_mode=WAL")
+			db.execute("PRAGMA synchronous=NORMAL")
+		db.executescript(self.SCHEMA)
+		return db
+
+	def get_connection(self):
+		""" Get the database connection of the current thread. """
+		if self._shared is not None:
+			return self._shared
+		try:
+			return self._local.db
+		except AttributeError:
+			db = self._local.db = self._connect()
+			return db
+
+	def load(self, sid):
+		now = time()
+		if self.write_behind:
+			self._flush_if_due(now)
+			entry = self._pending.get(sid) or self._flushing.get(sid)
+			if entry is not None:
+				if entry[0] <= now:
+					raise NoSuchSessionError(
+							"session '%s' does not exist." % sid)
+				return self._loads(sid, entry[1])
+		row = self.get_connection().execute(
+				"SELECT data FROM sessions WHERE sid = ? AND expires > ?",
+				(sid, now)).fetchone()
+		if row is None:
+			raise NoSuchSessionError("session '%s' does not exist." % sid)
+		return self._loads(sid, str(row[0]))
+
+	def delete(self, sid):
+		if self.write_behind:
+			self._pending_lock.acquire()
+			try:
+				self._pending.pop(sid, None)
+			finally:
+				self._pending_lock.release()
+			# wait for a flush which might be writing the session
+			self._flush_lock.acquire()
+			self._flush_lock.release()
+		self.get_connection().execute(
+				"DELETE FROM sessions WHERE sid = ?", (sid,))
+
+	def _loads(self, sid, data):
+		try:
+			return self.serializer.loads(data)
+		except SerializerError:
+			raise NoSuchSessionError("session '%s' is corrupt." % sid)
+
+	def save(self, sid, session):
+		now = time()
+		data = self.serializer.dumps(session)
+		expires = now + self._timeout
+		if self.write_behind:
+			self._pending_lock.acquire()
+			try:
+				self._pending[sid] = expires, data
+				flush = len(self._pending) >= self.MAX_PENDING or \
+						now >= self._next_flush
+			finally:
+				self._pending_lock.release()
+			if flush:
+				self.flush()
+		else:
+			self.get_connection().execute(
+					"INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+					(sid, expires, Binary(data)))
+		if now >= self._next_purge:
+			self._next_purge = now + self._purge_interval
+			self.purge()
+
+	def _flush_if_due(self, now):
+		if self._pending and now >= self._next_flush:
+			self.flush()
+
+	def flush(self):
+		""" Write all pending sessions to the database in a single
+		transaction.
+
+		Only one flush runs at a time, so batches are written in the
+		order they were saved, and the batch being written stays
+		visible to L{load} until it is committed. If writing fails,
+		the sessions are pending again (unless they have been saved
+		again since the flush started), and the error is raised.
+		"""
+		self._flush_lock.acquire()
+		try:
+			self._pending_lock.acquire()
+			try:
+				pending = self._flushing = self._pending
+				self._pending = {}
+				self._next_flush = time() + self.write_behind
+			finally:
+				self._pending_lock.release()
+			if not pending:
+				return
+			db = self.get_connection()
+			db.execute("BEGIN")
+			try:
+				db.executemany(
+						"INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+						[(sid, expires, Binary(data))
+						for sid, (expires, data) in pending.iteritems()])
+				db.execute("COMMIT")
+			except:
+				exc_info = sys.exc_info()
+				self._pending_lock.acquire()
+				try:
+					for sid, entry in pending.iteritems():
+						self._pending.setdefault(sid, entry)
+				finally:
+					self._pending_lock.release()
+				try:
+					db.execute("ROLLBACK")
+				except Error:
+					pass # already rolled back by sqlite
+				raise exc_info[0], exc_info[1], exc_info[2]
+		finally:
+			self._flushing = {}
+			self._flush_lock.release()
+
+	def purge(self):
+		""" Delete all expired sessions from the database.
+		@return: The number of deleted sessions.
+		"""
+		if self.write_behind:
+			self._flush_if_due(time())
+		return self.get_connection().execute(
+				"DELETE FROM sessions WHERE expires <= ?",
+				(time(),)).rowcount
+
+	def close(self):
+		""" Write pending sessions and close the connection of the
+		current thread. Other threads get a new connection the next
+		time they use a file database. A ":memory:" database only
+		exists in its single connection, so it can not be used after
+		it is closed (sqlite3.ProgrammingError is raised).
+		"""
+		self.flush()
+		db = self.get_connection()
+		if db is not self._shared:
+			del self._local.db
+		db.close()
+
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from enkel.wansgli.testhelpers import run_suite
+	run_suite(suite())
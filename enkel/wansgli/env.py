@@ -20,7 +20,7 @@
 
 
 from urlparse import urlparse
-from re import compile, findall, VERBOSE
+from re import compile, VERBOSE
 from urllib import quote
 
 
@@ -35,6 +35,10 @@ def parse_value(value):
 
 	key=value; key2=value ...
 
+	The value is split in a single pass, so values may contain
+	spaces and "=". Whitespace around keys and values is stripped,
+	and entries without a "=" are ignored.
+
 
 	Example
 	=======
@@ -48,12 +52,21 @@ def parse_value(value):
 		>>> parse_value(env["HTTP_COOKIE"])
 		{'name': 'John', 'sid': 'ax445'}
 
+		Values containing spaces and "="
+
+		>>> parse_value("data=a=b=c; name = John Peters ;; junk")
+		{'data': 'a=b=c', 'name': 'John Peters'}
+
 	@see: L{parse_value_odd} for a slightly different value parser.
 	@return: key-value-pair dict
 	"""
 	d = {}
-	for k, v in findall("(\w+)=([^;]+)", value):
-		d[k] = v
+	for item in value.split(";"):
+		k, sep, v = item.partition("=")
+		if sep:
+			k = k.strip()
+			if k:
+				d[k] = v.strip()
 	return d
 
 
@@ -78,6 +91,183 @@ def parse_value_odd(value):
 	return a, parse_value(b)
 
 
+""" The environ key used by L{cached_header} to store parsed headers. """
+HEADER_CACHE_KEY = "enkel.wansgli.env.header_cache"
+
+def cached_header(env, key, parser):
+	""" Parse a environ value at most once per request.
+
+	The result of parser(env[key]) is stored in env[L{HEADER_CACHE_KEY}]
+	together with the raw value, so the next call with the same key
+	returns the parsed value without parsing again. If the raw value
+	is changed, the value is parsed again.
+
+	Example
+	=======
+		>>> calls = []
+		>>> def parser(value):
+		... 	calls.append(value)
+		... 	return value.upper()
+
+		>>> env = dict(HTTP_X_TEST="hello")
+		>>> cached_header(env, "HTTP_X_TEST", parser)
+		'HELLO'
+		>>> cached_header(env, "HTTP_X_TEST", parser)
+		'HELLO'
+		>>> calls
+		['hello']
+
+		>>> env["HTTP_X_TEST"] = "world"
+		>>> cached_header(env, "HTTP_X_TEST", parser)
+		'WORLD'
+		>>> cached_header(env, "HTTP_X_DOES_NOT_EXIST", parser) is None
+		True
+
+	@param env: A WSGI environ dict.
+	@param key: The environ key of the value to parse.
+	@param parser: A callable taking the raw value as argument and
+			returning the parsed value. Note that the parsed value
+			is shared between all callers, so it should not be
+			modified.
+	@return: The parsed value, or None if key is not in env or
+			the value is empty.
+	"""
+	raw = env.get(key)
+	if not raw:
+		return None
+	cache = env.get(HEADER_CACHE_KEY)
+	if cache is None:
+		cache = env[HEADER_CACHE_KEY] = {}
+	else:
+		entry = cache.get(key)
+		if entry is not None and entry[0] is raw:
+			return entry[1]
+	parsed = parser(raw)
+	cache[key] = (raw, parsed)
+	return parsed
+
+
+def parse_qvalues(value):
+	""" Parse a quality-value list like the one used in the
+	Accept-Language and Accept-Encoding headers.
+
+	Example
+	=======
+		>>> parse_qvalues("da, en-gb;q=0.8, en;q=0.7")
+		[('da', 1.0), ('en-gb', 0.8), ('en', 0.7)]
+		>>> parse_qvalues("gzip;q=0.5, identity, *;q=0")
+		[('identity', 1.0), ('gzip', 0.5), ('*', 0.0)]
+		>>> parse_qvalues("gzip;q=bad, deflate")
+		[('deflate', 1.0), ('gzip', 0.0)]
+
+	@return: A list of (lowercase-value, quality) pairs sorted by
+			quality, highest first. Values with equal quality keep
+			the order they had in the header.
+	"""
+	result = []
+	for item in value.split(","):
+		v, sep, params = item.partition(";")
+		v = v.strip().lower()
+		if not v:
+			continue
+		q = 1.0
+		if sep:
+			for param in params.split(";"):
+				k, sep, pv = param.partition("=")
+				if k.strip() == "q":
+					try:
+						q = float(pv)
+					except ValueError:
+						q = 0.0
+		result.append((v, q))
+	result.sort(key=lambda x: x[1], reverse=True)
+	return result
+
+
+def parse_authorization(value):
+	""" Parse a Authorization header.
+
+	Example
+	=======
+		>>> parse_authorization("Basic am9objpzZWNyZXQ=")
+		('basic', 'am9objpzZWNyZXQ=')
+		>>> parse_authorization("Digest")
+		('digest', '')
+
+	@return: (lowercase-scheme, credentials)
+	"""
+	scheme, sep, credentials = value.strip().partition(" ")
+	return scheme.lower(), credentials.strip()
+
+
+def get_accept_language(env):
+	""" Get the parsed Accept-Language header.
+
+	The header is only parsed once per request (see L{cached_header}).
+
+		>>> env = dict(HTTP_ACCEPT_LANGUAGE="nb;q=0.9, en")
+		>>> get_accept_language(env)
+		[('en', 1.0), ('nb', 0.9)]
+
+	@return: See L{parse_qvalues}. Returns None if the header
+			is missing.
+	"""
+	return cached_header(env, "HTTP_ACCEPT_LANGUAGE", parse_qvalues)
+
+def get_accept_encoding(env):
+	""" Get the parsed Accept-Encoding header.
+
+	The header is only parsed once per request (see L{cached_header}).
+
+		>>> env = dict(HTTP_ACCEPT_ENCODING="gzip, deflate")
+		>>> get_accept_encoding(env)
+		[('gzip', 1.0), ('deflate', 1.0)]
+
+	@return: See L{parse_qvalues}. Returns None if the header
+			is missing.
+	"""
+	return cached_header(env, "HTTP_ACCEPT_ENCODING", parse_qvalues)
+
+def accepts_encoding(env, coding):
+	""" Check if the client accepts a content-coding, using the
+	Accept-Encoding header.
+
+		>>> env = dict(HTTP_ACCEPT_ENCODING="gzip;q=0.5, deflate;q=0")
+		>>> accepts_encoding(env, "gzip"), accepts_encoding(env, "deflate")
+		(True, False)
+		>>> accepts_encoding(dict(HTTP_ACCEPT_ENCODING="*"), "gzip")
+		True
+		>>> accepts_encoding({}, "gzip")
+		False
+
+	@param coding: A lowercase content-coding like "gzip".
+	"""
+	accepted = get_accept_encoding(env)
+	if not accepted:
+		return False
+	star = 0
+	for value, q in accepted:
+		if value == coding or value == "x-" + coding:
+			return q > 0
+		if value == "*":
+			star = q
+	return star > 0
+
+def get_authorization(env):
+	""" Get the parsed Authorization header.
+
+	The header is only parsed once per request (see L{cached_header}).
+
+		>>> env = dict(HTTP_AUTHORIZATION="Basic am9objpzZWNyZXQ=")
+		>>> get_authorization(env)
+		('basic', 'am9objpzZWNyZXQ=')
+
+	@return: See L{parse_authorization}. Returns None if the header
+			is missing.
+	"""
+	return cached_header(env, "HTTP_AUTHORIZATION", parse_authorization)
+
+
 def create_url(env, url_scheme=None, server_name=None,
 		server_port=None, script_name=None, path_info=None,
 		query_string="", http_host=None):
@@ -29,7 +29,8 @@ from datetime import datetime
 from sys import stderr
 import logging
 
-from server_base import WsgiServerMixIn, LoggerAsErrorFile
+from server_base import WsgiServerMixIn, LoggerAsErrorFile, \
+		LazyHeaderEnviron, add_http_headers
 from apprunner import run_app, Response
 from utils import rfc1123_date
 from env import urlpath_to_environ
@@ -109,37 +110,30 @@ class WsgiRequestHandler(BaseHTTPRequestHandler):
 		And all HTTP-headers provided by the client prefixed with
 		'HTTP_'.
 
+		The parts of the environ which are the same for every request
+		are only created once per server (see
+		L{Server.get_env_template}), so this only has to add the
+		request specific values. If the server has
+		L{lazy_environ <server_base.WsgiServerMixIn.lazy_environ>} set,
+		the "HTTP_" entries are added on first use.
+
 		@note: This is the most minimal environment allowed by
 			PEP 333. You might wish to subclass this to provide
 			more environment variables.
 
 		@return: The WSGI environ dict to be sent to the application.
 		"""
-		env = self.ENV.copy()
-
-
-		if not (len(self.server.server_address) == 2 and \
-				isinstance(self.server.server_address[1], int)):
-			raise ValueError("can only listen to internet protocol "\
-				"server_address'es, like ('localhost', 8000).")
-
-		env.update({
-			"REQUEST_METHOD": method,
-			"SERVER_PROTOCOL": self.protocol_version,
-			"SERVER_NAME": self.server.server_address[0],
-			"SERVER_PORT": str(self.server.server_address[1]),
-			"CONTENT_TYPE": self.headers.get("content-type", ""),
-			"CONTENT_LENGTH": self.headers.get("content-length", ""),
-			"REMOTE_ADDR": self.client_address[0],
-			"wsgi.input": self.rfile
-		})
-		self.server.add_common_wsgienv(env)
+		env = self.server.get_env_template().copy()
+		env["REQUEST_METHOD"] = method
+		env["CONTENT_TYPE"] = self.headers.get("content-type", "")
+		env["CONTENT_LENGTH"] = self.headers.get("content-length", "")
+		env["REMOTE_ADDR"] = self.client_address[0]
+		env["wsgi.input"] = self.rfile
 
 		# Add all http headers client provided
-		for name in self.headers:
-			value = self.headers.get(name)
-			env["HTTP_" + name.upper()] = value
-
+		if self.server.lazy_environ:
+			return LazyHeaderEnviron(env, self.headers.items())
+		add_http_headers(env, self.headers.items())
 		return env
 
 
@@ -170,6 +164,7 @@ class Server(HTTPServer, WsgiServerMixIn):
 	"""
 	REQUEST_HANDLER = WsgiRequestHandler
 	url_scheme = "http"
+	_env_template = None
 	log = logging.getLogger("enkel.wansgli.http.server")
 	applog = LoggerAsErrorFile(logging.getLogger(
 		"enkel.wansgli.http.app"))
@@ -181,6 +176,32 @@ class Server(HTTPServer, WsgiServerMixIn):
 		self.app = app
 		HTTPServer.__init__(self, server_address, self.REQUEST_HANDLER)
 
+	def get_env_template(self):
+		""" Get the part of the WSGI environ dict which is the same
+		for every request to this server.
+
+		This is the ENV of the request handler, SERVER_PROTOCOL,
+		SERVER_NAME, SERVER_PORT and the values from
+		L{add_common_wsgienv}. It is created on the first call.
+		Request handlers should copy the template, not modify it.
+
+		@raise ValueError: If the server does not listen to a
+				internet protocol address.
+		"""
+		if self._env_template is None:
+			if not (len(self.server_address) == 2 and \
+					isinstance(self.server_address[1], int)):
+				raise ValueError("can only listen to internet protocol "\
+					"server_address'es, like ('localhost', 8000).")
+			handler = self.RequestHandlerClass
+			env = handler.ENV.copy()
+			env["SERVER_PROTOCOL"] = handler.protocol_version
+			env["SERVER_NAME"] = self.server_address[0]
+			env["SERVER_PORT"] = str(self.server_address[1])
+			self.add_common_wsgienv(env)
+			self._env_template = env
+		return self._env_template
+
 class ThreadingServer(ThreadingMixIn, Server):
 	""" A threading HTTP WSGI server. """
 	MULTITHREAD = True
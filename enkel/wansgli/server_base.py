@@ -23,6 +23,174 @@ def check_required_headers(env):
 				"Client did not send required header: %s" % name)
 
 
+_HTTP_ENV_KEYS = {}
+
+def http_env_key(name):
+	""" Get the environ key for a http header name.
+
+		>>> http_env_key("user-agent")
+		'HTTP_USER_AGENT'
+		>>> http_env_key("Accept")
+		'HTTP_ACCEPT'
+
+	Keys are cached, so the key for a header name is only
+	created once per process.
+	"""
+	try:
+		return _HTTP_ENV_KEYS[name]
+	except KeyError:
+		key = "HTTP_" + name.upper().replace("-", "_")
+		if len(_HTTP_ENV_KEYS) < 1000: # do not let clients fill up memory
+			_HTTP_ENV_KEYS[name] = key
+		return key
+
+
+def add_http_headers(env, headers):
+	""" Add http headers to a WSGI environ dict.
+
+		>>> env = {}
+		>>> add_http_headers(env, [("user-agent", "Mozilla"), ("host", "x")])
+		>>> env == {"HTTP_USER_AGENT": "Mozilla", "HTTP_HOST": "x"}
+		True
+
+	@param env: A WSGI environ dict.
+	@param headers: A iterable of (header-name, value) pairs.
+	"""
+	for name, value in headers:
+		env[http_env_key(name)] = value
+
+
+class LazyHeaderEnviron(dict):
+	""" A WSGI environ dict which does not add the "HTTP_" entries
+	until they are needed.
+
+	Most apps only look at a few of the http headers, so creating a
+	environ key for every header on every request is mostly wasted.
+	This dict adds all the http headers the first time a "HTTP_"
+	key is looked up, or when the dict is used in a way that
+	requires all entries (iteration, len(), copy(), comparison ...).
+
+		>>> env = LazyHeaderEnviron({"REQUEST_METHOD": "GET"},
+		... 	[("user-agent", "Mozilla"), ("host", "example.com")])
+		>>> env["REQUEST_METHOD"]
+		'GET'
+		>>> env.is_materialized()
+		False
+		>>> env["HTTP_HOST"]
+		'example.com'
+		>>> env.is_materialized()
+		True
+		>>> sorted(env.keys())
+		['HTTP_HOST', 'HTTP_USER_AGENT', 'REQUEST_METHOD']
+
+		Whole-dict operations also add the headers.
+
+		>>> env = LazyHeaderEnviron({}, [("host", "example.com")])
+		>>> len(env)
+		1
+		>>> env = LazyHeaderEnviron({}, [("host", "example.com")])
+		>>> env.copy() == {"HTTP_HOST": "example.com"}
+		True
+		>>> type(env.copy()) is dict
+		True
+
+	@note: PEP 333 requires the environ to be a builtin dict, and in
+		CPython 2, dict(env) and somedict.update(env) read the
+		underlying dict directly without calling any of the methods
+		overridden here. Apps which do that must call L{materialize}
+		first. This is why the servers only use this class when
+		asked to (see L{WsgiServerMixIn.lazy_environ}).
+	"""
+	def __init__(self, env, headers):
+		"""
+		@param env: The non-header part of the environ.
+		@param headers: A iterable of (header-name, value) pairs.
+		"""
+		dict.__init__(self, env)
+		self._headers = headers
+
+	def is_materialized(self):
+		""" Check if the http headers have been added. """
+		return self._headers is None
+
+	def materialize(self):
+		""" Add all the http headers to the dict. Headers already
+		in the dict are not overwritten. """
+		headers = self._headers
+		if headers is not None:
+			self._headers = None
+			for name, value in headers:
+				dict.setdefault(self, http_env_key(name), value)
+
+	def _materialize_for(self, key):
+		if self._headers is not None and \
+				isinstance(key, str) and key.startswith("HTTP_"):
+			self.materialize()
+
+	def __getitem__(self, key):
+		self._materialize_for(key)
+		return dict.__getitem__(self, key)
+
+	def get(self, key, default=None):
+		self._materialize_for(key)
+		return dict.get(self, key, default)
+
+	def __contains__(self, key):
+		self._materialize_for(key)
+		return dict.__contains__(self, key)
+
+	def has_key(self, key):
+		return self.__contains__(key)
+
+	def __setitem__(self, key, value):
+		self._materialize_for(key)
+		dict.__setitem__(self, key, value)
+
+	def __delitem__(self, key):
+		self._materialize_for(key)
+		dict.__delitem__(self, key)
+
+	def setdefault(self, key, default=None):
+		self._materialize_for(key)
+		return dict.setdefault(self, key, default)
+
+	def pop(self, key, *default):
+		self._materialize_for(key)
+		return dict.pop(self, key, *default)
+
+	def copy(self):
+		self.materialize()
+		return dict(self)
+
+	def __repr__(self):
+		self.materialize()
+		return dict.__repr__(self)
+
+	def __eq__(self, other):
+		self.materialize()
+		if isinstance(other, LazyHeaderEnviron):
+			other.materialize()
+		return dict.__eq__(self, other)
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+
+def _materializing(name):
+	method = getattr(dict, name)
+	def wrapper(self, *args, **kw):
+		self.materialize()
+		return method(self, *args, **kw)
+	wrapper.__name__ = name
+	return wrapper
+
+for _name in ("keys", "values", "items", "iterkeys", "itervalues",
+		"iteritems", "viewkeys", "viewvalues", "viewitems", "__iter__",
+		"__len__", "popitem", "update", "clear"):
+	setattr(LazyHeaderEnviron, _name, _materializing(_name))
+del _name
+
+
 class LoggerAsErrorFile(object):
 	""" Wraps a logger.Logger object in a interface compatible with
 	the wsgi.errors object. """
@@ -55,6 +223,8 @@ class WsgiServerMixIn(object):
 		object may be simultaneously invoked by another thread in the
 		same process, and should evaluate false otherwise.
 	@cvar REQUEST_HANDLER: The request-handler used to handle requests.
+	@cvar lazy_environ: If True, servers which support it give apps a
+		L{LazyHeaderEnviron} instead of a plain dict. Defaults to False.
 
 	@ivar server_info: A short information string sent to clients
 		using the "SERVER" header. Note that this can be
@@ -75,14 +245,38 @@ class WsgiServerMixIn(object):
 
 	server_info = "unknown" # for security
 	debug = False
+	lazy_environ = False
+	_common_wsgienv = None
+
 
+	def get_common_wsgienv(self):
+		""" Get the wsgi.* entries which are the same for every
+		request to this server.
+
+		The dict is created on the first call and reused for every
+		request after that, so changes to L{applog} or url_scheme
+		must be made before the server starts serving. Do not
+		modify the returned dict.
+		"""
+		if self._common_wsgienv is None:
+			self._common_wsgienv = {
+				"wsgi.url_scheme": self.url_scheme,
+				"wsgi.errors": self.applog,
+				"wsgi.version": (1, 0),
+				"wsgi.multithread": self.MULTITHREAD,
+				"wsgi.multiprocess": self.MULTIPROCESS,
+				"wsgi.run_once": self.RUN_ONCE
+			}
+		return self._common_wsgienv
 
 	def add_common_wsgienv(self, env):
-		env.update({
-			"wsgi.url_scheme": self.url_scheme,
-			"wsgi.errors": self.applog,
-			"wsgi.version": (1, 0),
-			"wsgi.multithread": self.MULTITHREAD,
-			"wsgi.multiprocess": self.MULTIPROCESS,
-			"wsgi.run_once": self.RUN_ONCE
-		})
+		env.update(self.get_common_wsgienv())
+
+
+def suite():
+	import doctest
+	return doctest.DocTestSuite()
+
+if __name__ == "__main__":
+	from testhelpers import run_suite
+	run_suite(suite())
@@ -25,6 +25,8 @@ might be useful in WSGI applications.
 """
 
 from cStringIO import StringIO
+from rfc822 import parsedate_tz
+from calendar import timegm
 
 
 BUF_SIZE = 512
@@ -53,6 +55,38 @@ def rfc1123_date(datetimeObj):
 	return datetimeObj.strftime(format)
 
 
+def parse_http_date(value):
+	""" Parse a date from a HTTP header.
+
+	Supports the three date formats allowed by rfc 2616.
+
+	Example
+	=======
+		>>> parse_http_date("Sun, 12 Nov 2006 08:12:31 GMT")
+		1163319151
+		>>> parse_http_date("Sunday, 12-Nov-06 08:12:31 GMT")
+		1163319151
+		>>> parse_http_date("Sun Nov 12 08:12:31 2006")
+		1163319151
+		>>> parse_http_date("not a date") is None
+		True
+
+	@return: The date as seconds since the epoch (UTC), or None
+			if value is not a valid date.
+	"""
+	try:
+		t = parsedate_tz(value)
+		if t is None:
+			return None
+		year = t[0]
+		if year < 100: # rfc 850 dates have a two-digit year
+			year += year < 70 and 2000 or 1900
+		# the asctime format has no timezone, and is always GMT
+		return timegm((year,) + t[1:6] + (0, 0, 0)) - (t[9] or 0)
+	except (TypeError, ValueError, OverflowError):
+		return None
+
+
 def import_mod(modpath):
 	""" Import a module by string.
 
@@ -19,14 +19,14 @@
 from enkel.wansgli.testhelpers import unit_mod_suite, run_suite
 
 from enkel import cookie as dt_cookie, \
-		i18n as dt_i18n
+		i18n as dt_i18n, cache as dt_cache
 
 import wansgli, session, xmlutils, exml, xhtml, batteri
 
 
 def suite():
 	return unit_mod_suite(wansgli, session, dt_i18n,
-			dt_cookie, xmlutils, exml, xhtml, batteri)
+			dt_cookie, dt_cache, xmlutils, exml, xhtml, batteri)
 
 if __name__ == "__main__":
 	run_suite(suite())
@@ -18,14 +18,18 @@
 
 from enkel.wansgli.testhelpers import unit_mod_suite, run_suite
 from enkel.batteri import session as dt_session_middleware, \
-		rest_route as dt_rest_route
+		rest_route as dt_rest_route, browser_route as dt_browser_route, \
+		host_route as dt_host_route, staticfiles as dt_staticfiles
 
-import error_handler, admin, staticfiles, staticcms, browser_route
+import error_handler, admin, staticfiles, staticcms, browser_route, \
+		rest_route, session, host_route
 
 
 def suite():
 	return unit_mod_suite(error_handler, admin, staticcms, browser_route,
-			staticfiles, dt_rest_route, dt_session_middleware)
+			staticfiles, rest_route, session, host_route, dt_rest_route,
+			dt_session_middleware, dt_browser_route, dt_host_route,
+			dt_staticfiles)
 
 if __name__ == "__main__":
 	run_suite(suite())
@@ -73,6 +73,31 @@ class TestBrowserRoute(TestCase):
 		r = self.check_patt("safari")
 		self.assertEquals(r, [5])
 
+	def test_classify(self):
+		route = BrowserRoute(None, gecko=1, khtml=2, msie=3, msie6=4,
+				msie7=5, safari=6)
+		r = [route.classify(ua) for ua in user_agents]
+		self.assertEquals(r, ["gecko", "gecko", "khtml", "msie6", "msie7",
+				"safari", None])
+
+	def test_priority(self):
+		route = BrowserRoute(None, ["msie", "msie6"], msie=1, msie6=2)
+		self.assertEquals(route.classify(user_agents[3]), "msie")
+		route = BrowserRoute(None, ["gecko", "safari"], gecko=1, safari=2)
+		self.assertEquals(route.classify(user_agents[5]), "safari")
+
+	def test_set_priority(self):
+		route = BrowserRoute(None, msie=1, msie6=2, gecko=3)
+		self.assertEquals(route.priority, ("msie6", "msie", "gecko"))
+		self.assertEquals(route.classify(user_agents[3]), "msie6")
+		route.priority = ["gecko", "msie"]
+		self.assertEquals(route.priority, ("gecko", "msie", "msie6"))
+		self.assertEquals(route.classify(user_agents[3]), "msie")
+		self.assertEquals(route.classify(user_agents[0]), "gecko")
+
+	def test_empty(self):
+		route = BrowserRoute(None)
+		self.assertEquals(route.classify(user_agents[0]), None)
 
 
 
@@ -0,0 +1,100 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+from unittest import TestCase
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.wansgli.apptester import AppTester
+from enkel.batteri.host_route import HostRoute
+from enkel.batteri.rest_route import RESTroute
+from enkel.cache import LruCache
+
+
+def app(name):
+	def app(env, start_response):
+		start_response("200 OK", [("content-type", "text/plain")])
+		return [name]
+	return app
+
+
+class TestHostRoute(TestCase):
+	def setUp(self):
+		self.route = HostRoute()
+		self.route.add("example.com", app("main"))
+		self.route.add("*.example.com", app("sub"))
+		self.route.add("*.a.example.com", app("a"))
+
+	def get(self, url, route=None, **env):
+		t = AppTester(route or self.route, [], url)
+		for key, value in env.iteritems():
+			t.set_env(key, value)
+		return t.run_get()
+
+	def test_exact(self):
+		self.assertEquals(self.get("http://example.com/").body, "main")
+		self.assertEquals(self.get("http://EXAMPLE.com.:80/").body, "main")
+
+	def test_wildcard(self):
+		self.assertEquals(self.get("http://x.example.com/").body, "sub")
+		self.assertEquals(self.get("http://x.y.example.com/").body, "sub")
+		self.assertEquals(self.get("http://x.a.example.com/").body, "a")
+		self.assertEquals(self.get("http://a.example.com/").body, "sub")
+		self.assertEquals(self.route.find("xexample.com"), None)
+
+	def test_exact_wins(self):
+		self.route.add("x.a.example.com", app("exact"))
+		self.assertEquals(self.get("http://x.a.example.com/").body,
+				"exact")
+
+	def test_server_name(self):
+		r = self.get("http://example.org/", HTTP_HOST="",
+				SERVER_NAME="x.example.com")
+		self.assertEquals(r.body, "sub")
+
+	def test_notfound(self):
+		r = self.get("http://example.org/")
+		self.assert_(r.status.startswith("404"))
+		self.assertEquals(r.body, "example.org does not exist")
+
+	def test_default_app(self):
+		route = HostRoute(app("default"))
+		self.assertEquals(self.get("http://example.org/", route).body,
+				"default")
+
+	def test_cache(self):
+		rest = RESTroute(cache=10)
+		self.route.add("b.example.com", rest)
+		self.assertEquals(rest.cache.maxsize, 10)
+
+		cache = LruCache(20)
+		self.route.add("c.example.com", rest, cache=cache)
+		self.assert_(rest.cache is cache)
+
+		self.route.add("d.example.com", rest, cache=30)
+		self.assertEquals(rest.cache.maxsize, 30)
+
+		self.route.add("e.example.com", rest, cache=0)
+		self.assertEquals(rest.cache, None)
+
+
+def suite():
+	return unit_case_suite(TestHostRoute)
+
+if __name__ == "__main__":
+	run_suite(suite())
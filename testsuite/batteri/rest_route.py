@@ -0,0 +1,235 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import re
+from unittest import TestCase
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.batteri.rest_route import RESTroute, RouteTrie
+
+
+def app(env, start_response):
+	pass
+
+
+def linear_match(routes, path):
+	""" The plain "try every route in order" matching which RouteTrie
+	must give the same result as. """
+	for route in routes:
+		m = route[2].match(path)
+		if m:
+			return route, m.groupdict()
+	return None
+
+
+class TestRouteTrie(TestCase):
+	patterns = [
+		"/{w:lang}/{d:id}",
+		"/archives/{d:year}",
+		"/archives/{d:year}/{w:name}",
+		"/archives/2007",
+		"/archives/2007/all",
+		"/archives>",
+		"*/{d:id}.xml",
+		"/test[/{d:year}]",
+		"/files/{f:name}",
+		"/files/index.html",
+		"/a/b/c/{x:x}",
+		"/a/{x:x}/c/d",
+	]
+	paths = [
+		"/", "", "/en/10", "/archives/2007", "/archives/2007/all",
+		"/archives/2007/hello", "/archives/x", "/archivesxx",
+		"/x/y/100.xml", "/test", "/test/10", "/testx", "/files/a.b",
+		"/files/index.html", "/a/b/c/d", "/a/x/c/d", "/a/b/c/d/e",
+	]
+
+	def check(self, route, paths):
+		trie = RouteTrie(route.GET)
+		for path in paths:
+			expected = linear_match(route.GET, path)
+			result = trie.match(path)
+			if result:
+				result = result[0], result[1].groupdict()
+			self.assertEquals(result, expected, path)
+
+	def test_same_as_linear(self):
+		route = RESTroute()
+		for patt in self.patterns:
+			route.add(patt, GET=app, env=dict(patt=patt))
+		self.check(route, self.paths)
+
+	def test_order(self):
+		route = RESTroute()
+		for patt in reversed(self.patterns):
+			route.add(patt, GET=app, env=dict(patt=patt))
+		self.check(route, self.paths)
+
+	def test_many_groups(self):
+		# more groups than fits in a single python regex
+		route = RESTroute()
+		for i in xrange(150):
+			route.add("/{w:a}/{w:b}/%d" % i, GET=app)
+		route.add("/{w:a}/{w:b}/{d:c}", GET=app)
+		paths = ["/x/y/%d" % i for i in xrange(0, 200, 7)]
+		self.check(route, paths)
+
+	def test_add_invalidates(self):
+		route = RESTroute()
+		route.add("/a/{d:id}", GET=app)
+		self.assertEquals(route.match("GET", "/b/10"), None)
+		route.add("/b/{d:id}", GET=app, env=dict(x=1))
+		self.assertEquals(route.match("GET", "/b/10"),
+				(app, dict(id="10"), dict(x=1)))
+
+
+class TestRouteCache(TestCase):
+	def test_nested(self):
+		def subapp(env, start_response):
+			return [env["wsgiorg.routing_args"][1]["name"]]
+		route = RESTroute(cache=10)
+		subroute = RESTroute(cache=route.cache)
+		subroute.add("*/{w:name}", GET=subapp)
+		route.add("/sub>", GET=subroute)
+
+		env = dict(REQUEST_METHOD="GET", SCRIPT_NAME="", PATH_INFO="/sub/x")
+		self.assertEquals(route(env, None), ["x"])
+		env = dict(REQUEST_METHOD="GET", SCRIPT_NAME="", PATH_INFO="/sub/x")
+		self.assertEquals(route(env, None), ["x"])
+		self.assertEquals(route.cache.hits, 2)
+		self.assertEquals(route.cache.misses, 2)
+
+	def test_kwargs_not_shared(self):
+		route = RESTroute(cache=10)
+		route.add("/{w:name}", GET=app)
+		route.match("GET", "/x")[1]["name"] = "changed"
+		self.assertEquals(route.match("GET", "/x")[1], dict(name="x"))
+
+	def test_add_clears(self):
+		route = RESTroute(cache=10)
+		self.assertEquals(route.match("GET", "/x"), None)
+		route.add("/{w:name}", GET=app)
+		self.assertEquals(route.match("GET", "/x"), (app, dict(name="x"), {}))
+
+	def test_append_clears(self):
+		def app2(env, start_response):
+			pass
+		route = RESTroute(cache=10)
+		route.add("/{w:name}", GET=app)
+		self.assertEquals(route.match("GET", "/x")[0], app)
+		route.GET.insert(0, ("/x", app2, re.compile("^/x$"), {}))
+		self.assertEquals(route.match("GET", "/x")[0], app2)
+
+	def test_hit_not_compiled(self):
+		route = RESTroute(cache=10)
+		route.add("/{w:name}", GET=app)
+		route.match("GET", "/x")
+		route.compile = None
+		self.assertEquals(route.match("GET", "/x"), (app, dict(name="x"), {}))
+
+	def test_misses_not_cached(self):
+		route = RESTroute(cache=2)
+		route.add("/{w:name}", GET=app)
+		route.match("GET", "/a")
+		for i in xrange(10):
+			self.assertEquals(route.match("GET", "/no/%d" % i), None)
+		self.assertEquals(route.cache.keys(), [(route, "GET", "/a")])
+
+	def test_disabled(self):
+		self.assertEquals(RESTroute(cache=0).cache, None)
+		self.assertEquals(RESTroute().cache, None)
+
+
+def path_app(env, start_response):
+	return ["%(SCRIPT_NAME)s|%(PATH_INFO)s" % env]
+
+
+class TestMount(TestCase):
+	def run_app(self, app, path, script_name=""):
+		env = dict(REQUEST_METHOD="GET", SCRIPT_NAME=script_name,
+				PATH_INFO=path)
+		return app(env, lambda *a: None)[0]
+
+	def test_mount(self):
+		route = RESTroute()
+		sub = RESTroute(match_script_name=False)
+		sub.add("/{w:name}", GET=path_app)
+		sub.add("", GET=path_app)
+		route.mount("/sub", sub)
+		self.assertEquals(self.run_app(route, "/sub/x"), "/sub|/x")
+		self.assertEquals(self.run_app(route, "/sub"), "/sub|")
+		self.assertEquals(self.run_app(route, "/subway"),
+				"/subway does not exist")
+
+	def test_trailing_slash(self):
+		route = RESTroute()
+		route.mount("/sub/", path_app)
+		self.assertEquals(self.run_app(route, "/sub/x/y"), "/sub/|x/y")
+
+	def test_deep(self):
+		route = RESTroute(cache=10, match_script_name=False)
+		a = RESTroute(match_script_name=False, cache=route.cache)
+		b = RESTroute(match_script_name=False, cache=route.cache)
+		b.add("/{d:id}", GET=path_app)
+		a.mount("/{w:user}", b)
+		route.mount("/users", a)
+		for i in xrange(2):
+			self.assertEquals(self.run_app(route, "/users/jack/10", "/app"),
+					"/app/users/jack|/10")
+		self.assertEquals(route.cache.hits, 3)
+
+	def test_routing_args(self):
+		def args_app(env, start_response):
+			return [env["wsgiorg.routing_args"]]
+		route = RESTroute()
+		blog = RESTroute(match_script_name=False)
+		blog.add("/{d:year}", GET=args_app)
+		blog.add("/{w:user}", GET=args_app) # overrides the parent
+		route.mount("/{w:user}/blog", blog)
+		self.assertEquals(self.run_app(route, "/jack/blog/2007"),
+				([], dict(user="jack", year="2007")))
+		self.assertEquals(self.run_app(route, "/jack/blog/amy"),
+				([], dict(user="amy")))
+
+	def test_routing_args_route(self):
+		def args_app(env, start_response):
+			return [env["wsgiorg.routing_args"]]
+		route = RESTroute()
+		route.add("/{w:user}/{d:year}", GET=args_app)
+		env = dict(REQUEST_METHOD="GET", SCRIPT_NAME="",
+				PATH_INFO="/jack/2007",
+				**{"wsgiorg.routing_args": (["a"], dict(user="x", y=1))})
+		self.assertEquals(route(env, None)[0],
+				(["a"], dict(user="jack", year="2007", y=1)))
+		self.assertEquals(self.run_app(route, "/jack/2007"),
+				([], dict(user="jack", year="2007")))
+
+	def test_order(self):
+		route = RESTroute()
+		route.add("/sub/special", GET=lambda e, s: ["special"])
+		route.mount("/sub", path_app)
+		route.add("/sub/x", GET=lambda e, s: ["unreachable"])
+		self.assertEquals(self.run_app(route, "/sub/special"), "special")
+		self.assertEquals(self.run_app(route, "/sub/x"), "/sub|/x")
+
+
+def suite():
+	return unit_case_suite(TestRouteTrie, TestRouteCache, TestMount)
+
+if __name__ == '__main__':
+	run_suite(suite())
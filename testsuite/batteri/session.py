@@ -0,0 +1,199 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import TestCase
+from time import time
+from datetime import timedelta
+from tempfile import mkdtemp
+from shutil import rmtree
+from os.path import join
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.wansgli.apptester import AppTester
+from enkel.session.memory import MemorySession
+from enkel.session.shm import SharedMemorySession
+from enkel.session.signedcookie import SignedCookieCodec
+from enkel.batteri.session import SessionMiddleware, CookieSessionMiddleware
+
+
+class CountingBackend(MemorySession):
+	def __init__(self):
+		MemorySession.__init__(self, timeout=timedelta(seconds=1000))
+		self.loads = 0
+		self.saves = 0
+		self.touches = 0
+
+	def load(self, sid):
+		self.loads += 1
+		return MemorySession.load(self, sid)
+
+	def save(self, sid, session):
+		self.saves += 1
+		MemorySession.save(self, sid, session)
+
+	def touch(self, sid):
+		self.touches += 1
+
+
+def reader(env, start_response):
+	start_response("200 OK", [("content-type", "text/plain")])
+	return [env["enkel.session"].get("name", "")]
+
+def writer(env, start_response):
+	env["enkel.session"]["name"] = "John"
+	start_response("200 OK", [("content-type", "text/plain")])
+	return ["ok"]
+
+def noop(env, start_response):
+	start_response("200 OK", [("content-type", "text/plain")])
+	return ["ok"]
+
+
+class TestSessionMiddleware(TestCase):
+	def setUp(self):
+		self.backend = CountingBackend()
+		self.backend.save("xxAb", {"name": "Peter"})
+		self.backend.saves = 0
+
+	def run_app(self, app, cookie=None):
+		t = AppTester(SessionMiddleware(app, self.backend))
+		if cookie:
+			t.set_env("HTTP_COOKIE", "sid=" + cookie)
+		return t.run_get()
+
+	def fresh_cookie(self):
+		return "xxAb.%x" % int(time())
+
+	def test_lazy(self):
+		r = self.run_app(noop)
+		self.assertEquals(self.backend.loads, 0)
+		r = self.run_app(noop, self.fresh_cookie())
+		self.assertEquals(self.backend.loads, 0)
+		self.assertEquals(self.backend.saves, 0)
+		self.assert_("set-cookie" not in r.headers)
+
+	def test_read_only(self):
+		r = self.run_app(reader, self.fresh_cookie())
+		self.assertEquals(r.body, "Peter")
+		self.assertEquals(self.backend.loads, 1)
+		self.assertEquals(self.backend.saves, 0)
+
+	def test_dirty(self):
+		r = self.run_app(writer, self.fresh_cookie())
+		self.assertEquals(self.backend.saves, 1)
+		self.assertEquals(self.backend.load("xxAb"), {"name": "John"})
+
+	def test_new_session(self):
+		r = self.run_app(noop)
+		self.assert_("set-cookie" not in r.headers)
+		r = self.run_app(reader)
+		self.assert_("set-cookie" not in r.headers)
+		self.assertEquals(self.backend.saves, 0)
+		r = self.run_app(writer)
+		self.assert_(r.headers["set-cookie"].startswith("sid="))
+		self.assertEquals(self.backend.saves, 1)
+		r = self.run_app(writer, "nothere")
+		sid = r.headers["set-cookie"].split("=", 1)[1].split(".")[0]
+		self.assertNotEquals(sid, "nothere")
+		self.assertEquals(self.backend.load(sid), {"name": "John"})
+
+	def test_expired_late_use(self):
+		def late_writer(env, start_response):
+			start_response("200 OK", [("content-type", "text/plain")])
+			env["enkel.session"]["name"] = "John"
+			return ["ok"]
+		for x in xrange(3):
+			r = self.run_app(late_writer, "expired.%x" % int(time()))
+			self.assert_("set-cookie" not in r.headers)
+		self.assertEquals(len(self.backend), 1) # no orphans
+		self.assertEquals(self.backend.saves, 0)
+
+		# the new session reaches the client when changed in time
+		r = self.run_app(writer, "expired.%x" % int(time()))
+		sid = r.headers["set-cookie"].split("=", 1)[1].split(".")[0]
+		self.assertEquals(self.backend.load(sid), {"name": "John"})
+
+	def test_invalid_sid(self):
+		folder = mkdtemp()
+		try:
+			self.backend = SharedMemorySession(join(folder, "s"), slots=8,
+					slot_size=256)
+			r = self.run_app(reader, "x" * 65)
+			self.assertEquals(r.status, "200 OK")
+			self.backend.close()
+		finally:
+			rmtree(folder)
+
+	def test_refresh(self):
+		old = "xxAb.%x" % int(time() - 500)
+		r = self.run_app(noop, old)
+		self.assert_(r.headers["set-cookie"].startswith("sid=xxAb."))
+		self.assertEquals(self.backend.saves, 1)
+		r = self.run_app(reader, old)
+		self.assertEquals(self.backend.saves, 2)
+		r = self.run_app(noop, "xxAb") # cookies without a time
+		self.assertEquals(self.backend.saves, 3)
+
+
+class TestCookieSessionMiddleware(TestCase):
+	def setUp(self):
+		self.codec = SignedCookieCodec(["secret"],
+				timeout=timedelta(seconds=1000))
+
+	def run_app(self, app, value=None, **kw):
+		t = AppTester(CookieSessionMiddleware(app, self.codec, **kw))
+		if value:
+			t.set_env("HTTP_COOKIE", "session=" + value)
+		return t.run_get()
+
+	def test_new(self):
+		r = self.run_app(noop)
+		self.assert_("set-cookie" not in r.headers)
+		r = self.run_app(writer)
+		value = r.headers["set-cookie"].split(";")[0].split("=", 1)[1]
+		self.assertEquals(self.codec.load(value), {"name": "John"})
+
+	def test_unchanged(self):
+		value = self.codec.encode({"name": "Peter"})
+		r = self.run_app(reader, value)
+		self.assertEquals(r.body, "Peter")
+		self.assert_("set-cookie" not in r.headers)
+		def early_reader(env, start_response):
+			name = env["enkel.session"]["name"]
+			start_response("200 OK", [("content-type", "text/plain")])
+			return [name]
+		r = self.run_app(early_reader, value,
+				refresh_interval=timedelta(0))
+		self.assert_("set-cookie" in r.headers)
+
+	def test_attributes(self):
+		m = CookieSessionMiddleware(noop, self.codec)
+		self.assertEquals(m.refresh_interval, 100)
+		self.assertEquals(m.create_cookie("x", 0).value, "x")
+
+	def test_invalid(self):
+		r = self.run_app(reader, "invalid")
+		self.assertEquals(r.body, "")
+		self.assert_("set-cookie" not in r.headers)
+
+
+def suite():
+	return unit_case_suite(TestSessionMiddleware, TestCookieSessionMiddleware)
+
+if __name__ == '__main__':
+	run_suite(suite())
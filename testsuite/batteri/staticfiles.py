@@ -19,12 +19,14 @@
 from tempfile import mkdtemp
 from shutil import rmtree
 from os.path import join
-from os import mkdir, symlink
+from os import mkdir, symlink, stat, utime, remove
 from unittest import TestCase
+from gzip import GzipFile
+from cStringIO import StringIO
 
 from enkel.wansgli.testhelpers import unit_case_suite, run_suite
 from enkel.wansgli.apptester import AppTester
-from enkel.batteri.staticfiles import StaticFiles
+from enkel.batteri.staticfiles import StaticFiles, make_etag
 
 
 
@@ -71,6 +73,36 @@ class TestStaticFiles(TestCase):
 				url="http://example.com/tst/test2link").run_get()
 		self.assertEquals(r.body, "a test...")
 
+	def test_folder_sorted(self):
+		s = StaticFiles(self.folder, follow_symlinks=True)
+		r = AppTester(s, url="http://example.com").run_get()
+		body = r.body
+		self.assert_(body.index("tst/") < body.index("test.txt") <
+				body.index("test1link") < body.index("test2.txt"))
+
+	def test_folder_pages(self):
+		s = StaticFiles(self.folder, listing_page_size=2)
+		r = AppTester(s, url="http://example.com/").run_get()
+		self.assert_(r.body_contains("tst/"))
+		self.assert_(r.body_contains("test.txt"))
+		self.assert_(r.body_ncontains("test2.txt", 0))
+		self.assert_(r.body_contains("page 1 of 2"))
+		r = AppTester(s, url="http://example.com/?page=2").run_get()
+		self.assert_(r.body_ncontains("test.txt", 0))
+		self.assert_(r.body_contains("<a href='test2.txt'>"))
+		self.assert_(r.body_contains("<a href='?page=1'>previous</a>"))
+
+	def test_listing_cache(self):
+		s = StaticFiles(self.folder, listing_cache=10)
+		r = AppTester(s, url="http://example.com/").run_get()
+		self.assert_(r.body_ncontains("new.txt", 0))
+		r = AppTester(s, url="http://example.com/").run_get()
+		self.assertEquals(s.listing_cache.hits, 1)
+		open(join(self.folder, "new.txt"), "w").write("new")
+		utime(self.folder, (0, stat(self.folder).st_mtime + 10))
+		r = AppTester(s, url="http://example.com/").run_get()
+		self.assert_(r.body_contains("new.txt"))
+
 	def test_pattern(self):
 		s = StaticFiles(self.folder, follow_symlinks=True,
 				pattern="(^[a-z.]+$)|(^tst/.*$)")
@@ -83,6 +115,255 @@ class TestStaticFiles(TestCase):
 		r = AppTester(s, url="http://example.com/tst").run_get()
 		self.assertEquals(r.body, "tst does not exist")
 
+	def get_range(self, range, if_range=None, path="/test.txt", **kw):
+		s = StaticFiles(self.folder, **kw)
+		t = AppTester(s, url="http://example.com" + path)
+		t.set_env("HTTP_RANGE", range)
+		if if_range:
+			t.set_env("HTTP_IF_RANGE", if_range)
+		return t.run_get()
+
+	def test_range(self):
+		r = self.get_range("bytes=6-")
+		self.assertEquals(r.status, "206 Partial Content")
+		self.assertEquals(r.body, "world")
+		self.assertEquals(r.headers["content-range"], "bytes 6-10/11")
+		self.assertEquals(r.headers["content-length"], "5")
+		r = self.get_range("bytes=-3")
+		self.assertEquals(r.body, "rld")
+
+	def test_multiple_ranges(self):
+		r = self.get_range("bytes=0-1,6-7")
+		self.assertEquals(r.status, "206 Partial Content")
+		ct = r.headers["content-type"]
+		self.assert_(ct.startswith("multipart/byteranges; boundary="))
+		boundary = ct.split("=", 1)[1]
+		self.assertEquals(int(r.headers["content-length"]), len(r.body))
+		parts = r.body.split("--" + boundary)
+		self.assertEquals(len(parts), 4)
+		self.assert_(parts[1].endswith("\r\n\r\nhe\r\n"))
+		self.assert_("content-range: bytes 6-7/11" in parts[2])
+		self.assert_(parts[2].endswith("\r\n\r\nwo\r\n"))
+		self.assertEquals(parts[3], "--\r\n")
+
+	def test_unsatisfiable_range(self):
+		r = self.get_range("bytes=100-")
+		self.assertEquals(r.status, "416 Requested Range Not Satisfiable")
+		self.assertEquals(r.headers["content-range"], "bytes */11")
+
+	def test_invalid_range(self):
+		r = self.get_range("bytes=5-1")
+		self.assertEquals(r.status, "200 OK")
+		self.assertEquals(r.body, "hello world")
+
+	def test_if_range(self):
+		r = self.get_range("bytes=6-", '"not-the-etag"')
+		self.assertEquals(r.status, "200 OK")
+		self.assertEquals(r.body, "hello world")
+		r = self.get_range("bytes=6-", "Sun, 12 Nov 2006 08:12:31 GMT")
+		self.assertEquals(r.status, "200 OK")
+		etag = make_etag(stat(join(self.folder, "test.txt")))
+		r = self.get_range("bytes=6-", etag)
+		self.assertEquals(r.body, "world")
+
+	def test_cache(self):
+		s = StaticFiles(self.folder, cache_size=10, cache_ttl=1000)
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		info = s.cache.get(join(self.folder, "test.txt"))
+		self.assertEquals(info.etag, make_etag(stat(join(self.folder,
+				"test.txt"))))
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "hello world")
+		self.assert_(s.cache.get(join(self.folder, "test.txt")) is info)
+
+		# changes are found by the fstat when the file is opened
+		open(join(self.folder, "test.txt"), "w").write("changed!")
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "changed!")
+		self.assertEquals(r.headers["content-length"], "8")
+
+	def test_cache_ttl(self):
+		s = StaticFiles(self.folder, cache_size=10, cache_ttl=0)
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "hello world")
+		rmtree(self.folder)
+		mkdir(self.folder)
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "test.txt does not exist")
+
+	def test_removed(self):
+		for kw in dict(), dict(compress_cache=10000):
+			open(join(self.folder, "big.txt"), "w").write("hello " * 100)
+			s = StaticFiles(self.folder, cache_size=10, cache_ttl=1000,
+					**kw)
+			t = AppTester(s, url="http://example.com/big.txt")
+			self.assertEquals(t.run_get().status, "200 OK")
+			remove(join(self.folder, "big.txt"))
+			t.set_env("HTTP_ACCEPT_ENCODING", "gzip")
+			r = t.run_get()
+			self.assertEquals(r.body, "big.txt does not exist")
+			self.assertEquals(s.cache.get(join(self.folder, "big.txt")),
+					None)
+
+	def test_rewritten_same_second(self):
+		path = join(self.folder, "big.txt")
+		s = StaticFiles(self.folder, compress_cache=10000)
+		t = AppTester(s, url="http://example.com/big.txt")
+		t.set_env("HTTP_ACCEPT_ENCODING", "gzip")
+		bodies = []
+		for data, mtime in ("a" * 1000, 1000000.25), ("b" * 1000, 1000000.75):
+			open(path, "w").write(data)
+			utime(path, (mtime, mtime))
+			r = t.run_get()
+			bodies.append(GzipFile(fileobj=StringIO(r.body)).read())
+		self.assertEquals(bodies, ["a" * 1000, "b" * 1000])
+
+	def test_cache_fds(self):
+		s = StaticFiles(self.folder, cache_size=10, cache_fds=True)
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "hello world")
+		info = s.cache.get(join(self.folder, "test.txt"))
+		self.assert_(info.map is not None)
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "hello world")
+		r = self.get_range("bytes=0-1,6-", cache_size=10, cache_fds=True)
+		self.assert_(r.body_contains("\r\n\r\nworld\r\n"))
+
+	def test_memory_cache(self):
+		s = StaticFiles(self.folder, memory_cache=100)
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "hello world")
+		self.assertEquals(s.memory_cache.cost, 11)
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "hello world")
+		self.assertEquals(r.headers["content-length"], "11")
+		self.assertEquals(s.memory_cache.hits, 1)
+		r = self.get_range("bytes=6-", memory_cache=100)
+		self.assertEquals(r.body, "world")
+
+		open(join(self.folder, "test.txt"), "w").write("changed!")
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assertEquals(r.body, "changed!")
+		self.assertEquals(s.memory_cache.cost, 8)
+
+		# files larger than the budget are not cached
+		open(join(self.folder, "big.txt"), "w").write("x" * 101)
+		r = AppTester(s, url="http://example.com/big.txt").run_get()
+		self.assertEquals(len(r.body), 101)
+		self.assertEquals(s.memory_cache.cost, 8)
+
+	def get_conditional(self, path="/test.txt", **env):
+		s = StaticFiles(self.folder)
+		t = AppTester(s, url="http://example.com" + path)
+		for key, value in env.iteritems():
+			t.set_env(key, value)
+		return t.run_get()
+
+	def test_validators(self):
+		r = self.get_conditional()
+		etag = make_etag(stat(join(self.folder, "test.txt")))
+		self.assertEquals(r.headers["etag"], etag)
+		lm = r.headers["last-modified"]
+
+		r = self.get_conditional(HTTP_IF_NONE_MATCH=etag)
+		self.assertEquals(r.status, "304 Not Modified")
+		self.assertEquals(r.body, "")
+		self.assertEquals(r.headers["etag"], etag)
+		self.assert_("content-length" not in r.headers)
+		r = self.get_conditional(HTTP_IF_NONE_MATCH='"x", W/' + etag)
+		self.assertEquals(r.status, "304 Not Modified")
+		r = self.get_conditional(HTTP_IF_NONE_MATCH='"x"')
+		self.assertEquals(r.body, "hello world")
+
+		r = self.get_conditional(HTTP_IF_MODIFIED_SINCE=lm)
+		self.assertEquals(r.status, "304 Not Modified")
+		r = self.get_conditional(
+				HTTP_IF_MODIFIED_SINCE="Sun, 12 Nov 2006 08:12:31 GMT")
+		self.assertEquals(r.status, "200 OK")
+
+		# If-None-Match takes precedence
+		r = self.get_conditional(HTTP_IF_MODIFIED_SINCE=lm,
+				HTTP_IF_NONE_MATCH='"x"')
+		self.assertEquals(r.status, "200 OK")
+
+	def test_cache_control(self):
+		s = StaticFiles(self.folder, cache_control=[
+				(r"test2\.txt$", "max-age=60"), (r"tst/", "no-cache")])
+		r = AppTester(s, url="http://example.com/test2.txt").run_get()
+		self.assertEquals(r.headers["cache-control"], "max-age=60")
+		r = AppTester(s, url="http://example.com/test.txt").run_get()
+		self.assert_("cache-control" not in r.headers)
+
+	def get_gzip(self, path, accept="gzip", range=None, **kw):
+		s = StaticFiles(self.folder, **kw)
+		t = AppTester(s, url="http://example.com" + path)
+		if accept:
+			t.set_env("HTTP_ACCEPT_ENCODING", accept)
+		if range:
+			t.set_env("HTTP_RANGE", range)
+		return t.run_get()
+
+	def test_precompressed(self):
+		gz = join(self.folder, "test.txt.gz")
+		g = GzipFile(gz, "wb")
+		g.write("hello world")
+		g.close()
+		data = open(gz, "rb").read()
+
+		r = self.get_gzip("/test.txt", precompressed=True)
+		self.assertEquals(r.body, data)
+		self.assertEquals(r.headers["content-encoding"], "gzip")
+		self.assertEquals(r.headers["content-type"], "text/plain")
+		self.assertEquals(r.headers["vary"], "accept-encoding")
+
+		r = self.get_gzip("/test.txt", "gzip;q=0, deflate",
+				precompressed=True)
+		self.assertEquals(r.body, "hello world")
+		self.assert_("content-encoding" not in r.headers)
+		self.assertEquals(r.headers["vary"], "accept-encoding")
+
+		# ranges are ranges of the compressed data
+		r = self.get_gzip("/test.txt", range="bytes=0-3",
+				precompressed=True)
+		self.assertEquals(r.status, "206 Partial Content")
+		self.assertEquals(r.body, data[:4])
+		self.assertEquals(r.headers["content-range"],
+				"bytes 0-3/%d" % len(data))
+		r = self.get_gzip("/test.txt", range="bytes=0-1,3-4",
+				precompressed=True)
+		self.assertEquals(r.status, "200 OK")
+		self.assertEquals(r.body, data)
+
+		# outdated siblings are not used
+		st = stat(join(self.folder, "test.txt"))
+		utime(gz, (st.st_atime, st.st_mtime - 10))
+		r = self.get_gzip("/test.txt", precompressed=True)
+		self.assertEquals(r.body, "hello world")
+
+	def test_compress_cache(self):
+		big = "hello world " * 100
+		open(join(self.folder, "big.txt"), "w").write(big)
+		s = StaticFiles(self.folder, compress_cache=10000)
+		t = AppTester(s, url="http://example.com/big.txt")
+		t.set_env("HTTP_ACCEPT_ENCODING", "x-gzip")
+		r = t.run_get()
+		self.assertEquals(r.headers["content-encoding"], "gzip")
+		self.assertEquals(int(r.headers["content-length"]), len(r.body))
+		self.assert_(len(r.body) < len(big))
+		self.assertEquals(GzipFile(fileobj=StringIO(r.body)).read(), big)
+		self.assertEquals(s.compress_cache.cost, len(r.body))
+		self.assertEquals(t.run_get().body, r.body)
+		self.assertEquals(s.compress_cache.hits, 1)
+
+		# not worth compressing
+		r = self.get_gzip("/test.txt", compress_cache=10000)
+		self.assertEquals(r.body, "hello world")
+		self.assertEquals(r.headers["vary"], "accept-encoding")
+
+		# no compression without gzip in accept-encoding
+		r = self.get_gzip("/big.txt", None, compress_cache=10000)
+		self.assertEquals(r.body, big)
+
 	def tearDown(self):
 		rmtree(self.folder)
 
@@ -18,13 +18,15 @@
 
 from enkel.wansgli.testhelpers import unit_mod_suite, run_suite
 from enkel.model import data as dt_data, util as dt_util, \
-		formgen as dt_formgen
-import field, dsources, formgen
+		formgen as dt_formgen, validator as dt_validator, \
+		batch as dt_batch, record as dt_record, dsources as dt_dsources
+import field, dsources, formgen, validator, batch, record
 
 
 def suite():
 	return unit_mod_suite(dt_data, dt_util, field, dsources, formgen,
-			dt_formgen)
+			dt_formgen, validator, dt_validator, batch, dt_batch, record,
+			dt_record, dt_dsources)
 
 if __name__ == "__main__":
 	run_suite(suite())
@@ -0,0 +1,129 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import TestCase
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.model.batch import validate_records, validate_columns, numpy
+from enkel.model.data import Manip
+from enkel.model.field.base import Bool, Int, Long, Float, String, \
+		Text, Date
+from enkel.model.field.reg import IdString
+
+
+class Default(Int):
+	def get_default(self):
+		return 42
+
+
+MODEL = dict(
+	id = Int(),
+	name = String(5, 2),
+	nick = String(5, 2, required=False),
+	about = Text(required=False),
+	size = Long(required=False),
+	weight = Float(),
+	admin = Bool(),
+	born = Date(required=False),
+	slug = IdString(),
+	count = Default()
+)
+
+RECORDS = [
+	dict(id=1, name=u"John", weight=80.0, admin=False, slug=u"john"),
+	dict(id="x", name=u"J", nick=u"", weight=80, admin=None,
+			slug=u"John", count=None),
+	dict(name=u"Johnny", nick=u"J", about="x", size=10L, born="2007",
+			weight=1.0, admin=True, slug=u"a-b"),
+	{}
+]
+
+
+class TestBatch(TestCase):
+	def manip_errors(self, records):
+		errors = []
+		for row, record in enumerate(records):
+			for e in Manip(MODEL, **record).info_validate():
+				errors.append((row, e.fieldname, e.long_message))
+		return errors
+
+	def test_records(self):
+		self.assertEquals(validate_records(MODEL, RECORDS),
+				self.manip_errors(RECORDS))
+		self.assertEquals(validate_records(MODEL, iter(RECORDS)),
+				self.manip_errors(RECORDS))
+		self.assertEquals(validate_records(MODEL, []), [])
+
+	def test_columns(self):
+		columns = {}
+		for key in ("id", "name", "weight", "admin", "slug"):
+			columns[key] = [r.get(key) for r in RECORDS]
+		self.assertEquals(validate_columns(MODEL, columns),
+				validate_records(MODEL, [dict((k, v[row])
+				for k, v in columns.iteritems()) for row in xrange(4)]))
+
+	def test_size(self):
+		self.assertRaises(ValueError, validate_columns, MODEL,
+				dict(id=[1, 2], name=[u"ab"]))
+		self.assertRaises(ValueError, validate_columns, MODEL, {})
+		errors = validate_columns(dict(count=Default()), {}, 3)
+		self.assertEquals(errors, [])
+
+	def test_numpy(self):
+		if numpy is None:
+			return
+		model = dict(id=Int(), size=Long(), weight=Float(),
+				admin=Bool(), name=String(5, 2),
+				nick=String(5, 2, required=False), about=Text(),
+				born=Date())
+		rows = 5
+		columns = dict(
+			id = numpy.arange(rows),
+			size = numpy.arange(rows, dtype=numpy.uint32),
+			weight = numpy.arange(rows, dtype=float),
+			admin = numpy.zeros(rows, dtype=bool),
+			name = numpy.array([u"ab", u"a", u"abcdef", u"", u"abc"]),
+			nick = numpy.array([u"ab", u"a", u"abcdef", u"", u"abc"]),
+			about = numpy.array([u"x"] * rows),
+			born = numpy.array(["2007-01-01"] * rows, dtype="datetime64[D]")
+		)
+		self.assertEquals(sorted(validate_columns(model, columns)), [
+				(1, "name", "to few characters"),
+				(1, "nick", "to few characters"),
+				(2, "name", "to many characters"),
+				(2, "nick", "to many characters"),
+				(3, "name", "to few characters")])
+
+		# arrays which do not match the field are checked as lists
+		columns = dict(id=numpy.array([1.0, 2.0]),
+				name=numpy.array(["ab", "cd"]),
+				born=numpy.array(["2007-01-01", "x"]))
+		model = dict(id=Int(), name=String(), born=Date())
+		self.assertEquals(sorted(validate_columns(model, columns)), [
+				(0, "born", "must be a datetime.date object"),
+				(0, "id", "must be a whole number"),
+				(0, "name", "must be a unicode string"),
+				(1, "born", "must be a datetime.date object"),
+				(1, "id", "must be a whole number"),
+				(1, "name", "must be a unicode string")])
+
+
+def suite():
+	return unit_case_suite(TestBatch)
+
+if __name__ == '__main__':
+	run_suite(suite())
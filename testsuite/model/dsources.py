@@ -19,8 +19,10 @@
 from unittest import TestCase
 
 from enkel.wansgli.testhelpers import unit_case_suite, run_suite
-from enkel.model.dsources import List, Dict
-from enkel.model.field.base import Int, String, FieldValidationError
+from enkel.model.dsources import List, Dict, IndexedList, IndexedDict
+from enkel.model.field.base import Int, String, Text, \
+		FieldValidationError
+from enkel.model.ds import Many
 
 
 class TestDsources(TestCase):
@@ -54,9 +56,73 @@ class TestDsources(TestCase):
 		self.assertEquals(l, set(["John Peters", "Peter Johnson"]))
 
 
+class TestIndexed(TestCase):
+	def error(self, f, *args):
+		try:
+			f(*args)
+		except FieldValidationError, e:
+			return e.value, str(e)
+		return None
+
+	def test_same_as_list(self):
+		data = ["john", u"amy", 10, [1, 2]]
+		values = [u"john", "amy", u"jane", 10, "x", None, [1, 2], [3]]
+		for field in Text(), Int(), String(3):
+			l = List(data, field)
+			i = IndexedList(data, field)
+			for value in values:
+				self.assertEquals(self.error(i.ds_validate, "f", value),
+						self.error(l.ds_validate, "f", value))
+			for a in values:
+				for b in values:
+					self.assertEquals(
+							self.error(i.ds_validate_many, "f", [a, b]),
+							self.error(l.ds_validate_many, "f", [a, b]))
+
+	def test_invalidate(self):
+		data = [u"john"]
+		i = IndexedList(data)
+		self.assertRaises(FieldValidationError, i.ds_validate, "f", u"amy")
+		i.append(u"amy")
+		i.ds_validate("f", u"amy")
+		self.assertEquals(list(i.ds_iter_unicode())[-1], (u"amy", u"amy"))
+		i.remove(u"john")
+		self.assertRaises(FieldValidationError, i.ds_validate, "f", u"john")
+		i.data = [1, 2]
+		i.field = Int()
+		i.ds_validate_many("f", iter([1, 2]))
+		self.assertEquals(list(i.ds_iter_unicode()), [(u"1", 1), (u"2", 2)])
+		i.data.append(3)
+		i.invalidate()
+		i.ds_validate("f", 3)
+
+	def test_dict(self):
+		d = IndexedDict({u"john": "John Peters"}, String(6))
+		d.ds_validate("f", u"john")
+		self.assertRaises(FieldValidationError, d.ds_validate, "f", [u"x"])
+		d.set(u"amy", "Amy Wong")
+		d.ds_validate_many("f", [u"amy", u"john"])
+		self.assertEquals(sorted(d.ds_iter_unicode()),
+				[(u"amy", "Amy Wong"), (u"john", "John Peters")])
+		d.remove(u"john")
+		self.assertRaises(FieldValidationError, d.ds_validate_many, "f",
+				[u"amy", u"john"])
+		self.assert_(isinstance(d, Dict))
+		self.assertFalse(isinstance(d, IndexedList))
+		self.assertFalse(hasattr(d, "append"))
+
+	def test_many(self):
+		f = Many(IndexedList(range(1000), Int()))
+		f.validate("f", range(500, 1000))
+		self.assertRaises(FieldValidationError, f.validate, "f", [1, 1001])
+		f = Many(List(range(10), Int()))
+		f.validate("f", [1, 2])
+		self.assertRaises(FieldValidationError, f.validate, "f", [1, 11])
+
+
 
 def suite():
-	return unit_case_suite(TestDsources)
+	return unit_case_suite(TestDsources, TestIndexed)
 
 if __name__ == '__main__':
 	run_suite(suite())
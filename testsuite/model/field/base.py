@@ -17,6 +17,7 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 from unittest import TestCase
+from time import strptime
 import datetime
 
 from enkel.wansgli.testhelpers import unit_case_suite, run_suite
@@ -133,6 +134,50 @@ class TestBase(TestCase):
 		self.assertRaises(FieldValidationError, n.validate, "n", "wrong")
 		DateTime(required=False).validate("n", None)
 
+	def testParseSameAsStrptime(self):
+		values = [u"2006-12-24", u"2006-1-2", u"2006-02-30", u"0000-01-01",
+				u"2006-12-24\n", u" 2006-12-24", u"2006/12/24",
+				u"\uff12006-12-24", u"06:33:57", u"6:33:57", u"24:00:00",
+				u"06:33:61", u"06:33", u"2006-12-24 06:33:58",
+				u"2006-12-24 6:33:58", u"2006-12-24 24:33:58",
+				u"2006-12-24T06:33:58", u""]
+		for cls in Date, Time, DateTime:
+			for value in values:
+				try:
+					d = strptime(value, cls.FORMAT)
+					if cls is Time:
+						expected = datetime.time(*d[3:6])
+					else:
+						expected = cls is Date and datetime.date(*d[:3]) \
+								or datetime.datetime(*d[:6])
+				except ValueError:
+					expected = None
+				self.assertEquals(cls().from_unicode(value), expected)
+
+	def testFormat(self):
+		class MyDate(Date):
+			FORMAT = "%d.%m.%Y"
+		self.assertEquals(MyDate().from_unicode(u"24.12.2006"),
+				datetime.date(2006, 12, 24))
+		self.assertEquals(MyDate().from_unicode(u"2006-12-24"), None)
+		class MyTime(Time):
+			FORMAT = "%H.%M"
+		t = MyTime()
+		self.assertEquals(t.from_unicode(u"06.33"), datetime.time(6, 33))
+		self.assertEquals(t.to_unicode(datetime.time(6, 33)), u"06.33")
+		d = DateTime()
+		self.assertEquals(d.to_unicode(datetime.datetime(1800, 1, 2, 3)),
+				u"1800-01-02 03:00:00")
+		self.assertEquals(d.to_unicode(datetime.datetime(2006, 1, 2, 3, 4,
+				5, 6)), u"2006-01-02 03:04:05")
+		self.assertEquals(d.to_unicode(datetime.date(2006, 1, 2)),
+				u"2006-01-02 00:00:00")
+		self.assertEquals(Time().to_unicode(datetime.time(3, 4, 5, 6)),
+				u"03:04:05")
+		d.FORMAT = "%Y"
+		self.assertEquals(d.to_unicode(datetime.datetime(2006, 1, 2)),
+				u"2006")
+
 
 
 def suite():
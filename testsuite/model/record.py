@@ -0,0 +1,109 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import TestCase
+from cPickle import dumps, loads
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.model.record import record_class
+from enkel.model.data import Manip
+from enkel.model.field.interface import FieldValidationError
+from enkel.model.field.base import Int, String, Date
+from enkel.model import ds, dsources
+
+
+class Default(Int):
+	def get_default(self):
+		return 42
+
+
+people = dsources.List([u"john", u"amy"])
+MODEL = dict(
+	id = Int(),
+	name = String(10),
+	born = Date(required=False),
+	count = Default(),
+	friends = ds.Many(people, required=False)
+)
+Person = record_class(MODEL, "Person")
+
+
+class TestRecord(TestCase):
+	def test_defaults(self):
+		p = Person()
+		self.assertEquals(p.id, None)
+		self.assertEquals(p.count, 42)
+		self.assertEquals(p.get_dict(), Manip(MODEL).get_dict())
+		self.assertEquals(Person(id=1).id, 1)
+		self.assertRaises(AttributeError, Person, x=1)
+
+	def test_validate(self):
+		p = Person(id=1, name=u"John")
+		p.validate()
+		p.friends = [u"jane"]
+		self.assertRaises(FieldValidationError, p.validate)
+		p.name = "John"
+		self.assertEquals(sorted(e.fieldname for e in p.info_validate()),
+				["friends", "name"])
+
+	def test_same_as_manip(self):
+		values = dict(id="x", name=u"", born=10, friends=[u"amy"])
+		p = Person(**values)
+		m = Manip(MODEL, **values)
+		self.assertEquals(map(str, p.info_validate()),
+				map(str, m.info_validate()))
+
+	def test_unicode(self):
+		p = Person(friends=[])
+		p.unicode_merge(dict(x_id=u"10", x_name=u"John",
+				x_born=u"2007-01-02"), "x_")
+		self.assertEquals(p.id, 10)
+		self.assertEquals(p.get_unicode("born"), u"2007-01-02")
+		self.assertEquals(dict(p.iterunicode())["name"], u"John")
+		p.merge(dict(count=10))
+		self.assertEquals(p["count"], 10)
+
+	def test_manip(self):
+		m = Manip(MODEL, id=10, name=u"John")
+		p = Person.from_manip(m)
+		self.assertEquals(p.id, 10)
+		self.assertEquals(p.count, 42)
+		self.assertEquals(p.to_manip().get_dict(), m.get_dict())
+		m.email = u"john@example.com" # not in the model
+		self.assertEquals(Person.from_manip(m), p)
+
+	def test_pickle(self):
+		p = Person(id=1, name=u"John")
+		for protocol in 0, 2:
+			self.assertEquals(loads(dumps(p, protocol)), p)
+
+	def test_slots(self):
+		p = Person()
+		self.assertRaises(AttributeError, getattr, p, "__dict__")
+		self.assertRaises(AttributeError, setattr, p, "x", 1)
+
+	def test_invalid_names(self):
+		for name in ("first-name", "class", "validate", "model", "1x"):
+			self.assertRaises(ValueError, record_class, {name: Int()})
+
+
+def suite():
+	return unit_case_suite(TestRecord)
+
+if __name__ == '__main__':
+	run_suite(suite())
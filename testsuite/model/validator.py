@@ -0,0 +1,125 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import TestCase
+from datetime import date, time, datetime
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.model.validator import compile_validator, get_validator
+from enkel.model.field.interface import FieldValidationError
+from enkel.model.field.base import Bool, Int, Long, Float, String, \
+		Text, Date, Time, DateTime
+from enkel.model.field.reg import IdString
+from enkel.model.ds import One, Many
+from enkel.model.dsources import List
+from enkel.model.data import Manip
+
+
+VALUES = [None, True, False, 0, 10, 10L, 1.5, "", "abc", u"", u"a",
+		u"abcdefghijkl", date(2007, 1, 2), time(10, 20),
+		datetime(2007, 1, 2, 10, 20), [], [u"a"], object()]
+
+
+class Default(Int):
+	def get_default(self):
+		return 42
+
+
+class TestValidator(TestCase):
+	def fields(self):
+		people = List([u"a", u"b"])
+		for required in True, False:
+			yield Int(required)
+			yield Long(required)
+			yield Float(required)
+			yield String(10, 2, required)
+			yield Text(required)
+			yield Date(required)
+			yield Time(required)
+			yield DateTime(required)
+			yield IdString(required=required)
+			yield One(people, required)
+			yield Many(people, required)
+		yield Bool()
+
+	def error(self, field, value):
+		try:
+			field.validate("x", value)
+		except FieldValidationError, e:
+			return str(e)
+		return None
+
+	def test_same_as_fields(self):
+		for field in self.fields():
+			validate = compile_validator(dict(x=field))
+			for value in VALUES:
+				errors = []
+				validate(dict(x=value), errors)
+				expected = self.error(field, value)
+				if expected is None:
+					self.assertEquals(errors, [])
+				else:
+					self.assertEquals([str(e) for e in errors], [expected])
+
+	def test_raise(self):
+		validate = compile_validator(dict(a=Int(), b=String()))
+		validate(dict(a=1, b=u"x"), None)
+		self.assertRaises(FieldValidationError, validate,
+				dict(a=1, b="x"), None)
+		self.assertRaises(FieldValidationError, validate, {}, None)
+
+	def test_default(self):
+		model = dict(a=Default())
+		validate = compile_validator(model)
+		validate({}, None)
+		self.assert_("MISSING" in validate.source)
+		self.assert_("MISSING" not in compile_validator(
+				dict(a=Int())).source)
+
+	def test_field_changed(self):
+		field = String(5)
+		validate = compile_validator(dict(a=field))
+		self.assertRaises(FieldValidationError, validate,
+				dict(a=u"abcdef"), None)
+		field.maxlength = 10
+		validate(dict(a=u"abcdef"), None)
+		field.required = False
+		validate({}, None)
+
+	def test_get_validator(self):
+		model = dict(a=Int())
+		validate = get_validator(model)
+		self.assert_(get_validator(model) is validate)
+		model["a"] = String()
+		self.assert_(get_validator(model) is not validate)
+		get_validator(model)(dict(a=u"x"), None)
+
+	def test_manip(self):
+		model = dict(a=Int(), b=String())
+		m = Manip(model, a=1, b=u"x")
+		m.validate()
+		model["c"] = Int()
+		self.assertRaises(FieldValidationError, m.validate)
+		self.assertEquals([e.fieldname for e in m.info_validate()], ["c"])
+
+
+def suite():
+	return unit_case_suite(TestValidator)
+
+if __name__ == '__main__':
+	run_suite(suite())
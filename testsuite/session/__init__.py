@@ -17,12 +17,22 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 from enkel.wansgli.testhelpers import unit_mod_suite, run_suite
+from enkel.session import memory as dt_memory, shm as dt_shm, \
+		sqlite as dt_sqlite, files as dt_files, \
+		signedcookie as dt_signedcookie, serializer as dt_serializer
 import backend
 import memory
+import shm
+import sqlite
+import files
+import signedcookie
+import serializer
 
 
 def suite():
-	return unit_mod_suite(backend, memory)
+	return unit_mod_suite(backend, memory, dt_memory, shm, dt_shm,
+			sqlite, dt_sqlite, files, dt_files, signedcookie,
+			dt_signedcookie, serializer, dt_serializer)
 
 if __name__ == "__main__":
 	run_suite(suite())
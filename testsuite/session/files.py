@@ -0,0 +1,90 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import TestCase
+from tempfile import mkdtemp
+from shutil import rmtree
+from os import listdir, utime
+from os.path import dirname, exists
+from time import sleep, time
+from datetime import timedelta
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.session.files import FileSession
+from enkel.session.backend import NoSuchSessionError
+
+
+class TestFileSession(TestCase):
+	def setUp(self):
+		self.folder = mkdtemp()
+
+	def test_load_save(self):
+		s = FileSession(self.folder)
+		sid = s.generate_sid()
+		s.save(sid, dict(name="John", age=20))
+		self.assertEquals(s.load(sid)["name"], "John")
+		s.save(sid, dict(name="Peter"))
+		self.assertEquals(s.load(sid), dict(name="Peter"))
+		self.assertEquals(listdir(dirname(s.get_path(sid))), [sid])
+		self.assertRaises(NoSuchSessionError, s.load, "nothere")
+		s.delete(sid)
+		self.assertRaises(NoSuchSessionError, s.load, sid)
+		s.delete(sid)
+		s.delete("../x")
+
+	def test_invalid_sid(self):
+		s = FileSession(self.folder)
+		self.assertRaises(NoSuchSessionError, s.load, "../../etc/passwd")
+		self.assertRaises(NoSuchSessionError, s.save, "a/b", {})
+
+	def test_levels(self):
+		s = FileSession(self.folder, levels=1)
+		s.save("xxAb", {})
+		self.assertEquals(s.get_path("xxAb")[len(self.folder):],
+				"/61/xxAb")
+		self.assertEquals(s.get_folder(0x61), self.folder + "/61")
+
+	def test_expire(self):
+		s = FileSession(self.folder, timeout=timedelta(milliseconds=1))
+		s.save("xxyA", {})
+		sleep(0.01)
+		self.assertRaises(NoSuchSessionError, s.load, "xxyA")
+
+	def test_sweep(self):
+		s = FileSession(self.folder, levels=1)
+		for sid in "a", "b", "c":
+			s.save(sid, {})
+		old = time() - 7200
+		utime(s.get_path("a"), (old, old))
+		utime(s.get_path("b"), (old, old))
+		s._sweep_pos = 0
+		self.assertEquals(s.sweep() + s.sweep() + s.sweep() + s.sweep(), 2)
+		self.assertFalse(exists(s.get_path("a")))
+		self.assertEquals(s.load("c"), {})
+		utime(s.get_path("c"), (old, old))
+		self.assertEquals(s.sweep_all(), 1)
+
+	def tearDown(self):
+		rmtree(self.folder)
+
+
+def suite():
+	return unit_case_suite(TestFileSession)
+
+if __name__ == '__main__':
+	run_suite(suite())
@@ -20,6 +20,7 @@ from unittest import TestCase
 from time import sleep
 from cStringIO import StringIO
 from datetime import timedelta
+from threading import Thread
 
 from enkel.wansgli.testhelpers import unit_case_suite, run_suite
 from enkel.session.memory import MemorySession, NoSuchSessionError
@@ -32,6 +33,9 @@ class TestMemorySession(TestCase):
 		ms.save(sid, dict(name="John", age=20))
 		session = ms.load(sid)
 		self.assertEquals(session["name"], "John")
+		ms.delete(sid)
+		self.assertRaises(NoSuchSessionError, ms.load, sid)
+		ms.delete(sid)
 
 	def test_remove_old(self):
 		m = MemorySession(timeout=timedelta(milliseconds=1),
@@ -41,6 +45,61 @@ class TestMemorySession(TestCase):
 		sleep(0.1)
 		self.assertRaises(NoSuchSessionError, m.load, sid)
 
+	def test_sweep(self):
+		m = MemorySession(timeout=timedelta(milliseconds=50),
+				delete_interval=timedelta(0), stripes=1)
+		for x in xrange(250):
+			m.save(str(x), {})
+		sleep(0.1)
+		m.save("new", {}) # sweeps SWEEP_LIMIT sessions at a time
+		self.assertEquals(len(m), 151)
+		m.load("new")
+		m.load("new")
+		self.assertEquals(len(m), 1)
+
+	def test_save_again(self):
+		m = MemorySession(timeout=timedelta(milliseconds=50),
+				delete_interval=timedelta(0), stripes=1)
+		m.save("a", {"x": 1})
+		sleep(0.03)
+		m.save("a", {"x": 2})
+		sleep(0.03)
+		self.assertEquals(m.load("a"), {"x": 2})
+		for x in xrange(200):
+			m.save("a", {"x": 3})
+		self.assert_(len(m.stripes[0].heap) < 100)
+
+	def test_max_sessions(self):
+		m = MemorySession(max_sessions=2, stripes=1)
+		m.save("a", {})
+		m.save("b", {})
+		m.load("a")
+		m.save("c", {})
+		m.load("a")
+		m.load("c")
+		self.assertRaises(NoSuchSessionError, m.load, "b")
+
+	def test_threads(self):
+		m = MemorySession(stripes=4)
+		results = []
+		def work(n):
+			try:
+				ok = True
+				for x in xrange(500):
+					sid = "%d-%d" % (n, x % 50)
+					m.save(sid, {"n": n})
+					ok = ok and m.load(sid)["n"] == n
+				results.append(ok)
+			except Exception, e:
+				results.append(e)
+		threads = [Thread(target=work, args=(n,)) for n in xrange(8)]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+		self.assertEquals(results, [True] * 8)
+		self.assertEquals(len(m), 400)
+
 
 
 def suite():
@@ -0,0 +1,119 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import TestCase
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.session.serializer import SerializerError, get_serializer, \
+		SERIALIZERS, CompactSerializer, PickleSerializer, json
+from enkel.session.files import FileSession
+from enkel.session.sqlite import SqliteSession
+from enkel.session.signedcookie import SignedCookieCodec
+from enkel.session.backend import NoSuchSessionError
+
+
+SESSION = {
+	"uid": 10,
+	"name": "John",
+	"admin": False,
+	"score": -1.5,
+	"cart": [1, 2, 3],
+	"prefs": {"lang": "en", "page": None}
+}
+
+
+class TestSerializer(TestCase):
+	def test_roundtrip(self):
+		for name in SERIALIZERS:
+			if name == "json" and json is None:
+				continue
+			s = get_serializer(name)
+			self.assertEquals(s.loads(s.dumps(SESSION)), SESSION)
+
+	def test_invalid(self):
+		for name in SERIALIZERS:
+			if name == "json" and json is None:
+				continue
+			s = get_serializer(name)
+			self.assertRaises(SerializerError, s.loads, "\x00garbage")
+
+	def test_unsupported(self):
+		self.assertRaises(SerializerError, get_serializer("marshal").dumps,
+				{"x": object()})
+		self.assertRaises(SerializerError, CompactSerializer().dumps,
+				{"x": object()})
+
+	def test_compact(self):
+		s = CompactSerializer()
+		values = [0, 127, 128, -1, 2 ** 31, -2 ** 63, 10 ** 30, "",
+				"x" * 300, u"\xe6\xf8\xe5", 0.1, True, False, None,
+				(), (1, "a"), [], {}, {1: [{"a": (None,)}]}]
+		for value in values:
+			self.assertEquals(s.loads(s.dumps(value)), value)
+			self.assertEquals(type(s.loads(s.dumps(value))), type(value))
+		data = s.dumps(SESSION)
+		self.assertRaises(SerializerError, s.loads, data[:-1])
+		self.assertRaises(SerializerError, s.loads, data + "N")
+		self.assertRaises(SerializerError, s.loads, "")
+
+	def test_get_serializer(self):
+		s = PickleSerializer()
+		self.assert_(get_serializer(s) is s)
+		self.assert_(isinstance(get_serializer("compact"),
+				CompactSerializer))
+		self.assertRaises(ValueError, get_serializer, "nothing")
+
+
+class TestBackendSerializer(TestCase):
+	def setUp(self):
+		self.folder = mkdtemp()
+
+	def test_files(self):
+		s = FileSession(self.folder, serializer="compact")
+		s.save("abc", SESSION)
+		self.assertEquals(s.load("abc"), SESSION)
+		f = open(s.get_path("abc"), "r+b")
+		f.seek(-1, 2)
+		f.truncate()
+		f.close()
+		self.assertRaises(NoSuchSessionError, s.load, "abc")
+
+	def test_sqlite(self):
+		s = SqliteSession(":memory:", serializer=CompactSerializer())
+		s.save("abc", SESSION)
+		self.assertEquals(s.load("abc"), SESSION)
+
+	def test_signedcookie(self):
+		b = SignedCookieCodec(["secret"], serializer="compact")
+		self.assertEquals(b.load(b.encode(SESSION)), SESSION)
+		b = SignedCookieCodec(["secret"], serializer="marshal")
+		self.assertRaises(NoSuchSessionError,
+				SignedCookieCodec(["secret"], serializer="compact").load,
+				b.encode(SESSION))
+
+	def tearDown(self):
+		rmtree(self.folder)
+
+
+def suite():
+	return unit_case_suite(TestSerializer, TestBackendSerializer)
+
+if __name__ == '__main__':
+	run_suite(suite())
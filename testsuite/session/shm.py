@@ -0,0 +1,140 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import os
+from unittest import TestCase
+from tempfile import mkdtemp
+from shutil import rmtree
+from os.path import join
+from time import sleep
+from datetime import timedelta
+from fcntl import lockf, LOCK_EX, LOCK_NB
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.session.shm import SharedMemorySession, FILE_HEADER, MAGIC
+from enkel.session.backend import NoSuchSessionError
+
+
+class TestSharedMemorySession(TestCase):
+	def setUp(self):
+		self.folder = mkdtemp()
+		self.path = join(self.folder, "sessions")
+
+	def test_load_save(self):
+		s = SharedMemorySession(self.path, slots=16, slot_size=256)
+		sid = s.generate_sid()
+		s.save(sid, dict(name="John", age=20))
+		self.assertEquals(s.load(sid)["name"], "John")
+		s.save(sid, dict(name="Peter"))
+		self.assertEquals(s.load(sid), dict(name="Peter"))
+		self.assertRaises(NoSuchSessionError, s.load, "nothere")
+		s.delete(sid)
+		self.assertRaises(NoSuchSessionError, s.load, sid)
+		s.delete(sid)
+		s.delete("a" * 65)
+		s.close()
+
+	def test_expire(self):
+		s = SharedMemorySession(self.path,
+				timeout=timedelta(milliseconds=1))
+		s.save("xxyA", {})
+		sleep(0.01)
+		self.assertRaises(NoSuchSessionError, s.load, "xxyA")
+		s.close()
+
+	def test_full_bucket(self):
+		s = SharedMemorySession(self.path, slots=8, slot_size=256)
+		for x in xrange(9):
+			s.save(str(x), {"x": x})
+		self.assertRaises(NoSuchSessionError, s.load, "0")
+		self.assertEquals(s.load("8"), {"x": 8})
+		s.close()
+
+	def test_too_large(self):
+		s = SharedMemorySession(self.path, slots=8, slot_size=256)
+		self.assertRaises(ValueError, s.save, "a", {"x": "x" * 256})
+		self.assertRaises(ValueError, s.save, "a" * 65, {})
+		self.assertRaises(NoSuchSessionError, s.load, "a" * 65)
+		s.touch("a" * 65)
+		s.close()
+
+	def test_fork(self):
+		s = SharedMemorySession(self.path, slots=64, slot_size=256)
+		pid = os.fork()
+		if pid == 0:
+			try:
+				s.save("child", {"pid": os.getpid()})
+			finally:
+				os._exit(0)
+		os.waitpid(pid, 0)
+		self.assertEquals(s.load("child"), {"pid": pid})
+		s.close()
+
+	def test_invalid_file(self):
+		for data in "ENKEL", "x" * 16:
+			f = open(self.path, "wb")
+			f.write(data)
+			f.close()
+			self.assertRaises(ValueError, SharedMemorySession, self.path)
+		f = open(self.path, "wb") # header without the slots
+		f.write(FILE_HEADER.pack(MAGIC, 8, 256))
+		f.close()
+		self.assertRaises(ValueError, SharedMemorySession, self.path)
+
+	def test_same_file(self):
+		a = SharedMemorySession(self.path, slots=8, slot_size=256)
+		b = SharedMemorySession(self.path)
+		self.assertEquals(a.fd, b.fd)
+		self.assertEquals(b.slot_size, 256)
+		b.save("x", {"x": 1})
+		b.close()
+		self.assertEquals(a.load("x"), {"x": 1})
+		fd = a.fd
+		a.close()
+		self.assertRaises(OSError, os.fstat, fd)
+
+	def test_close_keeps_locks(self):
+		a = SharedMemorySession(self.path, slots=8, slot_size=256)
+		a._lock(0, LOCK_EX)
+		SharedMemorySession(self.path).close()
+		pid = os.fork()
+		if pid == 0:
+			code = 0
+			try:
+				fd = os.open(self.path, os.O_RDWR)
+				try:
+					lockf(fd, LOCK_EX | LOCK_NB, a.bucket_size,
+							a.HEADER_SIZE)
+				except IOError:
+					code = 1 # still locked by the parent
+			finally:
+				os._exit(code)
+		status = os.waitpid(pid, 0)[1]
+		a._unlock(0)
+		a.close()
+		self.assertEquals(os.WEXITSTATUS(status), 1)
+
+	def tearDown(self):
+		rmtree(self.folder)
+
+
+def suite():
+	return unit_case_suite(TestSharedMemorySession)
+
+if __name__ == '__main__':
+	run_suite(suite())
@@ -0,0 +1,113 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import TestCase
+from datetime import timedelta
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.session.signedcookie import SignedCookieCodec
+from enkel.session.memory import MemorySession
+from enkel.session.backend import SessionBackend, NoSuchSessionError
+
+
+def raw(value):
+	return urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+class TestSignedCookieCodec(TestCase):
+	session = {"name": "John Peters", "items": range(100)}
+
+	def test_encode_decode(self):
+		b = SignedCookieCodec(["secret"])
+		session, server_sid, created = b.decode(b.encode(self.session))
+		self.assertEquals(session, self.session)
+		self.assertEquals(server_sid, None)
+		self.assertFalse(isinstance(b, SessionBackend))
+
+	def test_tampered(self):
+		b = SignedCookieCodec(["secret"])
+		value = raw(b.encode({"admin": False}))
+		for i in xrange(len(value)):
+			data = value[:i] + chr(ord(value[i]) ^ 1) + value[i + 1:]
+			self.assertRaises(NoSuchSessionError, b.decode,
+					urlsafe_b64encode(data).rstrip("="))
+		self.assertRaises(NoSuchSessionError, b.decode, "!!")
+		self.assertRaises(NoSuchSessionError, b.decode, "")
+
+	def test_compress(self):
+		b = SignedCookieCodec(["secret"])
+		small = b.encode(self.session)
+		b = SignedCookieCodec(["secret"], compress=False)
+		self.assert_(len(small) < len(b.encode(self.session)))
+
+	def test_encrypt(self):
+		b = SignedCookieCodec(["secret"], encrypt=True, compress=False)
+		value = b.encode({"name": "John Peters"})
+		self.assert_("John" not in raw(value))
+		self.assertNotEquals(value, b.encode({"name": "John Peters"}))
+		self.assertEquals(b.load(value), {"name": "John Peters"})
+		self.assertRaises(NoSuchSessionError,
+				SignedCookieCodec(["secret"]).load, value)
+
+	def test_key_rotation(self):
+		old = SignedCookieCodec(["old"])
+		new = SignedCookieCodec(["new", "old"])
+		value = old.encode(self.session)
+		self.assertEquals(new.load(value), self.session)
+		self.assertRaises(NoSuchSessionError, old.load,
+				new.encode(self.session))
+
+	def test_expire(self):
+		b = SignedCookieCodec(["secret"], timeout=timedelta(seconds=-1))
+		self.assertRaises(NoSuchSessionError, b.load, b.encode({}))
+
+	def test_fallback(self):
+		big = {"data": "x" * 500}
+		b = SignedCookieCodec(["secret"], compress=False, max_size=200)
+		self.assertRaises(ValueError, b.encode, big)
+		m = MemorySession()
+		b = SignedCookieCodec(["secret"], compress=False, max_size=200,
+				fallback=m)
+		value = b.encode(big)
+		self.assert_(len(value) <= 200)
+		session, server_sid, created = b.decode(value)
+		self.assertEquals(session, big)
+		self.assertEquals(m.load(server_sid), big)
+		big["data"] = "y" * 500
+		b.decode(b.encode(big, server_sid))
+		self.assertEquals(m.load(server_sid), big)
+		self.assertEquals(len(m), 1)
+
+		# the session shrinks back into the cookie
+		value = b.encode({"data": "small"}, server_sid)
+		self.assertEquals(b.decode(value)[:2], ({"data": "small"}, None))
+		self.assertRaises(NoSuchSessionError, m.load, server_sid)
+
+	def test_serializer_error(self):
+		value = SignedCookieCodec(["secret"], compress=False,
+				serializer="pickle").encode(self.session)
+		b = SignedCookieCodec(["secret"], serializer="compact")
+		self.assertRaises(NoSuchSessionError, b.load, value)
+
+
+def suite():
+	return unit_case_suite(TestSignedCookieCodec)
+
+if __name__ == '__main__':
+	run_suite(suite())
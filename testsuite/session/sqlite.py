@@ -0,0 +1,200 @@
+# This file is part of the Enkel web programming library.
+#
+# Copyright (C) 2007 Espen Angell Kristiansen (espen@wsgi.net)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import TestCase
+from tempfile import mkdtemp
+from shutil import rmtree
+from os.path import join
+from time import sleep
+from datetime import timedelta
+from threading import Thread
+from sqlite3 import OperationalError, ProgrammingError
+
+from enkel.wansgli.testhelpers import unit_case_suite, run_suite
+from enkel.session.sqlite import SqliteSession
+from enkel.session.backend import NoSuchSessionError
+
+
+class HookedConnection(object):
+	def __init__(self, db, backend):
+		self.db = db
+		self.backend = backend
+
+	def execute(self, *args):
+		if self.backend.fail and args[0] == "COMMIT":
+			raise OperationalError("commit failed")
+		return self.db.execute(*args)
+
+	def executemany(self, *args):
+		if self.backend.slow:
+			sleep(0.1)
+		return self.db.executemany(*args)
+
+	def close(self):
+		self.db.close()
+
+
+class HookedSqliteSession(SqliteSession):
+	slow = False
+	fail = False
+
+	def _connect(self):
+		return HookedConnection(SqliteSession._connect(self), self)
+
+
+class TestSqliteSession(TestCase):
+	def setUp(self):
+		self.folder = mkdtemp()
+		self.path = join(self.folder, "sessions.db")
+
+	def count(self, s):
+		return s.get_connection().execute(
+				"SELECT count(*) FROM sessions").fetchone()[0]
+
+	def test_load_save(self):
+		s = SqliteSession(self.path)
+		sid = s.generate_sid()
+		s.save(sid, dict(name="John", age=20))
+		self.assertEquals(s.load(sid)["name"], "John")
+		self.assertRaises(NoSuchSessionError, s.load, "nothere")
+		s.close()
+
+		# sessions survive restarts
+		s = SqliteSession(self.path)
+		self.assertEquals(s.load(sid)["age"], 20)
+		mode = s.get_connection().execute("PRAGMA journal_mode").fetchone()
+		self.assertEquals(mode[0], "wal")
+		s.close()
+
+	def test_expire(self):
+		s = SqliteSession(self.path, timeout=timedelta(milliseconds=1))
+		s.save("xxyA", {})
+		sleep(0.01)
+		self.assertRaises(NoSuchSessionError, s.load, "xxyA")
+		self.assertEquals(s.purge(), 1)
+		self.assertEquals(self.count(s), 0)
+		s.close()
+
+	def test_write_behind(self):
+		s = SqliteSession(self.path, write_behind=1000)
+		s.save("a", {"x": 1}) # the first save is written immediately
+		s.save("a", {"x": 2})
+		s.save("b", {"x": 3})
+		self.assertEquals(s.load("a"), {"x": 2})
+		self.assertEquals(self.count(s), 1)
+		s.flush()
+		self.assertEquals(self.count(s), 2)
+		self.assertEquals(s.load("a"), {"x": 2})
+		s.save("c", {})
+		s.delete("c")
+		s.delete("a")
+		self.assertRaises(NoSuchSessionError, s.load, "a")
+		self.assertRaises(NoSuchSessionError, s.load, "c")
+		s.flush()
+		self.assertEquals(self.count(s), 1)
+		s.close()
+
+	def test_flush_when_due(self):
+		s = SqliteSession(self.path, write_behind=0.05)
+		s.save("a", {})
+		s.save("b", {})
+		s.save("c", {})
+		self.assertEquals(self.count(s), 1)
+		sleep(0.06)
+		s.load("a")
+		self.assertEquals(self.count(s), 3)
+		s.save("d", {})
+		sleep(0.06)
+		s.purge()
+		self.assertEquals(self.count(s), 4)
+		s.close()
+
+	def test_concurrent_flush(self):
+		s = HookedSqliteSession(self.path, write_behind=1000)
+		s.save("a", {})
+		s.save("b", {"x": 1})
+		s.slow = True
+		first = Thread(target=s.flush)
+		first.start()
+		sleep(0.02) # the first flush is writing "b"
+		s.save("b", {"x": 2})
+		second = Thread(target=s.flush)
+		second.start()
+		third = Thread(target=s.flush) # nothing to write
+		third.start()
+		sleep(0.02)
+		self.assertEquals(s.load("b")["x"], 2)
+		for t in first, second, third:
+			t.join()
+		s.slow = False
+		self.assertEquals(s.load("b"), {"x": 2})
+		s.close()
+
+	def test_failed_flush(self):
+		s = HookedSqliteSession(self.path, write_behind=1000)
+		s.save("a", {})
+		s.save("b", {"x": 1})
+		s.save("c", {"x": 1})
+		s.fail = True
+		self.assertRaises(OperationalError, s.flush)
+		self.assertEquals(self.count(s), 1)
+		s.save("c", {"x": 2}) # newer than the failed batch
+		self.assertEquals(s.load("b"), {"x": 1})
+		s.fail = False
+		s.flush()
+		self.assertEquals(self.count(s), 3)
+		self.assertEquals(s.load("c"), {"x": 2})
+		s.close()
+
+	def test_memory_closed(self):
+		s = SqliteSession(":memory:")
+		s.save("a", {})
+		s.close()
+		self.assertRaises(ProgrammingError, s.load, "a")
+
+	def test_threads(self):
+		s = SqliteSession(self.path, write_behind=0.01)
+		errors = []
+		def work(n):
+			try:
+				for x in xrange(50):
+					sid = "%d-%d" % (n, x % 10)
+					s.save(sid, {"n": n})
+					self.assertEquals(s.load(sid)["n"], n)
+				s.close()
+			except Exception, e:
+				errors.append(e)
+		threads = [Thread(target=work, args=(n,)) for n in xrange(4)]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+		self.assertEquals(errors, [])
+		s.flush()
+		self.assertEquals(self.count(s), 40)
+		s.close()
+
+	def tearDown(self):
+		rmtree(self.folder)
+
+
+def suite():
+	return unit_case_suite(TestSqliteSession)
+
+if __name__ == '__main__':
+	run_suite(suite())
@@ -19,7 +19,8 @@
 from enkel.wansgli.testhelpers import unit_mod_suite, run_suite
 from enkel.wansgli import apptester as dt_apptester, env as dt_env,\
 		utils as dt_utils, response as dt_response, \
-		formparse as dt_formparse, apputils as dt_apputils
+		formparse as dt_formparse, apputils as dt_apputils, \
+		server_base as dt_server_base
 
 import apprunner, formparse, scgi, http
 
@@ -27,7 +28,7 @@ import apprunner, formparse, scgi, http
 def suite():
 	return unit_mod_suite(apprunner, formparse, scgi, http,
 			dt_apptester, dt_env, dt_utils, dt_formparse, dt_response,
-			dt_apputils)
+			dt_apputils, dt_server_base)
 
 if __name__ == "__main__":
 	run_suite(suite())
@@ -19,7 +19,7 @@
 from unittest import TestCase
 import os, sys
 from time import sleep
-from urllib import urlopen
+from urllib2 import urlopen, Request
 from threading import Thread
 
 from enkel.wansgli.testhelpers import unit_case_suite, run_suite
@@ -31,19 +31,32 @@ def myapp(env, start_response):
 	yield "hello"
 
 
+def headers_app(env, start_response):
+	start_response("200 OK", [("content-type", "text/plain")])
+	yield "%s|%s|%s" % (env.get("HTTP_USER_AGENT"), env["HTTP_X_TEST"],
+			env["SERVER_PORT"])
+
+
+class ReuseServer(Server):
+	allow_reuse_address = True # must be set before the socket is bound
+
+
 class TestServer(TestCase):
-	def get_result(self, app):
+	def get_result(self, app, lazy_environ=False, headers={}):
 		server_address = ("localhost", 8500)
-		s = Server(app, server_address)
-		s.allow_reuse_address = True
+		s = ReuseServer(app, server_address)
+		s.lazy_environ = lazy_environ
 		t = Thread(target=s.handle_request)
 		t.start()
 
 		sleep(0.8) # give the server some time to start
-		f = urlopen("http://%s:%d" % server_address)
+		req = Request("http://%s:%d" % server_address, headers=headers)
+		f = urlopen(req)
 		headers = f.info()
 		body = f.read()
 		f.close()
+		t.join()
+		s.server_close()
 		return headers, body
 
 	def test_sanity(self):
@@ -53,6 +66,16 @@ class TestServer(TestCase):
 		self.assertEquals(headers["server"], Server.server_info)
 		self.assert_("date" in headers)
 
+	def test_http_headers(self):
+		h = {"User-Agent": "test-agent", "X-Test": "hello"}
+		headers, body = self.get_result(headers_app, headers=h)
+		self.assertEquals(body, "test-agent|hello|8500")
+
+	def test_lazy_environ(self):
+		h = {"User-Agent": "test-agent", "X-Test": "hello"}
+		headers, body = self.get_result(headers_app, True, h)
+		self.assertEquals(body, "test-agent|hello|8500")
+
 
 def suite():
 	return unit_case_suite(TestServer)